@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+"""Benchmark: legacy fixed-size slicing vs. sentence-aware chunk packing for HanLP requests.
+
+Builds a PDF-like test corpus (academic paragraphs, hard line wraps, page breaks) and reports, for both
+chunkers, the number of HanLP calls, characters sent and chunks that end in the middle of a sentence.
+It also checks that every sentence of the corpus lands whole inside a single packed chunk.
+
+    python bench_chunking.py [--pages 300] [--chunk-size 6000]
+"""
+
+import argparse
+import re
+import textwrap
+
+from main import HANLP_MIN_CHUNK_SIZE, _split_into_sentences, _split_text_into_chunks
+
+SENTENCE_END_PATTERN = re.compile(r'[。！？!?；;….][”’」』）)\]"\']*$')
+
+CORPUS_PARAGRAPHS = [
+    "深度学习是机器学习的一个分支，它通过多层神经网络从数据中学习层次化的特征表示。与传统的特征工程方法相比，"
+    "卷积神经网络在图像分类、目标检测和语义分割等任务上取得了显著的性能提升。本文在此基础上提出了一种结合注意力机制"
+    "与残差连接的改进模型，并在公开数据集上进行了系统的对比实验。",
+    "实验结果表明，所提出的方法在准确率上比基线模型提高了3.2个百分点，同时参数量减少了约40%。消融实验进一步验证了"
+    "注意力模块对模型性能的贡献；当移除该模块时，模型在小样本场景下的泛化能力明显下降！这说明注意力机制能够帮助模型"
+    "聚焦于与任务相关的局部区域。",
+    "Transformer architectures replace recurrence with self-attention, which allows every token to attend to every other "
+    "token in a sequence. The computational cost grows quadratically with the sequence length, e.g. for documents with "
+    "thousands of tokens. Sparse attention patterns (Child et al., 2019) and linear approximations reduce this cost to "
+    "O(n log n) or O(n).",
+    "知识图谱以三元组的形式描述实体及其之间的关系，是实现语义检索与智能问答的重要基础设施。构建知识图谱通常包括实体识别、"
+    "关系抽取、实体链接和知识融合等步骤，其中关系抽取的质量直接决定了图谱的可用性。近年来，基于预训练语言模型的联合抽取"
+    "方法逐渐成为主流？然而其在长文本和跨句关系上的表现仍有待提高。",
+    "We evaluate on three benchmarks and report the mean of five runs. Results are summarised in Table 3; the proposed "
+    "model outperforms all baselines except on the smallest dataset, where the variance across seeds is large [12].",
+]
+
+
+def build_corpus(pages: int, line_width: int = 38) -> str:
+    """Concatenates numbered paragraphs, hard-wrapped like PDF text lines, with page breaks between pages."""
+    page_texts = []
+    for page in range(pages):
+        paragraphs = []
+        for i, paragraph in enumerate(CORPUS_PARAGRAPHS):
+            numbered = f"{page + 1}.{i + 1} {paragraph}"
+            paragraphs.append("\n".join(textwrap.wrap(numbered, line_width)))
+        page_texts.append("\n".join(paragraphs))
+    return "\n".join(page_texts)
+
+
+def legacy_fixed_size_chunks(text: str, max_chunk_size: int, min_chunk_size: int = HANLP_MIN_CHUNK_SIZE) -> list[str]:
+    """The previous chunker: blind text[start:start + max_chunk_size] slices."""
+    chunks = []
+    for start in range(0, len(text), max_chunk_size):
+        chunk = text[start:start + max_chunk_size].strip()
+        if len(chunk) >= min_chunk_size:
+            chunks.append(chunk)
+    return chunks
+
+
+def count_mid_sentence_cuts(chunks: list[str]) -> int:
+    """Counts chunk boundaries that do not fall right after a sentence terminator."""
+    return sum(1 for chunk in chunks[:-1] if not SENTENCE_END_PATTERN.search(chunk))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=300)
+    parser.add_argument("--chunk-size", type=int, default=6000)
+    args = parser.parse_args()
+
+    corpus = build_corpus(args.pages)
+    legacy_chunks = legacy_fixed_size_chunks(corpus, args.chunk_size)
+    packed_chunks = _split_text_into_chunks(corpus, args.chunk_size)
+
+    print(f"Corpus: {len(corpus)} chars, {args.pages} pages, chunk size {args.chunk_size}")
+    print(f"{'chunker':<10}{'calls':>8}{'chars sent':>12}{'mid-sentence cuts':>20}")
+    for name, chunks in (("legacy", legacy_chunks), ("packed", packed_chunks)):
+        print(f"{name:<10}{len(chunks):>8}{sum(map(len, chunks)):>12}{count_mid_sentence_cuts(chunks):>20}")
+
+    # Every sentence (as normalized by the packer) must sit entirely inside one chunk
+    sentences = [s.strip() for s in _split_into_sentences(corpus)]
+    chunk_iter = iter(packed_chunks)
+    current_chunk = next(chunk_iter)
+    position = 0
+    for sentence in sentences:
+        found = current_chunk.find(sentence, position)
+        while found < 0:
+            current_chunk, position = next(chunk_iter), 0
+            found = current_chunk.find(sentence)
+        position = found + len(sentence)
+    print(f"All {len(sentences)} sentences contained whole in a single packed chunk: True")
@@ -0,0 +1,213 @@
+# -*- coding: utf-8 -*-
+"""Benchmark: per-segment difficulty scoring vs. the batch scorer (difficulty.py).
+
+Builds a synthetic document of text blocks (concept mentions, inline formulas, citations, long sentences,
+pages with figures/tables), then times
+  - segment: segment_difficulty_marker (the pre-batch reference scorer below) on every block, keeping markers
+             with a non-zero score
+  - batch:   block_features for every block + one score_blocks call, building markers for the results
+and checks that both produce the same markers.
+
+    python bench_difficulty.py [--pages 300] [--blocks-per-page 25] [--concepts 400]
+"""
+
+import argparse
+import random
+import time
+
+from difficulty import (
+    FORMULA_COUNT_THRESHOLD_HIGH, FORMULA_COUNT_THRESHOLD_LOW, FORMULA_LENGTH_THRESHOLD_HIGH, FORMULA_LENGTH_THRESHOLD_LOW,
+    LEXICAL_SCANNER, WEIGHT_CITATION_DENSITY, WEIGHT_FIGURE_TABLE, WEIGHT_FORMULA_COMPLEXITY, WEIGHT_LONG_SENTENCE,
+    WEIGHT_TERM_DENSITY, block_features, score_blocks,
+)
+from main import SegmentDifficultyMarker
+from term_matcher import TermMatcher
+
+FRAGMENTS = [
+    "实验结果表明，所提出的方法在准确率上比基线模型提高了3.2个百分点。",
+    "如图所示，损失函数 L = -∑ y log p 在训练过程中逐渐收敛；",
+    "该方法最早由 Vaswani et al., 2017 提出 [12]，随后被广泛应用 (Devlin et al., 2019)。",
+    "其中 alpha 与 beta 为可调超参数，x ≤ 1 且 y ≥ 0！",
+    "本节介绍数据集的构建过程以及标注规范",
+    "我们在三个公开数据集上进行了大量对比实验并分析了不同模块对最终性能的影响，进一步验证了注意力机制在长文本建模中的有效性和稳定性",
+    "Transformer models compute attention weights for every pair of tokens in the input sequence; ",
+    "{a + b} [x / y] (+) 2 * 3 = 6. ",
+]
+
+
+def segment_difficulty_marker(
+    segment_text: str,
+    concepts_on_document: set[str],
+    segment_id: str,
+    page_index: int,
+    block_index_on_page: int,
+    figure_count_on_page: int,
+    table_count_on_page: int,
+    term_matcher: TermMatcher | None = None # Automaton over concepts_on_document, built once per document
+) -> SegmentDifficultyMarker:
+    """Reference scorer: the per-segment weighted scoring model that main.py used before the batch scorer in
+       difficulty.py, kept here (and only here) to time it against and to check that the batch scorer agrees."""
+    raw_scores = {
+        "term_density": 0.0,
+        "formula_complexity": 0.0,
+        "figure_table": 0.0,
+        "citation_density": 0.0,
+        "long_sentence": 0.0
+    }
+    reasons = []
+    current_segment_text = segment_text if isinstance(segment_text, str) else ""
+    segment_text_lower = current_segment_text.lower().strip()
+    text_preview = current_segment_text.strip()[:100]
+
+    if not segment_text_lower:
+        return SegmentDifficultyMarker(
+            segment_id=segment_id, page_index=page_index, block_index_on_page=block_index_on_page,
+            text_preview=text_preview, score=0.0, reasons=[]
+        )
+
+    # 1. Academic Term Density
+    if term_matcher is not None:
+        concepts_found_in_segment = term_matcher.find_terms(segment_text_lower) # Single linear pass over the segment
+    else:
+        concepts_found_in_segment = {c for c in concepts_on_document if c in segment_text_lower}
+    term_count = len(concepts_found_in_segment)
+    raw_scores["term_density"] = float(term_count)
+    if term_count > 0:
+        reasons.append(f"term_density_segment ({term_count})")
+
+    # 2. Formula Complexity
+    formula_spans = LEXICAL_SCANNER.formula_spans(segment_text_lower) # Patterns are compiled once (lexical_scanner.py)
+    formula_count = len(formula_spans)
+    total_formula_length = sum(end - start for start, end in formula_spans)
+
+    # Tiered scoring for formulas
+    raw_scores["formula_complexity"] = 0.0
+    has_any_formula = formula_count > 0 or total_formula_length > 0
+    is_high_complexity = formula_count >= FORMULA_COUNT_THRESHOLD_HIGH or total_formula_length >= FORMULA_LENGTH_THRESHOLD_HIGH
+    is_medium_complexity = formula_count >= FORMULA_COUNT_THRESHOLD_LOW or total_formula_length >= FORMULA_LENGTH_THRESHOLD_LOW
+
+    if is_high_complexity:
+        raw_scores["formula_complexity"] = 1.0
+    elif is_medium_complexity:
+        raw_scores["formula_complexity"] = 0.6 # Tier for medium complexity
+    elif has_any_formula:
+        raw_scores["formula_complexity"] = 0.2 # Tier for low/any complexity
+
+    if has_any_formula:
+        reasons.append(f"formulas_in_segment (count: {formula_count}, length: {total_formula_length})")
+
+    # 3. Figure/Table Count on Page
+    raw_scores["figure_table"] = float(figure_count_on_page) + float(table_count_on_page)
+    if figure_count_on_page > 0:
+        reasons.append(f"figures_on_page ({figure_count_on_page})")
+    if table_count_on_page > 0:
+        reasons.append(f"tables_on_page ({table_count_on_page})")
+
+    # 4. Citation Density
+    citation_count = len(LEXICAL_SCANNER.citation_spans(current_segment_text))
+    raw_scores["citation_density"] = float(citation_count)
+    if citation_count > 0:
+        reasons.append(f"citations_in_segment ({citation_count})")
+
+    # 5. Long Sentence Detection
+    long_sentence_count = len(LEXICAL_SCANNER.long_sentence_lengths(current_segment_text))
+    raw_scores["long_sentence"] = float(long_sentence_count)
+    if long_sentence_count > 0:
+        reasons.append(f"long_sentences_in_segment ({long_sentence_count})")
+
+    # Calculate final weighted score
+    final_score = (
+        raw_scores["term_density"] * WEIGHT_TERM_DENSITY +
+        raw_scores["formula_complexity"] * WEIGHT_FORMULA_COMPLEXITY +
+        raw_scores["figure_table"] * WEIGHT_FIGURE_TABLE +
+        raw_scores["citation_density"] * WEIGHT_CITATION_DENSITY +
+        raw_scores["long_sentence"] * WEIGHT_LONG_SENTENCE
+    )
+    return SegmentDifficultyMarker(
+        segment_id=segment_id, page_index=page_index, block_index_on_page=block_index_on_page,
+        text_preview=text_preview, score=round(final_score, 3), reasons=sorted(list(set(reasons))) # Round score
+    )
+
+
+def build_document(pages: int, blocks_per_page: int, concepts: int, seed: int = 7) -> tuple[list[dict], set[str]]:
+    rng = random.Random(seed)
+    terms = [f"概念{i:04d}" for i in range(concepts)] + ["注意力机制", "transformer", "损失函数"]
+    document = []
+    for page_index in range(pages):
+        blocks = []
+        for block_index in range(blocks_per_page):
+            parts = rng.choices(FRAGMENTS, k=rng.randint(1, 6)) + rng.sample(terms, rng.randint(0, 4))
+            rng.shuffle(parts)
+            text = "".join(parts) if rng.random() > 0.05 else "   "
+            blocks.append((0.0, 0.0, 1.0, 1.0, text, block_index, 0 if rng.random() > 0.1 else 1))
+        document.append({
+            "page_index": page_index,
+            "blocks": blocks,
+            "figure_count": rng.choice([0, 0, 0, 1, 2]),
+            "table_count": rng.choice([0, 0, 0, 0, 1]),
+        })
+    return document, set(terms)
+
+
+def text_blocks(document: list[dict]):
+    for page in document:
+        for block_index, block in enumerate(page["blocks"]):
+            if block[6] == 0 and block[4].strip():
+                yield page, block_index, block[4]
+
+
+def segment_path(document: list[dict], concepts: set[str]) -> list[dict]:
+    matcher = TermMatcher(concepts)
+    markers = []
+    for page, block_index, text in text_blocks(document):
+        marker = segment_difficulty_marker(text, concepts, f"p{page['page_index']}_b{block_index}", page["page_index"], block_index,
+                                           page["figure_count"], page["table_count"], term_matcher=matcher)
+        if marker.score > 0:
+            markers.append(marker.model_dump())
+    return markers
+
+
+def batch_path(document: list[dict], concepts: set[str]) -> list[dict]:
+    matcher = TermMatcher(concepts)
+    segments, rows = [], []
+    for page, block_index, text in text_blocks(document):
+        segments.append((page["page_index"], block_index, text))
+        rows.append(block_features(text, page["figure_count"], page["table_count"], matcher))
+    markers = []
+    for i, score, reasons in score_blocks(rows):
+        page_index, block_index, text = segments[i]
+        markers.append(SegmentDifficultyMarker(segment_id=f"p{page_index}_b{block_index}", page_index=page_index,
+                                               block_index_on_page=block_index, text_preview=text.strip()[:100],
+                                               score=score, reasons=reasons).model_dump())
+    return markers
+
+
+def timed(fn, *args, repeat: int = 3):
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=300)
+    parser.add_argument("--blocks-per-page", type=int, default=25)
+    parser.add_argument("--concepts", type=int, default=400)
+    args = parser.parse_args()
+
+    document, concepts = build_document(args.pages, args.blocks_per_page, args.concepts)
+    block_count = sum(1 for _ in text_blocks(document))
+    segment_time, segment_markers = timed(segment_path, document, concepts)
+    batch_time, batch_markers = timed(batch_path, document, concepts)
+    matcher = TermMatcher(concepts)
+    feature_time, rows = timed(lambda: [block_features(text, page["figure_count"], page["table_count"], matcher)
+                                        for page, _, text in text_blocks(document)])
+    score_time, _ = timed(score_blocks, rows)
+    print(f"{block_count} text blocks, {len(segment_markers)} markers")
+    print(f"segment: {segment_time * 1000:8.1f}ms")
+    print(f"batch:   {batch_time * 1000:8.1f}ms  ({segment_time / batch_time:.1f}x; "
+          f"features {feature_time * 1000:.1f}ms, scoring {score_time * 1000:.1f}ms)")
+    print(f"same markers: {segment_markers == batch_markers}")
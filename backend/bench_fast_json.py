@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+"""Benchmark: response_model serialization vs. the fast JSON path (FAST_JSON_RESPONSES=1).
+
+Builds a large /upload-and-extract payload (plain dicts, as the upload pipeline returns them) and a
+/global-graph payload from a synthetic corpus, then times
+  - validate:  response_model validation + dump + JSON encoding (what FastAPI does for a returned payload)
+  - model:     response_model construction + model_dump_json (the graph response cache's default path)
+  - fast:      fill_defaults + fast_json.dumps on the plain data
+and checks that all three produce the same JSON document.
+
+    python bench_fast_json.py [--relationships 20000] [--markers 6000] [--documents 300]
+"""
+
+import argparse
+import copy
+import json
+import random
+import time
+from functools import partial
+
+from fastapi.responses import JSONResponse
+
+from bench_graph_store import build_corpus
+from fast_json import JSON_ENCODER, dumps, fill_defaults
+from graph_store import MemoryGraphStore
+from main import DocumentUploadResponse, GlobalGraphResponse, GlobalGraphResponseNode
+
+REASONS = ["term_density", "formula_complexity", "figure_table", "citation_density", "long_sentence"]
+
+
+def build_upload_payload(concepts: int, relationships: int, markers: int, seed: int = 7) -> dict:
+    rng = random.Random(seed)
+    terms = [f"概念{i:05d}" for i in range(concepts)]
+    return {
+        "id": "3f2b8c1e-0000-4000-8000-000000000000",
+        "title": "基于注意力机制的知识图谱构建方法研究",
+        "concepts": [{"term": term, "definition": None} for term in terms],
+        "relationships": [
+            {"source": rng.choice(terms), "target": rng.choice(terms), "label": rng.choice(["nsubj", "dobj", "amod", None])}
+            for _ in range(relationships)
+        ],
+        "difficulty_markers": [
+            {
+                "segment_id": f"p{i // 20}_b{i % 20}",
+                "page_index": i // 20,
+                "block_index_on_page": i % 20,
+                "text_preview": "实验结果表明，所提出的方法在准确率上比基线模型提高了3.2个百分点 (Child et al., 2019)"[: rng.randint(20, 60)],
+                "score": round(rng.random() * 3, 3),
+                "reasons": sorted(rng.sample(REASONS, rng.randint(1, 3))),
+            }
+            for i in range(markers)
+        ],
+    }
+
+
+def validate_path(model, payload: dict) -> bytes:
+    return JSONResponse(model.model_validate(payload).model_dump(mode="json")).body
+
+
+def model_path(model, payload: dict) -> bytes:
+    return model(**payload).model_dump_json().encode("utf-8")
+
+
+def fast_upload_path(payload: dict) -> bytes:
+    fill_defaults([payload], DocumentUploadResponse)
+    return dumps(payload)
+
+
+def fast_graph_path(payload: dict) -> bytes:
+    fill_defaults([payload], GlobalGraphResponse)
+    fill_defaults(payload["nodes"], GlobalGraphResponseNode)
+    return dumps(payload)
+
+
+def timed(fn, payload: dict, repeat: int = 5) -> tuple[float, bytes]:
+    best, body = float("inf"), b""
+    for _ in range(repeat):
+        fresh = copy.deepcopy(payload) # Each request serializes a freshly built payload
+        start = time.perf_counter()
+        body = fn(fresh)
+        best = min(best, time.perf_counter() - start)
+    return best, body
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concepts", type=int, default=3000)
+    parser.add_argument("--relationships", type=int, default=20000)
+    parser.add_argument("--markers", type=int, default=6000)
+    parser.add_argument("--documents", type=int, default=300)
+    args = parser.parse_args()
+
+    store = MemoryGraphStore()
+    for doc in build_corpus(args.documents, 150, 80, 20000):
+        store.add_document(doc["id"], doc["title"])
+        store.add_document_graph(doc["id"], doc["concepts"], doc["edges"])
+    payloads = {
+        "upload": (DocumentUploadResponse, build_upload_payload(args.concepts, args.relationships, args.markers), fast_upload_path),
+        "graph": (GlobalGraphResponse, {key: value for key, value in store.get_graph(None).items() if key != "version"}, fast_graph_path),
+    }
+
+    print(f"Fast encoder: {JSON_ENCODER}")
+    print(f"{'payload':<8}{'size':>10}{'validate':>11}{'model':>10}{'fast':>10}{'speedup':>9}  same JSON")
+    for name, (model, payload, fast_fn) in payloads.items():
+        validate_time, validate_body = timed(partial(validate_path, model), payload)
+        model_time, model_body = timed(partial(model_path, model), payload)
+        fast_time, fast_body = timed(fast_fn, payload)
+        same = json.loads(validate_body) == json.loads(model_body) == json.loads(fast_body)
+        print(f"{name:<8}{len(fast_body) / 1024:>8.0f}KB{validate_time * 1000:>9.1f}ms{model_time * 1000:>8.1f}ms"
+              f"{fast_time * 1000:>8.1f}ms{validate_time / fast_time:>8.1f}x  {same}")
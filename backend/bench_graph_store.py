@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""Benchmark: in-memory vs. SQLite knowledge graph store.
+
+Ingests a synthetic corpus (Zipf-distributed concept vocabulary, labelled edges per document), then times
+unfiltered and document-filtered graph queries plus the subgraph queries (2-hop neighborhood, top-N by degree,
+one page of the node listing) and a full centrality recompute (degree, document frequency, PageRank) on both
+backends, and checks that they return the same graph and scores.
+
+    python bench_graph_store.py [--documents 1000] [--concepts-per-doc 150] [--edges-per-doc 80]
+"""
+
+import argparse
+import random
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from centrality import GraphCentrality
+from graph_store import MemoryGraphStore, SQLiteGraphStore
+
+LABELS = ["nsubj", "dobj", "compound:nn", "amod", "nmod", None]
+
+
+def build_corpus(documents: int, concepts_per_doc: int, edges_per_doc: int, vocabulary: int, seed: int = 7) -> list[dict]:
+    rng = random.Random(seed)
+    terms = [f"概念{i:06d}" for i in range(vocabulary)]
+    weights = [1.0 / (rank + 1) for rank in range(vocabulary)] # Common concepts recur across documents
+    corpus = []
+    for i in range(documents):
+        concept_terms = list(dict.fromkeys(rng.choices(terms, weights, k=concepts_per_doc)))
+        edges = [(rng.choice(concept_terms), rng.choice(concept_terms), rng.choice(LABELS)) for _ in range(edges_per_doc)]
+        corpus.append({"id": f"doc-{i:05d}", "title": f"Document {i}", "concepts": concept_terms, "edges": edges})
+    return corpus
+
+
+def normalize(graph: dict) -> tuple:
+    """Order-insensitive view of a get_graph() result (category indexes depend on set iteration in the memory store)."""
+    return (
+        [doc["id"] for doc in graph["documents"]],
+        sorted((node["id"], tuple(sorted(node["document_ids"]))) for node in graph["nodes"]),
+        sorted((link["source"], link["target"], link["label"] or "", link["document_id"]) for link in graph["links"]),
+    )
+
+
+def timed(fn, *args, repeat: int = 3) -> tuple[float, object]:
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=1000)
+    parser.add_argument("--concepts-per-doc", type=int, default=150)
+    parser.add_argument("--edges-per-doc", type=int, default=80)
+    parser.add_argument("--vocabulary", type=int, default=50000)
+    args = parser.parse_args()
+
+    corpus = build_corpus(args.documents, args.concepts_per_doc, args.edges_per_doc, args.vocabulary)
+    selected = [corpus[len(corpus) // 3]["id"], corpus[2 * len(corpus) // 3]["id"]]
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = Path(tmp_dir) / "graph.sqlite3"
+        stores = {"memory": MemoryGraphStore(), "sqlite": SQLiteGraphStore(db_path)}
+        results, subgraph_timings, centralities = {}, {}, {}
+        center = corpus[0]["concepts"][len(corpus[0]["concepts"]) // 2]
+        print(f"Corpus: {args.documents} documents, ~{args.concepts_per_doc} concepts and {args.edges_per_doc} edges each")
+        print(f"{'backend':<8}{'ingest/doc':>12}{'full graph':>12}{'1 doc':>10}{'2 docs':>10}  {'nodes':>7}{'links':>8}")
+        for name, store in stores.items():
+            start = time.perf_counter()
+            for doc in corpus:
+                store.add_document(doc["id"], doc["title"])
+                store.add_document_graph(doc["id"], doc["concepts"], doc["edges"])
+            ingest_per_doc = (time.perf_counter() - start) / len(corpus)
+            full_time, full_graph = timed(store.get_graph, None)
+            one_time, one_graph = timed(store.get_graph, selected[:1])
+            two_time, two_graph = timed(store.get_graph, selected)
+            results[name] = (full_graph, one_graph, two_graph)
+            subgraph_timings[name] = (
+                timed(store.get_neighborhood, center, 2, 200)[0],
+                timed(store.get_top_concepts, 50, "degree")[0],
+                timed(store.list_nodes, None, 500)[0],
+                timed(GraphCentrality(store.link_snapshot).recompute)[0],
+            )
+            centralities[name] = GraphCentrality(store.link_snapshot).recompute()
+            print(f"{name:<8}{ingest_per_doc * 1000:>10.2f}ms{full_time * 1000:>10.1f}ms{one_time * 1000:>8.2f}ms{two_time * 1000:>8.2f}ms"
+                  f"  {len(full_graph['nodes']):>7}{len(full_graph['links']):>8}")
+
+        print(f"{'backend':<8}{'2-hop/200':>12}{'top-50':>10}{'page/500':>10}{'centrality':>12}")
+        for name, (neighborhood_time, top_time, page_time, centrality_time) in subgraph_timings.items():
+            print(f"{name:<8}{neighborhood_time * 1000:>10.2f}ms{top_time * 1000:>8.2f}ms{page_time * 1000:>8.2f}ms{centrality_time * 1000:>10.1f}ms")
+
+        same = all(normalize(a) == normalize(b) for a, b in zip(results["memory"], results["sqlite"]))
+        print(f"Both backends return the same graph (full, 1 doc, 2 docs): {same}")
+        memory_scores, sqlite_scores = centralities["memory"], centralities["sqlite"]
+        same_scores = sorted(memory_scores.terms) == sorted(sqlite_scores.terms)
+        if same_scores:
+            sqlite_positions = np.array([sqlite_scores.index[term] for term in memory_scores.terms], dtype=np.int64)
+            same_scores = all(
+                np.allclose(memory_scores.metrics[metric], sqlite_scores.metrics[metric][sqlite_positions])
+                for metric in ("pagerank", "degree", "document_frequency")
+            )
+        print(f"Both backends yield the same centrality scores: {same_scores}")
+
+        stores["sqlite"].close()
+        reopened = SQLiteGraphStore(db_path)
+        print(f"Reopened SQLite store: {reopened.stats()}")
+        reopened.close()
@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+"""Micro-benchmark: per-block cost of the lexical difficulty features (formulas, citations, long sentences).
+
+Times three implementations over the text blocks of academic papers:
+  - legacy:    the original inline code of the per-segment scorer (pattern strings resolved through
+               re's cache on every call, matches collected into lists, re.split + re.match sentence loop)
+  - separate:  the precompiled patterns, one finditer / split per feature (block_features before the scanner)
+  - scanner:   LexicalScanner.scan (lexical_scanner.py)
+and checks that all three give the same feature values and that the scanner's spans equal the spans of
+FORMULA_PATTERN / CITATION_PATTERN.finditer, on the corpus and on random strings built from the characters
+the patterns care about.
+
+The built-in corpus is a set of paragraphs, captions, equations and reference-list entries in the style of
+Chinese and English papers; pass PDFs to measure on their blocks instead (extracted like uploads are).
+
+    python bench_lexical_scanner.py [paper.pdf ...] [--repeat 5] [--fuzz 20000]
+"""
+
+import argparse
+import random
+import re
+import time
+from pathlib import Path
+
+from difficulty import LEXICAL_SCANNER, LONG_SENTENCE_CHAR_THRESHOLD
+from lexical_scanner import CITATION_PATTERN, FORMULA_PATTERN, GREEK_LETTER_NAMES, SENTENCE_END_PATTERN
+
+CORPUS_BLOCKS = [
+    "摘要：针对长文本语义建模中注意力计算开销随序列长度平方增长的问题，本文提出一种基于局部敏感哈希的稀疏注意力机制，"
+    "在保持模型表达能力的同时将时间复杂度由 O(n^2) 降低至 O(n log n)。在三个公开数据集上的实验结果表明，所提出的方法在"
+    "准确率上比基线模型提高了3.2个百分点，同时显存占用减少了约40%。",
+    "1 引言",
+    "近年来，以 Transformer [1] 为代表的预训练语言模型在机器翻译、阅读理解和文本分类等任务上取得了显著进展 [2-4]。"
+    "然而，自注意力机制需要计算序列中任意两个位置之间的相关性，其计算量和存储量均与序列长度的平方成正比，这使得模型"
+    "难以直接处理篇章级别的长文本；已有工作尝试通过滑动窗口、全局记忆单元或低秩近似等方式缓解这一问题（Beltagy et al., 2020；"
+    "Wang et al., 2020），但这些方法往往需要针对特定任务精心设计注意力模式。",
+    "给定输入序列 X = (x_1, x_2, ..., x_n)，注意力权重按下式计算：Attention(Q, K, V) = softmax(QK^T / √d_k) V，其中 Q = XW_Q，"
+    "K = XW_K，V = XW_V 分别为查询、键和值矩阵，d_k 为键向量的维度。",
+    "L = -∑_{i=1}^{N} y_i log p_i + λ ||θ||_2^2 (3)",
+    "式中 λ ≥ 0 为正则化系数，α 与 β 为可调超参数，实验中取 alpha = 0.1、beta = 0.9。",
+    "表 2 不同模型在测试集上的准确率（%）与推理时间（ms）",
+    "模型 准确率 推理时间 BERT-base 84.3 12.1 Longformer 86.1 35.7 本文方法 87.5 18.4",
+    "图 3 序列长度 n ∈ {512, 1024, 2048, 4096} 时各方法的显存占用对比",
+    "Transformer architectures replace recurrence with self-attention, which allows every token to attend to every other "
+    "token in a sequence. The computational cost grows quadratically with the sequence length, e.g. for documents with "
+    "thousands of tokens. Sparse attention patterns (Child et al., 2019) and linear approximations reduce this cost to "
+    "O(n log n) or O(n).",
+    "We optimise the objective with Adam (Kingma and Ba, 2015) using a learning rate of 3e-4, a batch size of 32 and a "
+    "linear warm-up over the first 10% of the steps; the dropout rate is set to 0.1 and gradients are clipped at 1.0. "
+    "All experiments were run on a single GPU with 24 GB of memory and the reported numbers are the mean of five runs "
+    "with different random seeds.",
+    "As shown in Table 3, the proposed model outperforms all baselines except on the smallest dataset, where the "
+    "variance across seeds is large [12]. Vaswani et al., 2017 report similar behaviour for the base model, and "
+    "Devlin et al. (2019) observe that fine-tuning is unstable when fewer than 1,000 labelled examples are available.",
+    "where h_t = tanh(W_h h_{t-1} + W_x x_t + b) and the gate values satisfy 0 ≤ g_t ≤ 1 for every time step t.",
+    "[1] Vaswani A, Shazeer N, Parmar N, et al. Attention is all you need[C]//Advances in Neural Information "
+    "Processing Systems. 2017: 5998-6008.",
+    "[2] Devlin J, Chang M W, Lee K, et al. BERT: Pre-training of deep bidirectional transformers for language "
+    "understanding[C]//Proceedings of NAACL-HLT. 2019: 4171-4186.",
+    "[3] 张三, 李四. 基于图神经网络的知识图谱补全方法研究[J]. 计算机学报, 2021, 44(5): 1021-1035.",
+    "2.2 知识图谱构建",
+    "知识图谱以三元组的形式描述实体及其之间的关系，是实现语义检索与智能问答的重要基础设施。构建知识图谱通常包括实体识别、"
+    "关系抽取、实体链接和知识融合等步骤，其中关系抽取的质量直接决定了图谱的可用性。近年来，基于预训练语言模型的联合抽取"
+    "方法逐渐成为主流？然而其在长文本和跨句关系上的表现仍有待提高。",
+    "本节介绍数据集的构建过程以及标注规范。",
+]
+
+_FUZZ_ALPHABET = (list("abcxyzAKSıſ0123456789.  \t\n+-*/=<>≤≥∈∑∫∏√^()[]{},;。！？；") + ["中", "文", "模型"]
+                  + list(GREEK_LETTER_NAMES) + [" et al. ", " et al., ", "2019", "(Smith, 2020)", "[12]"])
+
+
+def legacy_features(segment_text: str) -> tuple[int, int, int, int]:
+    """(formula count, formula length, citations, long sentences) as computed inline before lexical_scanner.py."""
+    segment_text_lower = segment_text.lower().strip()
+    if not segment_text_lower:
+        return 0, 0, 0, 0
+    formula_pattern_str = r"([a-zA-Z]?\s*[+\-\*/=<>≤≥∈∑∫∏√^]\s*[a-zA-Z\d])|(\b(alpha|beta|gamma|delta|epsilon|zeta|eta|theta|iota|kappa|lambda|mu|nu|xi|omicron|pi|rho|sigma|tau|upsilon|phi|chi|psi|omega)\b)|([\d.\s]*[+\-\*/=<>≤≥∈∑∫∏√^][\d.\s]+)|(\([+\-\*/=<>≤≥∈∑∫∏√^]+\))|(\[[\w\s+\-\*/=<>≤≥∈∑∫∏√^]+\])|(\{[\w\s+\-\*/=<>≤≥∈∑∫∏√^]+\})"
+    formula_matches_iter = list(re.finditer(formula_pattern_str, segment_text_lower, re.VERBOSE | re.IGNORECASE))
+    formula_count = len(formula_matches_iter)
+    total_formula_length = sum(match.end() - match.start() for match in formula_matches_iter)
+    citation_pattern_str = r"(\[\d+\])|(\([^)]*\d{4}[^(]*\))|(\b[A-Za-z]+\s+et\s+al\.,?\s+\d{4})"
+    citation_count = len(list(re.finditer(citation_pattern_str, segment_text)))
+    sentence_parts = re.split(r'([。？！；!?;]+)', segment_text)
+    sentences = []
+    current_sentence_agg = ""
+    for part in sentence_parts:
+        if not part: continue
+        current_sentence_agg += part
+        if re.match(r'^[。？！；!?;]+$', part.strip()):
+            if current_sentence_agg.strip():
+                sentences.append(current_sentence_agg.strip())
+            current_sentence_agg = ""
+    if current_sentence_agg.strip():
+        sentences.append(current_sentence_agg.strip())
+    sentences = [s for s in sentences if len(s) > 5]
+    long_sentence_count = sum(1 for sent in sentences if len(sent) > LONG_SENTENCE_CHAR_THRESHOLD)
+    return formula_count, total_formula_length, citation_count, long_sentence_count
+
+
+def separate_features(text: str) -> tuple[int, int, int, int]:
+    """The same values from the precompiled patterns, one scan per feature."""
+    text_lower = text.lower().strip()
+    if not text_lower:
+        return 0, 0, 0, 0
+    formula_count = formula_length = 0
+    for match in FORMULA_PATTERN.finditer(text_lower):
+        formula_count += 1
+        formula_length += match.end() - match.start()
+    long_sentence_count = 0
+    if len(text) > LONG_SENTENCE_CHAR_THRESHOLD:
+        parts = SENTENCE_END_PATTERN.split(text)
+        long_sentence_count = sum(1 for i in range(0, len(parts) - 1, 2) if len((parts[i] + parts[i + 1]).strip()) > LONG_SENTENCE_CHAR_THRESHOLD)
+        long_sentence_count += len(parts[-1].strip()) > LONG_SENTENCE_CHAR_THRESHOLD
+    return formula_count, formula_length, sum(1 for _ in CITATION_PATTERN.finditer(text)), long_sentence_count
+
+
+def scanner_features(text: str) -> tuple[int, int, int, int]:
+    text_lower = text.lower().strip()
+    if not text_lower:
+        return 0, 0, 0, 0
+    scan = LEXICAL_SCANNER.scan(text, text_lower)
+    return (len(scan.formula_spans), sum(end - start for start, end in scan.formula_spans),
+            len(scan.citation_spans), len(scan.long_sentence_lengths))
+
+
+def pdf_blocks(paths: list[str]) -> list[str]:
+    from pdf_extraction import extract_pdf_pages
+
+    blocks = []
+    for path in paths:
+        for page in extract_pdf_pages(Path(path).read_bytes())["pages"]:
+            blocks.extend(block[4] for block in page["blocks"] if block[6] == 0 and block[4].strip())
+    return blocks
+
+
+def same_spans(text: str) -> bool:
+    text_lower = text.lower().strip()
+    return (LEXICAL_SCANNER.formula_spans(text_lower) == [m.span() for m in FORMULA_PATTERN.finditer(text_lower)]
+            and LEXICAL_SCANNER.citation_spans(text) == [m.span() for m in CITATION_PATTERN.finditer(text)])
+
+
+def per_block_us(fn, blocks: list[str], repeat: int) -> tuple[float, list]:
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = [fn(block) for block in blocks]
+        best = min(best, time.perf_counter() - start)
+    return best / len(blocks) * 1e6, result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("pdf", nargs="*", help="Papers to take the text blocks from (default: the built-in corpus).")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--fuzz", type=int, default=20000, help="Random strings to compare spans on.")
+    args = parser.parse_args()
+
+    blocks = pdf_blocks(args.pdf) if args.pdf else CORPUS_BLOCKS * 200
+    print(f"{len(blocks)} text blocks, {sum(map(len, blocks)) / len(blocks):.0f} characters on average")
+    results = {}
+    for name, fn in (("legacy", legacy_features), ("separate", separate_features), ("scanner", scanner_features)):
+        cost, results[name] = per_block_us(fn, blocks, args.repeat)
+        print(f"{name:9s} {cost:7.2f} us/block")
+    for name, fn in (("formulas", lambda b: LEXICAL_SCANNER.formula_spans(b.lower().strip())),
+                     ("citations", LEXICAL_SCANNER.citation_spans), ("sentences", LEXICAL_SCANNER.long_sentence_lengths)):
+        print(f"  scanner {name:9s} {per_block_us(fn, blocks, args.repeat)[0]:6.2f} us/block")
+    print(f"same features: {results['legacy'] == results['separate'] == results['scanner']}")
+    rng = random.Random(7)
+    fuzz = ["".join(rng.choices(_FUZZ_ALPHABET, k=rng.randint(0, 60))) for _ in range(args.fuzz)]
+    print(f"same spans: {all(map(same_spans, blocks))} (blocks), {all(map(same_spans, fuzz))} ({args.fuzz} random strings)")
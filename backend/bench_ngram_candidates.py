@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+"""Benchmark: brute-force 1..MAX_NGRAM_LEN N-gram enumeration vs. the titles-index guided walk.
+
+Compares the number of candidate strings generated, the wall time, and checks that both paths keep
+exactly the same concepts after the local Wikipedia titles filter.
+
+    python bench_ngram_candidates.py                                  # synthetic corpus + synthetic titles
+    python bench_ngram_candidates.py --index zhwiki-...-simplified.titles.idx --parsed hanlp_output.json
+
+`--parsed` expects a saved HanLP result with 'tok/coarse' and 'pos/pku' lists (one list per sentence).
+"""
+
+import argparse
+import json
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from main import _extract_noun_phrases_from_pos
+from titles_index import WikipediaTitlesIndex, build_titles_index, default_index_path
+
+POS_TAGS = ["n", "nz", "v", "a", "d", "p", "u", "w", "nr", "vn"]
+
+
+def _synthetic_corpus(sentence_count: int, seed: int) -> tuple[list[list[str]], list[list[str]], list[str]]:
+    """Builds random 'sentences' over a small vocabulary plus a titles list made of some of their N-grams."""
+    rng = random.Random(seed)
+    vocab = ["".join(chr(rng.randint(0x4E00, 0x4FFF)) for _ in range(rng.randint(1, 3))) for _ in range(3000)]
+    sentences, tags = [], []
+    for _ in range(sentence_count):
+        length = rng.randint(8, 40)
+        sentences.append([rng.choice(vocab) for _ in range(length)])
+        tags.append([rng.choice(POS_TAGS) for _ in range(length)])
+    titles = set(rng.sample(vocab, 1500))
+    for tokens in rng.sample(sentences, max(1, sentence_count // 4)):
+        start = rng.randrange(len(tokens))
+        titles.add("".join(tokens[start:start + rng.randint(2, 4)]))
+    return sentences, tags, sorted(titles)
+
+
+def run(sentences: list[list[str]], tags: list[list[str]], titles_index: WikipediaTitlesIndex):
+    start = time.perf_counter()
+    brute_candidates = 0
+    brute_kept = set()
+    for tokens, sentence_tags in zip(sentences, tags):
+        phrases = _extract_noun_phrases_from_pos(tokens, sentence_tags)
+        brute_candidates += len(phrases)
+        brute_kept.update(p for p in phrases if p in titles_index)
+    brute_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    guided_candidates = 0
+    guided_kept = set()
+    for tokens, sentence_tags in zip(sentences, tags):
+        phrases = _extract_noun_phrases_from_pos(tokens, sentence_tags, titles_index=titles_index)
+        guided_candidates += len(phrases)
+        guided_kept.update(phrases)
+    guided_seconds = time.perf_counter() - start
+
+    print(f"Sentences: {len(sentences)}, titles in index: {len(titles_index)}")
+    print(f"{'path':<10}{'candidates':>14}{'kept':>10}{'seconds':>12}")
+    print(f"{'brute':<10}{brute_candidates:>14}{len(brute_kept):>10}{brute_seconds:>12.3f}")
+    print(f"{'guided':<10}{guided_candidates:>14}{len(guided_kept):>10}{guided_seconds:>12.3f}")
+    print(f"Same concepts kept: {brute_kept == guided_kept}")
+    if brute_kept != guided_kept:
+        raise SystemExit(f"Mismatch: only brute={sorted(brute_kept - guided_kept)[:20]}, only guided={sorted(guided_kept - brute_kept)[:20]}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--index", help="Compiled titles index (default: synthetic titles).")
+    parser.add_argument("--parsed", help="Saved HanLP parse JSON with 'tok/coarse' and 'pos/pku' (default: synthetic corpus).")
+    parser.add_argument("--sentences", type=int, default=20000, help="Synthetic sentence count.")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    sentences, tags, titles = _synthetic_corpus(args.sentences, args.seed)
+    if args.parsed:
+        parsed = json.loads(Path(args.parsed).read_text(encoding="utf-8"))
+        sentences, tags = parsed["tok/coarse"], parsed["pos/pku"]
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        index_path = args.index
+        if not index_path:
+            titles_path = Path(tmp_dir) / "titles.txt"
+            titles_path.write_text("\n".join(titles), encoding="utf-8")
+            index_path = default_index_path(titles_path)
+            build_titles_index(titles_path, index_path)
+        with WikipediaTitlesIndex(index_path) as titles_index:
+            run(sentences, tags, titles_index)
@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+"""Concept importance metrics for the global knowledge graph: degree, document frequency and PageRank.
+
+Metrics are computed over a snapshot of the store's undirected concept adjacency (link_snapshot()) with
+vectorized numpy: the adjacency is kept as coordinate arrays, so a PageRank iteration is one gather and
+one np.bincount scatter over the links. Recomputation runs in a background thread, debounced after
+uploads, and warm-starts from the previous scores, which typically needs only a few iterations when a
+document is added. Readers always get a complete, immutable CentralitySnapshot; it may lag the graph by
+up to the debounce delay plus one computation.
+"""
+
+import logging
+import threading
+import time
+from typing import Callable
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+CENTRALITY_METRICS = ("pagerank", "degree", "document_frequency")
+
+
+def pagerank(node_count: int, low: np.ndarray, high: np.ndarray, weights: np.ndarray, damping: float = 0.85,
+             tolerance: float = 1e-9, max_iterations: int = 100, initial: np.ndarray | None = None) -> tuple[np.ndarray, int]:
+    """Weighted PageRank of an undirected graph given as link arrays (low[k] -- high[k] with weights[k]).
+
+    Rank of isolated nodes is spread uniformly (dangling mass). Returns (scores summing to 1, iterations)."""
+    if node_count == 0:
+        return np.zeros(0), 0
+    source = np.concatenate([low, high])
+    target = np.concatenate([high, low])
+    link_weights = np.concatenate([weights, weights]).astype(np.float64)
+    out_weight = np.bincount(source, weights=link_weights, minlength=node_count)
+    transition = link_weights / out_weight[source] # Column-stochastic entries of the sparse transition matrix
+    dangling = out_weight == 0
+
+    if initial is not None and initial.sum() > 0:
+        rank = initial / initial.sum()
+    else:
+        rank = np.full(node_count, 1.0 / node_count)
+    iterations = 0
+    for iterations in range(1, max_iterations + 1):
+        spread = np.bincount(target, weights=rank[source] * transition, minlength=node_count)
+        new_rank = damping * (spread + rank[dangling].sum() / node_count) + (1.0 - damping) / node_count
+        converged = np.abs(new_rank - rank).sum() < tolerance
+        rank = new_rank
+        if converged:
+            break
+    return rank, iterations
+
+
+class CentralitySnapshot:
+    """Immutable per-concept metrics computed at one graph version."""
+
+    def __init__(self, version: int, terms: list[str], degree: np.ndarray, document_frequency: np.ndarray, pagerank_scores: np.ndarray):
+        self.version = version
+        self.terms = terms
+        self.index = {term: i for i, term in enumerate(terms)}
+        self.metrics = {"pagerank": pagerank_scores, "degree": degree, "document_frequency": document_frequency}
+
+    def _metric_value(self, metric: str, i: int) -> float | int:
+        value = self.metrics[metric][i]
+        return float(value) if metric == "pagerank" else int(value)
+
+    def metrics_for(self, term: str) -> dict | None:
+        i = self.index.get(term)
+        if i is None:
+            return None
+        return {metric: self._metric_value(metric, i) for metric in CENTRALITY_METRICS}
+
+    def annotate(self, nodes: list[dict]):
+        """Sets every metric of CENTRALITY_METRICS on graph response nodes (None for concepts added after this
+           snapshot). Values the store already set (subgraph degrees, read at the response's version) are kept."""
+        index = self.index
+        for node in nodes:
+            i = index.get(node["id"])
+            for metric in CENTRALITY_METRICS:
+                if node.get(metric) is None:
+                    node[metric] = self._metric_value(metric, i) if i is not None else None
+
+    def top(self, limit: int, metric: str = "pagerank") -> list[dict]:
+        """The limit highest-ranked concepts (ties broken by first appearance); edge-only terms are skipped."""
+        if metric not in CENTRALITY_METRICS:
+            raise ValueError(f"Unknown ranking metric '{metric}', expected one of {CENTRALITY_METRICS}.")
+        candidates = np.flatnonzero(self.metrics["document_frequency"] > 0)
+        scores = self.metrics[metric][candidates]
+        if limit < len(candidates):
+            partition = np.argpartition(-scores, limit - 1)[:limit]
+            threshold = scores[partition].min()
+            keep = scores >= threshold # Everything tied with the cut-off competes on first appearance
+            candidates, scores = candidates[keep], scores[keep]
+        order = np.lexsort((candidates, -scores))[:limit]
+        return [{"id": self.terms[i], "name": self.terms[i], **self.metrics_for(self.terms[i])} for i in candidates[order]]
+
+
+EMPTY_SNAPSHOT = CentralitySnapshot(0, [], np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0))
+
+
+class GraphCentrality:
+    """Keeps a CentralitySnapshot of a graph store up to date with debounced background recomputes."""
+
+    def __init__(self, load_snapshot: Callable[[], dict], debounce_seconds: float = 2.0, damping: float = 0.85):
+        self.load_snapshot = load_snapshot
+        self.debounce_seconds = debounce_seconds
+        self.damping = damping
+        self.computations = 0
+        self.last_duration = 0.0
+        self.last_iterations = 0
+        self._snapshot = EMPTY_SNAPSHOT
+        self._lock = threading.Lock()
+        self._timer: threading.Timer | None = None
+        self._running = False
+        self._rerun = False
+        self._closed = False
+
+    def current(self) -> CentralitySnapshot:
+        return self._snapshot
+
+    def schedule(self):
+        """Requests a recompute; calls within the debounce window (or during a running computation) coalesce."""
+        with self._lock:
+            if self._closed or self._timer is not None:
+                return
+            self._timer = threading.Timer(self.debounce_seconds, self._run_scheduled)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def refresh_if_stale(self, graph_version: int):
+        """Schedules a recompute if the graph has changed since the current snapshot (e.g. in another worker)."""
+        if self._snapshot.version < graph_version:
+            self.schedule()
+
+    def _run_scheduled(self):
+        with self._lock:
+            self._timer = None
+            if self._running: # Picked up again once the running computation finishes
+                self._rerun = True
+                return
+            self._running = True
+        try:
+            self.recompute()
+        except Exception as e:
+            logger.error(f"Graph centrality recompute failed: {e}", exc_info=True)
+        finally:
+            with self._lock:
+                self._running = False
+                rerun, self._rerun = self._rerun, False
+        if rerun:
+            self.schedule()
+
+    def recompute(self) -> CentralitySnapshot:
+        """Computes all metrics from a fresh store snapshot (blocking) and publishes them."""
+        start = time.perf_counter()
+        data = self.load_snapshot()
+        terms = data["terms"]
+        node_count = len(terms)
+        links = np.array(data["links"], dtype=np.int64).reshape(-1, 3)
+        low, high, weights = links[:, 0], links[:, 1], links[:, 2]
+        degree = np.bincount(low, minlength=node_count) + np.bincount(high, minlength=node_count)
+        document_frequency = np.array(data["document_frequency"], dtype=np.int64)
+
+        previous = self._snapshot
+        initial = None
+        if previous.terms:
+            # Warm start: concepts keep their previous score, new ones start at the average
+            initial = np.full(node_count, 1.0 / max(node_count, 1))
+            known = [(i, previous.index[term]) for i, term in enumerate(terms) if term in previous.index]
+            if known:
+                new_positions, old_positions = np.array(known).T
+                initial[new_positions] = previous.metrics["pagerank"][old_positions]
+        scores, iterations = pagerank(node_count, low, high, weights, damping=self.damping, initial=initial)
+
+        snapshot = CentralitySnapshot(data["version"], terms, degree, document_frequency, scores)
+        with self._lock:
+            if snapshot.version >= self._snapshot.version:
+                self._snapshot = snapshot
+            self.computations += 1
+            self.last_duration = time.perf_counter() - start
+            self.last_iterations = iterations
+        logger.info(f"Recomputed graph centrality for {node_count} concepts and {len(links)} links at graph version "
+                    f"{snapshot.version} in {self.last_duration * 1000:.1f}ms ({iterations} PageRank iterations).")
+        return snapshot
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "version": self._snapshot.version,
+                "concepts": len(self._snapshot.terms),
+                "computations": self.computations,
+                "last_duration_ms": round(self.last_duration * 1000, 2),
+                "last_iterations": self.last_iterations,
+                "pending": self._timer is not None or self._running,
+            }
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""Compact, memory-mapped term -> definition store built from an offline dump (e.g. Wikipedia abstracts).
+
+The plain-text dump (one "term<TAB>definition" pair per line) is compiled once into a sorted blob file
+(sorted_blobs.py, the titles index's format) with two columns: the case-normalized UTF-8 terms, sorted
+bytewise, and their UTF-8 definitions. The file has its own magic and suffix (".defs.idx").
+
+Like the titles index, the file is mmap'ed read-only: loading is O(1), the pages are shared between
+worker processes, and a lookup is a binary search over the key blob (a few microseconds). Terms are
+normalized with titles_index.normalize_title; for duplicate terms the first definition in the dump wins.
+
+Build step (run from the backend directory):
+    python definition_store.py zhwiki-latest-abstracts.tsv
+"""
+
+import logging
+from pathlib import Path
+
+from sorted_blobs import SortedBlobFile, write_sorted_blobs
+from titles_index import normalize_title
+
+logger = logging.getLogger(__name__)
+
+STORE_MAGIC = b"MFDS"
+STORE_FORMAT_VERSION = 2
+STORE_FILE_SUFFIX = ".defs.idx"
+
+
+def default_store_path(dump_path: str | Path) -> Path:
+    """Returns the compiled store path that belongs next to a dump file."""
+    dump_path = Path(dump_path)
+    return dump_path.with_name(dump_path.name + STORE_FILE_SUFFIX)
+
+
+def build_definition_store(dump_path: str | Path, store_path: str | Path | None = None, max_chars: int = 0) -> int:
+    """Compiles a "term<TAB>definition" dump into the binary store format. Lines without a tab or with an
+       empty definition are skipped; definitions are cut to max_chars if it is positive. Returns the entry count."""
+    dump_path = Path(dump_path)
+    store_path = Path(store_path) if store_path else default_store_path(dump_path)
+
+    entries: dict[bytes, bytes] = {}
+    skipped = 0
+    with open(dump_path, "r", encoding="utf-8") as f:
+        for line in f:
+            term, sep, definition = line.rstrip("\r\n").partition("\t")
+            key = normalize_title(term).encode("utf-8")
+            definition = definition.strip()
+            if not sep or not key or not definition:
+                skipped += 1
+                continue
+            if max_chars > 0:
+                definition = definition[:max_chars]
+            entries.setdefault(key, definition.encode("utf-8"))
+    sorted_keys = sorted(entries) # Bytewise UTF-8 order == code point order
+    values = [entries[key] for key in sorted_keys]
+    del entries
+
+    write_sorted_blobs(store_path, STORE_MAGIC, STORE_FORMAT_VERSION, sorted_keys, values)
+
+    logger.info(f"Compiled {len(sorted_keys)} definitions from '{dump_path}' into store '{store_path}' "
+                f"({skipped} lines skipped, {store_path.stat().st_size} bytes).")
+    return len(sorted_keys)
+
+
+class LocalDefinitionStore:
+    """Read-only, memory-mapped term -> definition map with binary-search lookup."""
+
+    def __init__(self, store_path: str | Path):
+        self.path = Path(store_path)
+        self._file = SortedBlobFile(self.path, STORE_MAGIC, STORE_FORMAT_VERSION, 2, "definition store")
+        self._count = len(self._file)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def get(self, term: str) -> str | None:
+        """The stored definition of term (case-insensitive), or None."""
+        key = normalize_title(term).encode("utf-8")
+        if not key:
+            return None
+        i = self._file.find(key)
+        return self._file.value_at(1, i).decode("utf-8") if i is not None else None
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Compile a term<TAB>definition dump into a memory-mapped definition store.")
+    parser.add_argument("dump_file", help="Plain-text dump, one 'term<TAB>definition' pair per line.")
+    parser.add_argument("store_file", nargs="?", help=f"Output path (default: <dump_file>{STORE_FILE_SUFFIX}).")
+    parser.add_argument("--max-chars", type=int, default=0, help="Cut definitions to this many characters (default: keep them whole).")
+    args = parser.parse_args()
+    build_definition_store(args.dump_file, args.store_file, max_chars=args.max_chars)
@@ -0,0 +1,295 @@
+# -*- coding: utf-8 -*-
+"""Non-blocking concept definition lookups against the OwnThink knowledge graph API.
+
+Definitions are fetched with one pooled httpx.AsyncClient (keep-alive connections, bounded pool) so a slow
+OwnThink response only suspends the requesting coroutine instead of blocking the event loop. Results are
+kept in a TTL + LRU cache; "not found" answers are cached too, with a shorter TTL, while transport errors
+and unexpected responses are not cached. Concurrent lookups of the same term share one upstream request.
+DefinitionPrefetcher warms the cache in the background with its own, smaller concurrency budget.
+An optional LocalDefinitionStore (offline dump) is consulted first; OwnThink is only queried on its misses.
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+import httpx
+
+from definition_store import LocalDefinitionStore
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+class DefinitionCache:
+    """Thread-safe TTL + LRU cache of term -> definition (None meaning "known to have no definition")."""
+
+    def __init__(self, max_entries: int = 10000, ttl: float = 86400.0, negative_ttl: float = 3600.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, tuple[str | None, float]]" = OrderedDict()
+
+    def get(self, term: str, record_stats: bool = True):
+        """Returns the cached definition (possibly None), or _MISSING if absent or expired."""
+        with self._lock:
+            entry = self._entries.get(term)
+            if entry is None or entry[1] <= time.monotonic():
+                if entry is not None:
+                    del self._entries[term]
+                if record_stats:
+                    self.misses += 1
+                return _MISSING
+            self._entries.move_to_end(term)
+            if record_stats and entry[0] is None:
+                self.negative_hits += 1
+            elif record_stats:
+                self.hits += 1
+            return entry[0]
+
+    def put(self, term: str, definition: str | None):
+        if self.max_entries <= 0:
+            return
+        expires_at = time.monotonic() + (self.ttl if definition is not None else self.negative_ttl)
+        with self._lock:
+            self._entries[term] = (definition, expires_at)
+            self._entries.move_to_end(term)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.negative_hits + self.misses
+            return {
+                "hits": self.hits,
+                "negative_hits": self.negative_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.hits + self.negative_hits) / lookups, 4) if lookups else 0.0,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+            }
+
+
+class DefinitionLookupError(Exception):
+    """The definition source could not be queried or answered unexpectedly (the result is not cached)."""
+
+
+class OwnThinkDefinitionClient:
+    """Pooled, cached and coalescing async client for OwnThink entity descriptions, behind an optional local store.
+
+    An empty api_url disables remote lookups (terms missing from the local store have no definition)."""
+
+    def __init__(self, api_url: str, cache: DefinitionCache, timeout: float = 10.0, max_connections: int = 10,
+                 local_store: LocalDefinitionStore | None = None):
+        self.api_url = api_url
+        self.cache = cache
+        self.local_store = local_store
+        self.local_hits = 0
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.upstream_requests = 0
+        self.upstream_errors = 0
+        self.coalesced = 0
+        self._client: httpx.AsyncClient | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._inflight: dict[str, asyncio.Future] = {}
+
+    def _client_for_running_loop(self) -> httpx.AsyncClient:
+        # Pooled connections belong to the event loop that opened them; the server runs a single loop, but
+        # e.g. test clients may start a new one per request
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._loop is not loop:
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_connections),
+            )
+            self._loop = loop
+            self._inflight = {}
+        return self._client
+
+    def cached_definition(self, term: str) -> tuple[bool, str | None]:
+        """(True, definition) if the local store or the cache can answer for term without a request, else (False, None)."""
+        if self.local_store is not None:
+            definition = self.local_store.get(term)
+            if definition is not None:
+                self.local_hits += 1
+                return True, definition
+        cached = self.cache.get(term)
+        return (False, None) if cached is _MISSING else (True, cached)
+
+    def _peek(self, term: str):
+        """Like cached_definition, but returns the definition or _MISSING and leaves the counters alone."""
+        if self.local_store is not None:
+            definition = self.local_store.get(term)
+            if definition is not None:
+                return definition
+        return self.cache.get(term, record_stats=False)
+
+    def is_answerable(self, term: str) -> bool:
+        """Whether a lookup of term would be served without querying OwnThink."""
+        return self._peek(term) is not _MISSING
+
+    async def get_definition(self, term: str) -> str | None:
+        """The definition of term, or None if OwnThink has none or could not be reached."""
+        found, definition = self.cached_definition(term)
+        if found:
+            return definition
+        return await self.fetch_definition(term)
+
+    async def fetch_definition(self, term: str) -> str | None:
+        """Resolves a term that missed the cache: joins an identical in-flight lookup or queries OwnThink.
+
+        If the request that owns a joined lookup is cancelled (e.g. its client disconnected), the waiters
+        retry, and one of them takes the lookup over."""
+        while True:
+            cached = self._peek(term) # The cache may have been filled since the caller's check
+            if cached is not _MISSING:
+                return cached
+            client = self._client_for_running_loop()
+            inflight = self._inflight.get(term)
+            if inflight is None:
+                break
+            self.coalesced += 1
+            try:
+                return await asyncio.shield(inflight)
+            except asyncio.CancelledError:
+                if not inflight.cancelled() or asyncio.current_task().cancelling():
+                    raise # This request itself was cancelled
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[term] = future
+        try:
+            definition = await self._fetch(client, term)
+            self.cache.put(term, definition)
+        except DefinitionLookupError as e:
+            self.upstream_errors += 1
+            logger.error(f"Definition lookup for '{term}' failed: {e}")
+            definition = None
+        except BaseException:
+            future.cancel() # Waiters retry instead of reporting "no definition"
+            raise
+        finally:
+            if self._inflight.get(term) is future:
+                del self._inflight[term]
+        future.set_result(definition)
+        return definition
+
+    async def _fetch(self, client: httpx.AsyncClient, term: str) -> str | None:
+        """Queries OwnThink; returns None for "no definition" answers, raises DefinitionLookupError otherwise."""
+        if not self.api_url:
+            return None
+        logger.info(f"Fetching definition for term '{term}' from OwnThink API.")
+        self.upstream_requests += 1
+        try:
+            response = await client.post(self.api_url, json={"entity": term})
+        except httpx.HTTPError as e:
+            raise DefinitionLookupError(f"{type(e).__name__}: {e}") from e
+        if response.status_code != 200:
+            raise DefinitionLookupError(f"HTTP {response.status_code}: {response.text[:200]}")
+        try:
+            data = response.json()
+        except ValueError as e:
+            raise DefinitionLookupError(f"Invalid JSON response: {e}") from e
+        if not isinstance(data, dict) or data.get("message") != "success":
+            raise DefinitionLookupError(f"Non-success response: {str(data)[:200]}")
+        definition = (data.get("data") or {}).get("desc")
+        if not definition:
+            logger.info(f"OwnThink API has no description for '{term}'.")
+            return None
+        logger.info(f"Successfully fetched definition for '{term}' from OwnThink: {definition[:50]}...")
+        return definition
+
+    def stats(self) -> dict:
+        return {
+            **self.cache.stats(),
+            "local_hits": self.local_hits,
+            "local_entries": len(self.local_store) if self.local_store is not None else 0,
+            "upstream_requests": self.upstream_requests,
+            "upstream_errors": self.upstream_errors,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._inflight),
+        }
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+class DefinitionPrefetcher:
+    """Warms the definition cache in the background, e.g. for the top concepts of a freshly processed document.
+
+    Prefetch lookups run as tasks on the server's event loop (bind() it at startup) and share the client's
+    cache, pool and in-flight requests, but at most `concurrency` of them query OwnThink at a time, so they
+    leave most of the connection pool to interactive lookups. Terms are fetched in submission order;
+    submissions beyond max_pending queued terms are dropped."""
+
+    def __init__(self, client: OwnThinkDefinitionClient, concurrency: int = 2, max_pending: int = 1000):
+        self.client = client
+        self.concurrency = max(1, concurrency)
+        self.max_pending = max_pending
+        self.queued = 0
+        self.completed = 0
+        self.skipped = 0 # Already cached or already queued
+        self.dropped = 0
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._semaphore: asyncio.Semaphore | None = None
+        self._pending: dict[str, asyncio.Task] = {}
+
+    def bind(self, loop: asyncio.AbstractEventLoop):
+        self._loop = loop
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        self._pending = {}
+
+    def submit(self, terms: list[str]):
+        """Queues terms for prefetching; safe to call from any thread. No-op until bound to a running loop."""
+        loop = self._loop
+        if loop is None or not terms:
+            return
+        try:
+            loop.call_soon_threadsafe(self._enqueue, list(terms))
+        except RuntimeError: # Loop closed during shutdown
+            pass
+
+    def _enqueue(self, terms: list[str]):
+        for term in terms:
+            if term in self._pending or self.client.is_answerable(term):
+                self.skipped += 1
+            elif len(self._pending) >= self.max_pending:
+                self.dropped += 1
+            else:
+                self.queued += 1
+                self._pending[term] = asyncio.ensure_future(self._prefetch(term))
+
+    async def _prefetch(self, term: str):
+        try:
+            async with self._semaphore:
+                await self.client.fetch_definition(term)
+            self.completed += 1
+        except Exception as e:
+            logger.error(f"Prefetching definition for '{term}' failed: {e}")
+        finally:
+            self._pending.pop(term, None)
+
+    def stats(self) -> dict:
+        return {
+            "prefetch_queued": self.queued,
+            "prefetch_completed": self.completed,
+            "prefetch_skipped": self.skipped,
+            "prefetch_dropped": self.dropped,
+            "prefetch_pending": len(self._pending),
+        }
+
+    async def aclose(self):
+        tasks = list(self._pending.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._loop = None
@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+"""Batch difficulty scoring for all text blocks of a document.
+
+Every block is reduced to one row of integer features (FEATURES: concept hits, formula count and length,
+figures and tables on its page, citations, long sentences). The weighted scores of all blocks are then
+computed with NumPy in one shot, column by column in the same order as the per-segment scorer in main.py,
+so the scores (and the rounded values in the markers) are identical to it. Only blocks with a non-zero
+score become markers; optionally their scores are replaced by their percentile within the document.
+"""
+
+import numpy as np
+
+from lexical_scanner import LexicalScanner
+from term_matcher import TermMatcher
+
+# Weights of the difficulty indicators
+WEIGHT_TERM_DENSITY = 0.30
+WEIGHT_FORMULA_COMPLEXITY = 0.25
+WEIGHT_FIGURE_TABLE = 0.20
+WEIGHT_CITATION_DENSITY = 0.15
+WEIGHT_LONG_SENTENCE = 0.10
+
+# Other existing constants for thresholds
+LONG_SENTENCE_CHAR_THRESHOLD = 120
+
+# Thresholds for formula complexity (tiered scoring)
+FORMULA_COUNT_THRESHOLD_LOW = 1
+FORMULA_COUNT_THRESHOLD_HIGH = 3 # Stricter high threshold
+FORMULA_LENGTH_THRESHOLD_LOW = 20  # Total characters for low complexity
+FORMULA_LENGTH_THRESHOLD_HIGH = 80 # Stricter high threshold for total length
+
+SCORE_NORMALIZATION_MODES = ("none", "percentile")
+
+# Everything score_features() uses besides the features themselves; callers may override any of them
+# (LONG_SENTENCE_CHAR_THRESHOLD is applied while extracting features and cannot be changed afterwards)
+DEFAULT_SCORING_PARAMETERS = {
+    "weight_term_density": WEIGHT_TERM_DENSITY,
+    "weight_formula_complexity": WEIGHT_FORMULA_COMPLEXITY,
+    "weight_figure_table": WEIGHT_FIGURE_TABLE,
+    "weight_citation_density": WEIGHT_CITATION_DENSITY,
+    "weight_long_sentence": WEIGHT_LONG_SENTENCE,
+    "formula_count_threshold_low": FORMULA_COUNT_THRESHOLD_LOW,
+    "formula_count_threshold_high": FORMULA_COUNT_THRESHOLD_HIGH,
+    "formula_length_threshold_low": FORMULA_LENGTH_THRESHOLD_LOW,
+    "formula_length_threshold_high": FORMULA_LENGTH_THRESHOLD_HIGH,
+}
+
+FEATURES = ("term_count", "formula_count", "formula_length", "figure_count", "table_count", "citation_count", "long_sentence_count")
+(TERM_COUNT, FORMULA_COUNT, FORMULA_LENGTH, FIGURE_COUNT, TABLE_COUNT,
+ CITATION_COUNT, LONG_SENTENCE_COUNT) = range(len(FEATURES))
+
+LEXICAL_SCANNER = LexicalScanner(LONG_SENTENCE_CHAR_THRESHOLD)
+
+
+def block_features(text: str, figure_count: int, table_count: int, term_matcher: TermMatcher) -> tuple[int, ...]:
+    """The FEATURES row of one text block; term and formula matching run on the lowercased, stripped text."""
+    text_lower = text.lower().strip()
+    if not text_lower:
+        return (0,) * len(FEATURES)
+    scan = LEXICAL_SCANNER.scan(text, text_lower)
+    return (
+        len(term_matcher.find_terms(text_lower)),
+        len(scan.formula_spans),
+        sum(end - start for start, end in scan.formula_spans),
+        figure_count,
+        table_count,
+        len(scan.citation_spans),
+        len(scan.long_sentence_lengths),
+    )
+
+
+def score_features(features: np.ndarray, parameters: dict | None = None) -> np.ndarray:
+    """Weighted difficulty scores (unrounded) of a FEATURES matrix, one row per block.
+
+    parameters overrides entries of DEFAULT_SCORING_PARAMETERS."""
+    p = {**DEFAULT_SCORING_PARAMETERS, **(parameters or {})}
+    features = features.astype(np.float64)
+    formula_count, formula_length = features[:, FORMULA_COUNT], features[:, FORMULA_LENGTH]
+    formula_complexity = np.select(
+        [
+            (formula_count >= p["formula_count_threshold_high"]) | (formula_length >= p["formula_length_threshold_high"]),
+            (formula_count >= p["formula_count_threshold_low"]) | (formula_length >= p["formula_length_threshold_low"]),
+            (formula_count > 0) | (formula_length > 0),
+        ],
+        [1.0, 0.6, 0.2],
+        0.0,
+    )
+    figure_table = features[:, FIGURE_COUNT] + features[:, TABLE_COUNT]
+    # Accumulated left to right like the scalar sum, so every score is bit-identical to it
+    scores = features[:, TERM_COUNT] * p["weight_term_density"]
+    scores = scores + formula_complexity * p["weight_formula_complexity"]
+    scores = scores + figure_table * p["weight_figure_table"]
+    scores = scores + features[:, CITATION_COUNT] * p["weight_citation_density"]
+    scores = scores + features[:, LONG_SENTENCE_COUNT] * p["weight_long_sentence"]
+    return scores
+
+
+def percentile_ranks(scores: list[float]) -> list[float]:
+    """Share of the scores that are <= each score (in (0, 1])."""
+    ordered = np.sort(np.asarray(scores, dtype=np.float64))
+    return (np.searchsorted(ordered, scores, side="right") / len(ordered)).tolist()
+
+
+def difficulty_reasons(row: list[int]) -> list[str]:
+    """The marker reasons for a FEATURES row, in the sorted order the per-segment scorer reports them."""
+    term_count, formula_count, formula_length, figure_count, table_count, citation_count, long_sentence_count = row
+    reasons = []
+    # Appended in alphabetical order of the reason names, so no sort is needed
+    if citation_count > 0:
+        reasons.append(f"citations_in_segment ({citation_count})")
+    if figure_count > 0:
+        reasons.append(f"figures_on_page ({figure_count})")
+    if formula_count > 0 or formula_length > 0:
+        reasons.append(f"formulas_in_segment (count: {formula_count}, length: {formula_length})")
+    if long_sentence_count > 0:
+        reasons.append(f"long_sentences_in_segment ({long_sentence_count})")
+    if table_count > 0:
+        reasons.append(f"tables_on_page ({table_count})")
+    if term_count > 0:
+        reasons.append(f"term_density_segment ({term_count})")
+    return reasons
+
+
+def score_blocks(feature_rows: list[tuple[int, ...]] | np.ndarray, normalization: str = "none",
+                 parameters: dict | None = None) -> list[tuple[int, float, list[str]]]:
+    """(row index, score, reasons) for every block with a positive (rounded) score, in row order.
+
+    With normalization="percentile" the score is the block's percentile among these blocks instead.
+    parameters overrides entries of DEFAULT_SCORING_PARAMETERS."""
+    if normalization not in SCORE_NORMALIZATION_MODES:
+        raise ValueError(f"Unknown score normalization '{normalization}', expected one of {SCORE_NORMALIZATION_MODES}.")
+    if len(feature_rows) == 0:
+        return []
+    features = np.asarray(feature_rows, dtype=np.int64)
+    scores = score_features(features, parameters)
+    candidates = np.flatnonzero(scores > 0)
+    # Python's round() per marker keeps the rounding identical to the scalar scorer
+    scored = [(int(i), round(float(scores[i]), 3)) for i in candidates]
+    scored = [(i, score) for i, score in scored if score > 0]
+    if normalization == "percentile" and scored:
+        ranks = percentile_ranks([score for _, score in scored])
+        scored = [(i, round(rank, 3)) for (i, _), rank in zip(scored, ranks)]
+    rows = features[[i for i, _ in scored]].tolist() if scored else []
+    return [(i, score, difficulty_reasons(row)) for (i, score), row in zip(scored, rows)]
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+"""Fast JSON serialization for large API responses.
+
+FastAPI validates a returned payload against the endpoint's response_model, converts it with
+jsonable_encoder and only then encodes it, which dominates CPU time for big documents and graphs.
+Payloads built from plain dicts/lists/tuples can instead be encoded directly with orjson (optional
+dependency; falls back to the standard json module) and returned as a FastJSONResponse. The endpoint
+keeps its response_model, so the OpenAPI schema is unchanged; fill_defaults() adds the optional
+fields the model would have filled in, so the JSON matches the validated output.
+"""
+
+import json
+from functools import lru_cache
+from typing import Any, Iterable
+
+from fastapi.responses import Response
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError: # Optional dependency
+    orjson = None
+
+JSON_ENCODER = "orjson" if orjson is not None else "json"
+
+
+def dumps(content: Any) -> bytes:
+    """Encodes plain Python data (dict/list/tuple/str/int/float/bool/None) as compact UTF-8 JSON."""
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(Response):
+    """JSON response for pre-shaped plain data; skips response_model validation and jsonable_encoder."""
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+@lru_cache(maxsize=None)
+def _field_defaults(model: type[BaseModel]) -> tuple:
+    return tuple(
+        (name, field.default) for name, field in model.model_fields.items()
+        if not field.is_required() and field.default_factory is None
+    )
+
+
+def fill_defaults(items: Iterable[dict], model: type[BaseModel]) -> None:
+    """Sets the model's default for every optional field missing from each dict (in place)."""
+    defaults = _field_defaults(model)
+    for item in items:
+        for name, default in defaults:
+            if name not in item:
+                item[name] = default
@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+"""Per-document storage of the difficulty feature rows computed during upload (difficulty.FEATURES).
+
+Keeping the raw features lets a document, or the whole library, be re-scored with other weights and
+thresholds without the PDF or HanLP. Each document is one record: the segments that have any non-zero
+feature (page index, block index, text preview) and their feature matrix, packed as little-endian int32.
+Blocks whose features are all zero score 0 under any weights and are not stored.
+
+Like the graph store there are two interchangeable backends: SQLiteSegmentFeatureStore (persistent,
+shared by all workers; WAL mode) and MemorySegmentFeatureStore.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Iterator
+
+import numpy as np
+
+from difficulty import FEATURES
+
+_FEATURE_DTYPE = np.dtype("<i4")
+_FEATURE_NAMES = ",".join(FEATURES)
+
+
+def pack_segment_features(segments: list[tuple[int, int, str]], feature_rows: list[tuple[int, ...]]) -> tuple[list, np.ndarray]:
+    """Drops all-zero rows; returns (segment metadata, features matrix). Packing a packed record changes nothing."""
+    features = np.array(feature_rows, dtype=_FEATURE_DTYPE).reshape(-1, len(FEATURES))
+    keep = np.flatnonzero(features.any(axis=1))
+    return [list(segments[i]) for i in keep], features[keep]
+
+
+class MemorySegmentFeatureStore:
+    """Segment features held in a dict; lost on restart and private to one worker process."""
+
+    def __init__(self):
+        self._documents: dict[str, tuple[list, np.ndarray]] = {}
+        self._lock = threading.Lock()
+
+    def put_document(self, doc_id: str, segments: list[tuple[int, int, str]], feature_rows: list[tuple[int, ...]]):
+        """Stores (replaces) a document's features; segments[i] = (page_index, block_index_on_page, text_preview)."""
+        record = pack_segment_features(segments, feature_rows)
+        with self._lock:
+            self._documents[doc_id] = record
+
+    def get_document(self, doc_id: str) -> tuple[list, np.ndarray] | None:
+        """(segments, features) of a document, or None if nothing is stored for it."""
+        with self._lock:
+            return self._documents.get(doc_id)
+
+    def iter_documents(self, doc_ids: list[str] | None = None) -> Iterator[tuple[str, list, np.ndarray]]:
+        with self._lock:
+            records = [(doc_id, self._documents.get(doc_id)) for doc_id in doc_ids] if doc_ids is not None else list(self._documents.items())
+        for doc_id, record in records:
+            if record is not None:
+                yield doc_id, *record
+
+    def remove_document(self, doc_id: str) -> bool:
+        with self._lock:
+            return self._documents.pop(doc_id, None) is not None
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"backend": "memory", "documents": len(self._documents), "segments": sum(len(s) for s, _ in self._documents.values())}
+
+    def close(self):
+        pass
+
+
+class SQLiteSegmentFeatureStore:
+    """Segment features persisted in SQLite, one row per document. Each thread gets its own connection."""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS segment_features (
+            doc_id TEXT PRIMARY KEY,
+            feature_names TEXT NOT NULL,    -- Comma-separated difficulty.FEATURES the matrix was written with
+            segment_count INTEGER NOT NULL,
+            segments TEXT NOT NULL,         -- JSON [[page_index, block_index_on_page, text_preview], ...]
+            features BLOB NOT NULL,         -- int32 little-endian, segment_count x len(feature_names)
+            updated_at REAL NOT NULL
+        );
+    """
+
+    def __init__(self, db_path: str | Path):
+        self.db_path = Path(db_path)
+        self._local = threading.local()
+        self._connections: list[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+        self._connection().executescript(self.SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.db_path), timeout=30, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    def put_document(self, doc_id: str, segments: list[tuple[int, int, str]], feature_rows: list[tuple[int, ...]]):
+        """Stores (replaces) a document's features; segments[i] = (page_index, block_index_on_page, text_preview)."""
+        kept_segments, features = pack_segment_features(segments, feature_rows)
+        self._connection().execute(
+            "INSERT OR REPLACE INTO segment_features (doc_id, feature_names, segment_count, segments, features, updated_at)"
+            " VALUES (?, ?, ?, ?, ?, ?)",
+            (doc_id, _FEATURE_NAMES, len(kept_segments), json.dumps(kept_segments, ensure_ascii=False), features.tobytes(), time.time()),
+        )
+
+    @staticmethod
+    def _decode(row: tuple) -> tuple[list, np.ndarray] | None:
+        feature_names, segment_count, segments, features = row
+        if feature_names != _FEATURE_NAMES: # Written by a version with another feature layout
+            return None
+        return json.loads(segments), np.frombuffer(features, dtype=_FEATURE_DTYPE).reshape(segment_count, len(FEATURES))
+
+    def get_document(self, doc_id: str) -> tuple[list, np.ndarray] | None:
+        """(segments, features) of a document, or None if nothing (usable) is stored for it."""
+        row = self._connection().execute(
+            "SELECT feature_names, segment_count, segments, features FROM segment_features WHERE doc_id = ?", (doc_id,)
+        ).fetchone()
+        return self._decode(row) if row is not None else None
+
+    def iter_documents(self, doc_ids: list[str] | None = None) -> Iterator[tuple[str, list, np.ndarray]]:
+        conn = self._connection()
+        if doc_ids is None:
+            rows = conn.execute("SELECT doc_id, feature_names, segment_count, segments, features FROM segment_features ORDER BY doc_id")
+        else:
+            rows = (
+                row for doc_id in doc_ids for row in
+                conn.execute("SELECT doc_id, feature_names, segment_count, segments, features FROM segment_features WHERE doc_id = ?", (doc_id,))
+            )
+        for doc_id, *row in rows:
+            record = self._decode(row)
+            if record is not None:
+                yield doc_id, *record
+
+    def remove_document(self, doc_id: str) -> bool:
+        return self._connection().execute("DELETE FROM segment_features WHERE doc_id = ?", (doc_id,)).rowcount > 0
+
+    def stats(self) -> dict:
+        documents, segments = self._connection().execute("SELECT COUNT(*), COALESCE(SUM(segment_count), 0) FROM segment_features").fetchone()
+        return {"backend": "sqlite", "documents": documents, "segments": segments}
+
+    def close(self):
+        with self._connections_lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+        self._local = threading.local()
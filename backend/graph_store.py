@@ -0,0 +1,948 @@
+# -*- coding: utf-8 -*-
+"""Storage backends for the global knowledge graph (documents, concepts, membership, labelled edges).
+
+Two interchangeable backends share one interface:
+
+- SQLiteGraphStore: persistent, indexed tables in an embedded SQLite database (WAL mode), so the graph
+  survives restarts and every uvicorn worker process sees the same graph.
+- MemoryGraphStore: the original module-level dict of sets, for tests and throwaway deployments.
+
+Read methods return plain dicts shaped like the /global-graph response models, plus the "version" they were
+read at. Every write bumps that graph version number (shared through the database for SQLite), which keys
+response caches and ETags. Both backends also keep an
+undirected concept adjacency list (with per-pair edge counts), degree and document frequency, which back the
+neighborhood, top-N and cursor-paginated listing queries without scanning the whole graph. Removing or
+re-ingesting a document (remove_document / replace_document_graph) applies only that document's delta to
+all of these, dropping concepts no document refers to any more. link_snapshot() exports the adjacency for
+whole-graph centrality computations (centrality.py).
+"""
+
+import base64
+import bisect
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterable, Iterator
+
+logger = logging.getLogger(__name__)
+
+SQLITE_MAX_VARIABLES = 900 # Stay below SQLITE_MAX_VARIABLE_NUMBER of older SQLite builds
+
+Edge = tuple[str, str, str | None] # (source term, target term, label)
+
+RANKING_METRICS = ("degree", "document_frequency")
+
+
+def _batched(items: list, size: int = SQLITE_MAX_VARIABLES) -> Iterator[list]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _encode_cursor(position: list) -> str:
+    """Opaque, URL-safe pagination cursor for a backend-specific position."""
+    return base64.urlsafe_b64encode(json.dumps(position, ensure_ascii=False).encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def _decode_cursor(cursor: str, length: int) -> list:
+    try:
+        position = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"Invalid cursor: {e}") from None
+    if not isinstance(position, list) or len(position) != length:
+        raise ValueError("Invalid cursor.")
+    return position
+
+
+class _SequenceIndex:
+    """Keys in insertion order with stable sequence numbers (used as sort keys and pagination cursors).
+
+    Removed keys leave tombstones in the ordered list; once tombstones outnumber live keys the list is
+    compacted, which keeps memory proportional to the live keys without renumbering anything."""
+
+    def __init__(self):
+        self._sequence: dict = {}  # key -> sequence number
+        self._keys: list = []      # keys by ascending sequence number, tombstones included
+        self._numbers: list[int] = []
+        self._next = 0
+
+    def add(self, key):
+        if key not in self._sequence:
+            self._sequence[key] = self._next
+            self._keys.append(key)
+            self._numbers.append(self._next)
+            self._next += 1
+
+    def discard(self, key):
+        if self._sequence.pop(key, None) is not None and len(self._keys) > 2 * len(self._sequence) + 64:
+            live = [(number, key) for number, key in zip(self._numbers, self._keys) if self._sequence.get(key) == number]
+            self._numbers = [number for number, _ in live]
+            self._keys = [key for _, key in live]
+
+    def __getitem__(self, key) -> int:
+        return self._sequence[key]
+
+    def get(self, key, default=None):
+        return self._sequence.get(key, default)
+
+    def __contains__(self, key) -> bool:
+        return key in self._sequence
+
+    def __len__(self) -> int:
+        return len(self._sequence)
+
+    def __iter__(self) -> Iterator:
+        return (key for _, key in self.iter_after(-1))
+
+    def iter_after(self, number: int) -> Iterator[tuple[int, object]]:
+        """(sequence number, key) of the live keys numbered above number, in order."""
+        for position in range(bisect.bisect_right(self._numbers, number), len(self._keys)):
+            key = self._keys[position]
+            if self._sequence.get(key) == self._numbers[position]:
+                yield self._numbers[position], key
+
+
+class _RankIndex:
+    """Keys ranked by an integer score (highest first), ties broken by ascending sequence number.
+
+    Every score has a bucket of the sorted sequence numbers holding it and the distinct scores are kept
+    sorted, so top() reads only the entries it returns and a score change costs two bisections."""
+
+    def __init__(self):
+        self._ranks: dict = {}                  # key -> (score, sequence number)
+        self._keys: dict[int, object] = {}      # sequence number -> key
+        self._buckets: dict[int, list[int]] = {} # score -> sorted sequence numbers
+        self._scores: list[int] = []            # Scores with a non-empty bucket, ascending
+
+    def set(self, key, number: int, score: int):
+        if self._ranks.get(key) == (score, number):
+            return
+        self.discard(key)
+        self._ranks[key] = (score, number)
+        self._keys[number] = key
+        bucket = self._buckets.get(score)
+        if bucket is None:
+            bucket = self._buckets[score] = []
+            bisect.insort(self._scores, score)
+        bisect.insort(bucket, number)
+
+    def discard(self, key):
+        rank = self._ranks.pop(key, None)
+        if rank is None:
+            return
+        score, number = rank
+        del self._keys[number]
+        bucket = self._buckets[score]
+        del bucket[bisect.bisect_left(bucket, number)]
+        if not bucket:
+            del self._buckets[score]
+            del self._scores[bisect.bisect_left(self._scores, score)]
+
+    def top(self, limit: int) -> list:
+        keys = []
+        for score in reversed(self._scores):
+            for number in self._buckets[score]:
+                if len(keys) >= limit:
+                    return keys
+                keys.append(self._keys[number])
+        return keys
+
+
+class MemoryGraphStore:
+    """In-process graph held in dicts and sets; lost on restart and private to one worker process.
+
+    Besides the global node/edge collections it keeps doc_id -> edges and doc_id -> terms indexes, updated on
+    ingest, so a document-filtered query costs time proportional to the selected documents, not the corpus.
+    Adjacency and outgoing-edge lists do the same for neighborhood queries, and one rank index per
+    RANKING_METRICS entry (maintained on every contribution change) for top-N queries."""
+
+    def __init__(self):
+        self.graph = {
+            "nodes": {},  # { "concept_term": { "name": "concept_term", "document_ids": set(), ...other_attrs } }
+            "edges": set(), # { ("source_term", "target_term", "label", "document_id") }
+            "documents": {} # { "document_id": { "title": "doc_title", ... } }
+        }
+        self._document_edges: dict[str, set[tuple]] = {} # doc_id -> edge tuples of that document
+        self._document_terms: dict[str, set[str]] = {}   # doc_id -> concept terms of that document
+        self._document_order = _SequenceIndex()          # doc_id -> registration sequence number
+        self._node_order = _SequenceIndex()              # term -> first-seen sequence number
+        self._adjacency: dict[str, dict[str, int]] = {}  # term -> {neighbouring term: edge count}, undirected, no self-loops
+        self._outgoing_edges: dict[str, set[tuple]] = {} # source term -> edge tuples
+        self._ranks = {metric: _RankIndex() for metric in RANKING_METRICS} # Concepts by degree / document frequency
+        self._version = 0
+        self._lock = threading.Lock()
+
+    def version(self) -> int:
+        """Increases with every write."""
+        with self._lock:
+            return self._version
+
+    def add_document(self, doc_id: str, title: str):
+        with self._lock:
+            self.graph["documents"][doc_id] = {"id": doc_id, "title": title}
+            self._version += 1
+            self._document_order.add(doc_id)
+            self._document_edges.setdefault(doc_id, set())
+            self._document_terms.setdefault(doc_id, set())
+
+    def has_document(self, doc_id: str) -> bool:
+        with self._lock:
+            return doc_id in self.graph["documents"]
+
+    def _require_document(self, doc_id: str):
+        if doc_id not in self.graph["documents"]:
+            raise KeyError(f"Document '{doc_id}' is not registered in the graph store.")
+
+    def add_document_graph(self, doc_id: str, concept_terms: Iterable[str], edges: Iterable[Edge]):
+        """Adds a registered document's concepts and labelled edges."""
+        with self._lock:
+            self._require_document(doc_id)
+            self._version += 1
+            self._add_contribution(doc_id, concept_terms, [(source, target, label, doc_id) for source, target, label in edges])
+
+    def replace_document_graph(self, doc_id: str, concept_terms: Iterable[str], edges: Iterable[Edge]):
+        """Sets a registered document's concepts and edges to exactly the given ones (re-ingest). Only the
+           delta against the stored contribution is applied; concepts left without documents are dropped."""
+        concept_terms = list(dict.fromkeys(concept_terms))
+        new_edges = list(dict.fromkeys((source, target, label, doc_id) for source, target, label in edges))
+        with self._lock:
+            self._require_document(doc_id)
+            self._version += 1
+            kept_terms, kept_edges = set(concept_terms), set(new_edges)
+            self._remove_contribution(
+                doc_id,
+                [term for term in self._document_terms[doc_id] if term not in kept_terms],
+                [edge for edge in self._document_edges[doc_id] if edge not in kept_edges],
+            )
+            self._add_contribution(doc_id, concept_terms, new_edges)
+
+    def remove_document(self, doc_id: str) -> bool:
+        """Removes a document with its concept memberships and edges, in time proportional to its contribution.
+           Concepts left without documents are dropped. Returns False if the document is unknown."""
+        with self._lock:
+            if doc_id not in self.graph["documents"]:
+                return False
+            self._version += 1
+            self._remove_contribution(doc_id, list(self._document_terms[doc_id]), list(self._document_edges[doc_id]))
+            del self.graph["documents"][doc_id]
+            del self._document_terms[doc_id]
+            del self._document_edges[doc_id]
+            self._document_order.discard(doc_id)
+        return True
+
+    def _add_contribution(self, doc_id: str, concept_terms: Iterable[str], edges: Iterable[tuple]):
+        document_terms = self._document_terms[doc_id]
+        document_edges = self._document_edges[doc_id]
+        for term in concept_terms:
+            if term not in self.graph["nodes"]:
+                self.graph["nodes"][term] = {"name": term, "document_ids": set()}
+                self._node_order.add(term)
+            self.graph["nodes"][term]["document_ids"].add(doc_id)
+            document_terms.add(term)
+            self._rerank(term)
+        for edge in edges:
+            source, target = edge[0], edge[1]
+            if edge in document_edges:
+                continue
+            self.graph["edges"].add(edge)
+            document_edges.add(edge)
+            self._outgoing_edges.setdefault(source, set()).add(edge)
+            if source != target:
+                for a, b in ((source, target), (target, source)):
+                    neighbours = self._adjacency.setdefault(a, {})
+                    neighbours[b] = neighbours.get(b, 0) + 1
+                    if neighbours[b] == 1: # New neighbour: the degree changed
+                        self._rerank(a)
+
+    def _remove_contribution(self, doc_id: str, terms: list[str], edges: list[tuple]):
+        """Inverse of _add_contribution for the given subset of a document's terms and edges."""
+        document_terms = self._document_terms[doc_id]
+        document_edges = self._document_edges[doc_id]
+        for edge in edges:
+            source, target = edge[0], edge[1]
+            self.graph["edges"].discard(edge)
+            document_edges.discard(edge)
+            outgoing = self._outgoing_edges[source]
+            outgoing.discard(edge)
+            if not outgoing:
+                del self._outgoing_edges[source]
+            if source != target:
+                for a, b in ((source, target), (target, source)):
+                    neighbours = self._adjacency[a]
+                    neighbours[b] -= 1
+                    if not neighbours[b]:
+                        del neighbours[b]
+                        if not neighbours:
+                            del self._adjacency[a]
+                        self._rerank(a)
+        for term in terms:
+            document_terms.discard(term)
+            node = self.graph["nodes"][term]
+            node["document_ids"].discard(doc_id)
+            if not node["document_ids"]: # Orphaned: no document mentions the concept any more
+                del self.graph["nodes"][term]
+                self._node_order.discard(term)
+            self._rerank(term)
+
+    def _rerank(self, term: str):
+        """Brings the rank indexes up to date for a concept whose degree or documents changed."""
+        node = self.graph["nodes"].get(term)
+        if node is None: # Edge-only term, or a concept just dropped
+            for ranks in self._ranks.values():
+                ranks.discard(term)
+            return
+        number = self._node_order[term]
+        self._ranks["degree"].set(term, number, self._degree(term))
+        self._ranks["document_frequency"].set(term, number, len(node["document_ids"]))
+
+    def get_graph(self, document_ids: list[str] | None = None) -> dict:
+        """Documents, linked concepts and edges, optionally restricted to the given documents."""
+        with self._lock:
+            if document_ids:
+                selected_doc_ids = sorted({doc_id for doc_id in document_ids if doc_id in self.graph["documents"]}, key=self._document_order.__getitem__)
+                documents = {doc_id: self.graph["documents"][doc_id] for doc_id in selected_doc_ids}
+                links = [edge for doc_id in selected_doc_ids for edge in self._document_edges[doc_id]]
+                linked_terms = {term for s, t, _, _ in links for term in (s, t)}
+                # Only concepts of the selected documents can become nodes
+                candidate_terms = set().union(*(self._document_terms[doc_id] for doc_id in selected_doc_ids)) & linked_terms
+                node_terms = sorted(candidate_terms, key=self._node_order.__getitem__)
+                node_doc_ids = {
+                    term: [doc_id for doc_id in selected_doc_ids if term in self._document_terms[doc_id]]
+                    for term in node_terms
+                }
+            else:
+                documents = dict(self.graph["documents"])
+                links = list(self.graph["edges"])
+                linked_terms = {term for s, t, _, _ in links for term in (s, t)}
+                node_doc_ids = {
+                    term: list(node_data["document_ids"])
+                    for term, node_data in self.graph["nodes"].items() if term in linked_terms and node_data["document_ids"]
+                }
+            doc_id_to_index = {doc_id: i for i, doc_id in enumerate(documents)}
+            nodes = [
+                {"id": term, "name": term, "document_ids": doc_ids, "category_index": doc_id_to_index.get(doc_ids[0])}
+                for term, doc_ids in node_doc_ids.items()
+            ]
+            version = self._version
+        return {
+            "version": version,
+            "nodes": nodes,
+            "links": [{"source": s, "target": t, "label": label, "document_id": doc_id} for s, t, label, doc_id in links],
+            "documents": [{"id": doc["id"], "title": doc["title"]} for doc in documents.values()],
+        }
+
+    def _degree(self, term: str) -> int:
+        return len(self._adjacency.get(term, ()))
+
+    def _node_item(self, term: str) -> dict:
+        document_ids = sorted(self.graph["nodes"][term]["document_ids"], key=self._document_order.__getitem__)
+        return {
+            "id": term,
+            "name": term,
+            "document_ids": document_ids,
+            "degree": self._degree(term),
+            "document_frequency": len(document_ids),
+        }
+
+    def _subgraph_locked(self, terms: list[str]) -> dict:
+        """Nodes for terms (in the given order), the edges among them and the documents they reference."""
+        term_set = set(terms)
+        nodes = [self._node_item(term) for term in terms]
+        links = sorted(
+            (edge for term in terms for edge in self._outgoing_edges.get(term, ()) if edge[1] in term_set),
+            key=lambda edge: (self._document_order[edge[3]], self._node_order.get(edge[0], -1), self._node_order.get(edge[1], -1), edge[2] or ""),
+        )
+        doc_ids = {doc_id for node in nodes for doc_id in node["document_ids"]} | {edge[3] for edge in links}
+        documents = sorted(doc_ids, key=self._document_order.__getitem__)
+        doc_id_to_index = {doc_id: i for i, doc_id in enumerate(documents)}
+        for node in nodes:
+            node["category_index"] = doc_id_to_index[node["document_ids"][0]] if node["document_ids"] else None
+        return {
+            "version": self._version,
+            "nodes": nodes,
+            "links": [{"source": s, "target": t, "label": label, "document_id": doc_id} for s, t, label, doc_id in links],
+            "documents": [{"id": doc_id, "title": self.graph["documents"][doc_id]["title"]} for doc_id in documents],
+        }
+
+    def get_neighborhood(self, term: str, depth: int = 1, max_nodes: int = 200) -> dict | None:
+        """Breadth-first k-hop neighborhood of a concept, strongest links first; None if the concept is unknown.
+           Stops at max_nodes nodes and then sets "truncated"."""
+        with self._lock:
+            if term not in self.graph["nodes"]:
+                return None
+            visited, frontier, truncated = [term], [term], False
+            seen = {term}
+            for _ in range(depth):
+                next_frontier = []
+                for current in frontier:
+                    neighbours = sorted(self._adjacency.get(current, {}).items(), key=lambda item: (-item[1], self._node_order.get(item[0], -1)))
+                    for neighbour, _ in neighbours:
+                        if neighbour in seen or neighbour not in self.graph["nodes"]:
+                            continue
+                        if len(visited) >= max_nodes:
+                            truncated = True
+                            break
+                        seen.add(neighbour)
+                        visited.append(neighbour)
+                        next_frontier.append(neighbour)
+                    if truncated:
+                        break
+                if truncated or not next_frontier:
+                    break
+                frontier = next_frontier
+            result = self._subgraph_locked(visited)
+        result["truncated"] = truncated
+        return result
+
+    def get_top_concepts(self, limit: int = 50, metric: str = "degree") -> dict:
+        """The limit highest-ranked concepts by degree or document frequency (rank index), with the edges among them."""
+        if metric not in RANKING_METRICS:
+            raise ValueError(f"Unknown ranking metric '{metric}', expected one of {RANKING_METRICS}.")
+        with self._lock:
+            result = self._subgraph_locked(self._ranks[metric].top(limit))
+        result["truncated"] = len(self.graph["nodes"]) > limit
+        return result
+
+    def list_nodes(self, cursor: str | None = None, limit: int = 500) -> dict:
+        """One page of concepts in first-seen order: {"items": [...], "next_cursor": str | None}."""
+        after = _decode_cursor(cursor, 1)[0] if cursor else -1
+        items, last_number, has_more = [], None, False
+        with self._lock:
+            for number, term in self._node_order.iter_after(after):
+                if len(items) >= limit:
+                    has_more = True
+                    break
+                items.append(self._node_item(term))
+                last_number = number
+        return {"items": items, "next_cursor": _encode_cursor([last_number]) if has_more else None}
+
+    def list_links(self, cursor: str | None = None, limit: int = 1000) -> dict:
+        """One page of edges ordered by document registration, then source, target and label."""
+        cursor_number, after_key = -1, None
+        if cursor:
+            cursor_number, source, target, label = _decode_cursor(cursor, 4)
+            after_key = (source, target, label)
+        items, has_more, next_cursor = [], False, None
+        with self._lock:
+            for number, doc_id in self._document_order.iter_after(cursor_number - 1):
+                keyed_edges = sorted(((s, t, label or ""), (s, t, label)) for s, t, label, _ in self._document_edges[doc_id])
+                for key, (s, t, label) in keyed_edges:
+                    if number == cursor_number and key <= after_key:
+                        continue
+                    if len(items) >= limit:
+                        has_more = True
+                        break
+                    items.append({"source": s, "target": t, "label": label, "document_id": doc_id})
+                    next_cursor = [number, *key]
+                if has_more:
+                    break
+        return {"items": items, "next_cursor": _encode_cursor(next_cursor) if has_more else None}
+
+    def link_snapshot(self) -> dict:
+        """The whole undirected concept adjacency at one version, for centrality computations:
+           {"version", "terms", "document_frequency": [...], "links": [(i, j, edge_count), ...]} with i < j indexing terms."""
+        with self._lock:
+            terms = list(self._node_order)
+            terms.extend(term for term in self._adjacency if term not in self._node_order) # Edge-only terms
+            index = {term: i for i, term in enumerate(terms)}
+            links = []
+            for term, neighbours in self._adjacency.items():
+                i = index[term]
+                links.extend((i, index[neighbour], count) for neighbour, count in neighbours.items() if i < index[neighbour])
+            nodes = self.graph["nodes"]
+            return {
+                "version": self._version,
+                "terms": terms,
+                "document_frequency": [len(nodes[term]["document_ids"]) if term in nodes else 0 for term in terms],
+                "links": links,
+            }
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "backend": "memory",
+                "documents": len(self.graph["documents"]),
+                "concepts": len(self.graph["nodes"]),
+                "edges": len(self.graph["edges"]),
+            }
+
+    def close(self):
+        pass
+
+
+class SQLiteGraphStore:
+    """Graph persisted in SQLite. Each thread gets its own connection; WAL lets readers run alongside a writer,
+       including writers in other worker processes sharing the same database file."""
+
+    SCHEMA_VERSION = 1 # PRAGMA user_version of databases created with SCHEMA
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS documents (
+            id INTEGER PRIMARY KEY,               -- Registration order, used for category indexes
+            doc_id TEXT NOT NULL UNIQUE,
+            title TEXT NOT NULL,
+            created_at REAL NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS concepts (
+            id INTEGER PRIMARY KEY,
+            term TEXT NOT NULL UNIQUE,
+            degree INTEGER NOT NULL DEFAULT 0,    -- Distinct neighbours in concept_links
+            document_frequency INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE INDEX IF NOT EXISTS idx_concepts_degree ON concepts (degree DESC, id);
+        CREATE INDEX IF NOT EXISTS idx_concepts_document_frequency ON concepts (document_frequency DESC, id);
+        CREATE TABLE IF NOT EXISTS concept_documents (
+            document_id INTEGER NOT NULL REFERENCES documents(id),
+            concept_id INTEGER NOT NULL REFERENCES concepts(id),
+            PRIMARY KEY (document_id, concept_id)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS idx_concept_documents_concept ON concept_documents (concept_id, document_id);
+        CREATE TABLE IF NOT EXISTS edges (
+            document_id INTEGER NOT NULL REFERENCES documents(id),
+            source_id INTEGER NOT NULL REFERENCES concepts(id),
+            target_id INTEGER NOT NULL REFERENCES concepts(id),
+            label TEXT NOT NULL DEFAULT '',       -- '' stands for "no label" (primary key columns cannot be NULL)
+            PRIMARY KEY (document_id, source_id, target_id, label)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS idx_edges_source ON edges (source_id);
+        CREATE INDEX IF NOT EXISTS idx_edges_target ON edges (target_id);
+        -- Undirected concept adjacency (low_id < high_id) with the number of edges between the two concepts
+        CREATE TABLE IF NOT EXISTS concept_links (
+            low_id INTEGER NOT NULL REFERENCES concepts(id),
+            high_id INTEGER NOT NULL REFERENCES concepts(id),
+            edge_count INTEGER NOT NULL,
+            PRIMARY KEY (low_id, high_id)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS idx_concept_links_high ON concept_links (high_id, low_id);
+        -- Graph version, bumped by every write transaction so all worker processes agree on it
+        CREATE TABLE IF NOT EXISTS graph_state (
+            id INTEGER PRIMARY KEY CHECK (id = 0),
+            version INTEGER NOT NULL
+        );
+        INSERT OR IGNORE INTO graph_state (id, version) VALUES (0, 1);
+    """
+
+    def __init__(self, db_path: str | Path):
+        self.db_path = Path(db_path)
+        self._local = threading.local()
+        self._connections: list[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+        conn = self._connection()
+        conn.executescript(self.SCHEMA)
+        if conn.execute("PRAGMA user_version").fetchone()[0] == 0:
+            conn.execute(f"PRAGMA user_version = {self.SCHEMA_VERSION}")
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.db_path), timeout=30, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    @contextmanager
+    def _write(self) -> Iterator[sqlite3.Connection]:
+        """Write transaction that bumps the graph version; BEGIN IMMEDIATE takes the write lock up front so
+           concurrent writers queue instead of deadlocking."""
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+            conn.execute("UPDATE graph_state SET version = version + 1 WHERE id = 0")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def version(self) -> int:
+        """Increases with every write, in any process sharing the database."""
+        return self._version_at(self._connection())
+
+    @staticmethod
+    def _version_at(conn: sqlite3.Connection) -> int:
+        """The graph version; as the first read of a transaction it also pins the snapshot the other reads see."""
+        return conn.execute("SELECT version FROM graph_state WHERE id = 0").fetchone()[0]
+
+    @staticmethod
+    def _document_row_id(conn: sqlite3.Connection, doc_id: str) -> int:
+        row = conn.execute("SELECT id FROM documents WHERE doc_id = ?", (doc_id,)).fetchone()
+        if row is None:
+            raise KeyError(f"Document '{doc_id}' is not registered in the graph store.")
+        return row[0]
+
+    @staticmethod
+    def _concept_ids(conn: sqlite3.Connection, terms: list[str]) -> dict[str, int]:
+        concept_ids = {}
+        for batch in _batched(terms):
+            placeholders = ",".join("?" * len(batch))
+            concept_ids.update(conn.execute(f"SELECT term, id FROM concepts WHERE term IN ({placeholders})", batch))
+        return concept_ids
+
+    def add_document(self, doc_id: str, title: str):
+        with self._write() as conn:
+            conn.execute(
+                "INSERT INTO documents (doc_id, title, created_at) VALUES (?, ?, ?)"
+                " ON CONFLICT (doc_id) DO UPDATE SET title = excluded.title",
+                (doc_id, title, time.time()),
+            )
+
+    def has_document(self, doc_id: str) -> bool:
+        return self._connection().execute("SELECT 1 FROM documents WHERE doc_id = ?", (doc_id,)).fetchone() is not None
+
+    def add_document_graph(self, doc_id: str, concept_terms: Iterable[str], edges: Iterable[Edge]):
+        """Adds a registered document's concepts and labelled edges in one batched transaction, keeping
+           document frequency, degree and the concept adjacency table in step."""
+        with self._write() as conn:
+            self._merge_document_graph(conn, self._document_row_id(conn, doc_id), concept_terms, edges, replace=False)
+
+    def replace_document_graph(self, doc_id: str, concept_terms: Iterable[str], edges: Iterable[Edge]):
+        """Sets a registered document's concepts and edges to exactly the given ones (re-ingest). Only the
+           delta against the stored rows is written; concepts left without documents or edges are deleted."""
+        with self._write() as conn:
+            self._merge_document_graph(conn, self._document_row_id(conn, doc_id), concept_terms, edges, replace=True)
+
+    def remove_document(self, doc_id: str) -> bool:
+        """Removes a document with its concept memberships and edges (primary key range scans over its own rows).
+           Concepts left without documents or edges are deleted. Returns False if the document is unknown."""
+        if not self.has_document(doc_id):
+            return False
+        with self._write() as conn:
+            row = conn.execute("SELECT id FROM documents WHERE doc_id = ?", (doc_id,)).fetchone()
+            if row is None: # Removed by another worker meanwhile
+                return False
+            document_row_id = row[0]
+            members = [row[0] for row in conn.execute("SELECT concept_id FROM concept_documents WHERE document_id = ?", (document_row_id,))]
+            edges = conn.execute("SELECT source_id, target_id, label FROM edges WHERE document_id = ?", (document_row_id,)).fetchall()
+            self._remove_members(conn, document_row_id, members)
+            self._remove_edges(conn, document_row_id, edges)
+            conn.execute("DELETE FROM documents WHERE id = ?", (document_row_id,))
+            self._delete_orphaned_concepts(conn, set(members) | {concept_id for s, t, _ in edges for concept_id in (s, t)})
+        return True
+
+    def _merge_document_graph(self, conn: sqlite3.Connection, document_row_id: int, concept_terms: Iterable[str],
+                              edges: Iterable[Edge], replace: bool):
+        """Writes the rows a document's concepts and edges add; with replace, also deletes its stored rows
+           that are not among them."""
+        concept_terms = list(dict.fromkeys(concept_terms))
+        edges = list(edges)
+        all_terms = list(dict.fromkeys(concept_terms + [term for s, t, _ in edges for term in (s, t)]))
+        conn.executemany("INSERT OR IGNORE INTO concepts (term) VALUES (?)", ((term,) for term in all_terms))
+        concept_ids = self._concept_ids(conn, all_terms)
+
+        existing_members = {row[0] for row in conn.execute("SELECT concept_id FROM concept_documents WHERE document_id = ?", (document_row_id,))}
+        wanted_members = [concept_ids[term] for term in concept_terms]
+        existing_edges = set(conn.execute("SELECT source_id, target_id, label FROM edges WHERE document_id = ?", (document_row_id,)))
+        wanted_edges = list(dict.fromkeys((concept_ids[s], concept_ids[t], label or "") for s, t, label in edges))
+        if replace:
+            stale_members = list(existing_members - set(wanted_members))
+            stale_edges = list(existing_edges - set(wanted_edges))
+            self._remove_members(conn, document_row_id, stale_members)
+            self._remove_edges(conn, document_row_id, stale_edges)
+
+        new_members = [concept_id for concept_id in wanted_members if concept_id not in existing_members]
+        conn.executemany("INSERT INTO concept_documents (document_id, concept_id) VALUES (?, ?)", ((document_row_id, concept_id) for concept_id in new_members))
+        conn.executemany("UPDATE concepts SET document_frequency = document_frequency + 1 WHERE id = ?", ((concept_id,) for concept_id in new_members))
+
+        new_edges = [edge for edge in wanted_edges if edge not in existing_edges]
+        conn.executemany(
+            "INSERT INTO edges (document_id, source_id, target_id, label) VALUES (?, ?, ?, ?)",
+            ((document_row_id, s, t, label) for s, t, label in new_edges),
+        )
+
+        pair_counts = Counter((min(s, t), max(s, t)) for s, t, _ in new_edges if s != t)
+        new_pairs = [pair for pair in pair_counts if conn.execute("SELECT 1 FROM concept_links WHERE low_id = ? AND high_id = ?", pair).fetchone() is None]
+        conn.executemany(
+            "INSERT INTO concept_links (low_id, high_id, edge_count) VALUES (?, ?, ?)"
+            " ON CONFLICT (low_id, high_id) DO UPDATE SET edge_count = edge_count + excluded.edge_count",
+            ((low, high, count) for (low, high), count in pair_counts.items()),
+        )
+        degree_increments = Counter(concept_id for pair in new_pairs for concept_id in pair)
+        conn.executemany("UPDATE concepts SET degree = degree + ? WHERE id = ?", ((increment, concept_id) for concept_id, increment in degree_increments.items()))
+
+        if replace:
+            self._delete_orphaned_concepts(conn, set(stale_members) | {concept_id for s, t, _ in stale_edges for concept_id in (s, t)})
+
+    @staticmethod
+    def _remove_members(conn: sqlite3.Connection, document_row_id: int, concept_ids: list[int]):
+        conn.executemany("DELETE FROM concept_documents WHERE document_id = ? AND concept_id = ?", ((document_row_id, concept_id) for concept_id in concept_ids))
+        conn.executemany("UPDATE concepts SET document_frequency = document_frequency - 1 WHERE id = ?", ((concept_id,) for concept_id in concept_ids))
+
+    @staticmethod
+    def _remove_edges(conn: sqlite3.Connection, document_row_id: int, edges: list[tuple]):
+        """Deletes a document's edges (source_id, target_id, label) and takes them out of the adjacency and degrees."""
+        conn.executemany(
+            "DELETE FROM edges WHERE document_id = ? AND source_id = ? AND target_id = ? AND label = ?",
+            ((document_row_id, s, t, label) for s, t, label in edges),
+        )
+        pair_counts = Counter((min(s, t), max(s, t)) for s, t, _ in edges if s != t)
+        conn.executemany(
+            "UPDATE concept_links SET edge_count = edge_count - ? WHERE low_id = ? AND high_id = ?",
+            ((count, low, high) for (low, high), count in pair_counts.items()),
+        )
+        dropped_pairs = [
+            pair for pair in pair_counts
+            if conn.execute("DELETE FROM concept_links WHERE low_id = ? AND high_id = ? AND edge_count <= 0", pair).rowcount
+        ]
+        degree_decrements = Counter(concept_id for pair in dropped_pairs for concept_id in pair)
+        conn.executemany("UPDATE concepts SET degree = degree - ? WHERE id = ?", ((decrement, concept_id) for concept_id, decrement in degree_decrements.items()))
+
+    @staticmethod
+    def _delete_orphaned_concepts(conn: sqlite3.Connection, concept_ids: Iterable[int]):
+        conn.executemany(
+            "DELETE FROM concepts WHERE id = ? AND document_frequency = 0 AND degree = 0"
+            " AND NOT EXISTS (SELECT 1 FROM edges WHERE source_id = concepts.id)"
+            " AND NOT EXISTS (SELECT 1 FROM edges WHERE target_id = concepts.id)",
+            ((concept_id,) for concept_id in concept_ids),
+        )
+
+    def get_graph(self, document_ids: list[str] | None = None) -> dict:
+        """Documents, linked concepts and edges, optionally restricted to the given documents.
+           A filtered query only touches the selected documents' rows (primary key range scans)."""
+        conn = self._connection()
+        conn.execute("BEGIN") # One read snapshot for all queries below
+        try:
+            version = self._version_at(conn)
+            if document_ids:
+                documents = []
+                for batch in _batched(list(dict.fromkeys(document_ids))):
+                    placeholders = ",".join("?" * len(batch))
+                    documents.extend(conn.execute(f"SELECT id, doc_id, title FROM documents WHERE doc_id IN ({placeholders})", batch))
+                documents.sort()
+                edge_rows, membership_rows = [], []
+                for document_row_id, _, _ in documents:
+                    edge_rows.extend(conn.execute(
+                        "SELECT document_id, source_id, target_id, label FROM edges WHERE document_id = ?", (document_row_id,)))
+                    membership_rows.extend(conn.execute(
+                        "SELECT concept_id, document_id FROM concept_documents WHERE document_id = ?", (document_row_id,)))
+            else:
+                documents = conn.execute("SELECT id, doc_id, title FROM documents ORDER BY id").fetchall()
+                edge_rows = conn.execute("SELECT document_id, source_id, target_id, label FROM edges").fetchall()
+                membership_rows = conn.execute(
+                    "SELECT concept_id, document_id FROM concept_documents WHERE concept_id IN"
+                    " (SELECT source_id FROM edges UNION SELECT target_id FROM edges)"
+                ).fetchall()
+
+            linked_concept_ids = {concept_id for _, s, t, _ in edge_rows for concept_id in (s, t)}
+            memberships: dict[int, list[int]] = {}
+            for concept_id, document_row_id in membership_rows:
+                if concept_id in linked_concept_ids:
+                    memberships.setdefault(concept_id, []).append(document_row_id)
+            terms: dict[int, str] = {}
+            for batch in _batched(list(linked_concept_ids)):
+                placeholders = ",".join("?" * len(batch))
+                terms.update(conn.execute(f"SELECT id, term FROM concepts WHERE id IN ({placeholders})", batch))
+        finally:
+            conn.execute("COMMIT")
+
+        doc_ids = {row_id: doc_id for row_id, doc_id, _ in documents}
+        doc_id_to_index = {row_id: i for i, (row_id, _, _) in enumerate(documents)}
+        nodes = []
+        for concept_id in sorted(memberships): # Concept ids follow first-seen order
+            document_row_ids = sorted(memberships[concept_id])
+            term = terms[concept_id]
+            nodes.append({
+                "id": term,
+                "name": term,
+                "document_ids": [doc_ids[row_id] for row_id in document_row_ids],
+                "category_index": doc_id_to_index[document_row_ids[0]], # Earliest registered document
+            })
+        links = [
+            {"source": terms[s], "target": terms[t], "label": label or None, "document_id": doc_ids[document_row_id]}
+            for document_row_id, s, t, label in edge_rows
+        ]
+        return {
+            "version": version,
+            "nodes": nodes,
+            "links": links,
+            "documents": [{"id": doc_id, "title": title} for _, doc_id, title in documents],
+        }
+
+    def _subgraph(self, conn: sqlite3.Connection, concept_ids: list[int], include_links: bool = True) -> dict:
+        """Nodes for concept_ids (in the given order), the edges among them and the documents they reference."""
+        id_list_json = json.dumps(concept_ids)
+        concepts, memberships, edge_rows = {}, {}, []
+        for batch in _batched(concept_ids):
+            placeholders = ",".join("?" * len(batch))
+            for concept_id, term, degree, document_frequency in conn.execute(
+                    f"SELECT id, term, degree, document_frequency FROM concepts WHERE id IN ({placeholders})", batch):
+                concepts[concept_id] = (term, degree, document_frequency)
+            for concept_id, document_row_id in conn.execute(
+                    f"SELECT concept_id, document_id FROM concept_documents WHERE concept_id IN ({placeholders})", batch):
+                memberships.setdefault(concept_id, []).append(document_row_id)
+            if include_links: # Source via idx_edges_source, target checked against the whole id set inside SQLite
+                edge_rows.extend(conn.execute(
+                    f"SELECT document_id, source_id, target_id, label FROM edges WHERE source_id IN ({placeholders})"
+                    " AND target_id IN (SELECT value FROM json_each(?))", (*batch, id_list_json)))
+        edge_rows.sort()
+        document_row_ids = sorted({row_id for row_ids in memberships.values() for row_id in row_ids} | {row[0] for row in edge_rows})
+        documents = []
+        for batch in _batched(document_row_ids):
+            placeholders = ",".join("?" * len(batch))
+            documents.extend(conn.execute(f"SELECT id, doc_id, title FROM documents WHERE id IN ({placeholders})", batch))
+        documents.sort()
+        doc_ids = {row_id: doc_id for row_id, doc_id, _ in documents}
+        doc_id_to_index = {row_id: i for i, (row_id, _, _) in enumerate(documents)}
+
+        nodes = []
+        for concept_id in concept_ids:
+            term, degree, document_frequency = concepts[concept_id]
+            node_document_row_ids = sorted(memberships.get(concept_id, []))
+            nodes.append({
+                "id": term,
+                "name": term,
+                "document_ids": [doc_ids[row_id] for row_id in node_document_row_ids],
+                "category_index": doc_id_to_index[node_document_row_ids[0]] if node_document_row_ids else None,
+                "degree": degree,
+                "document_frequency": document_frequency,
+            })
+        links = [
+            {"source": concepts[s][0], "target": concepts[t][0], "label": label or None, "document_id": doc_ids[document_row_id]}
+            for document_row_id, s, t, label in edge_rows
+        ]
+        return {"nodes": nodes, "links": links, "documents": [{"id": doc_id, "title": title} for _, doc_id, title in documents]}
+
+    def get_neighborhood(self, term: str, depth: int = 1, max_nodes: int = 200) -> dict | None:
+        """Breadth-first k-hop neighborhood of a concept, strongest links first; None if the concept is unknown.
+           Stops at max_nodes nodes and then sets "truncated"."""
+        conn = self._connection()
+        conn.execute("BEGIN")
+        try:
+            version = self._version_at(conn)
+            row = conn.execute("SELECT id FROM concepts WHERE term = ? AND document_frequency > 0", (term,)).fetchone()
+            if row is None:
+                return None
+            visited, frontier, truncated = [row[0]], [row[0]], False
+            seen = {row[0]}
+            for _ in range(depth):
+                next_frontier = []
+                for current in frontier:
+                    neighbours = conn.execute(
+                        "SELECT l.neighbour_id FROM ("
+                        " SELECT high_id AS neighbour_id, edge_count FROM concept_links WHERE low_id = ?"
+                        " UNION ALL SELECT low_id, edge_count FROM concept_links WHERE high_id = ?) AS l"
+                        " JOIN concepts c ON c.id = l.neighbour_id WHERE c.document_frequency > 0"
+                        " ORDER BY l.edge_count DESC, l.neighbour_id LIMIT ?",
+                        (current, current, max_nodes + len(seen)), # Enough rows to fill the budget even if all seen
+                    )
+                    for (neighbour_id,) in neighbours:
+                        if neighbour_id in seen:
+                            continue
+                        if len(visited) >= max_nodes:
+                            truncated = True
+                            break
+                        seen.add(neighbour_id)
+                        visited.append(neighbour_id)
+                        next_frontier.append(neighbour_id)
+                    if truncated:
+                        break
+                if truncated or not next_frontier:
+                    break
+                frontier = next_frontier
+            result = self._subgraph(conn, visited)
+        finally:
+            conn.execute("COMMIT")
+        result["version"] = version
+        result["truncated"] = truncated
+        return result
+
+    def get_top_concepts(self, limit: int = 50, metric: str = "degree") -> dict:
+        """The limit highest-ranked concepts by degree or document frequency (index scan), with the edges among them."""
+        if metric not in RANKING_METRICS:
+            raise ValueError(f"Unknown ranking metric '{metric}', expected one of {RANKING_METRICS}.")
+        conn = self._connection()
+        conn.execute("BEGIN")
+        try:
+            version = self._version_at(conn)
+            rows = conn.execute(
+                f"SELECT id FROM concepts WHERE document_frequency > 0 ORDER BY {metric} DESC, id LIMIT ?", (limit + 1,)
+            ).fetchall()
+            result = self._subgraph(conn, [row[0] for row in rows[:limit]])
+        finally:
+            conn.execute("COMMIT")
+        result["version"] = version
+        result["truncated"] = len(rows) > limit
+        return result
+
+    def list_nodes(self, cursor: str | None = None, limit: int = 500) -> dict:
+        """One page of concepts in first-seen order: {"items": [...], "next_cursor": str | None}."""
+        after_id = int(_decode_cursor(cursor, 1)[0]) if cursor else 0
+        conn = self._connection()
+        conn.execute("BEGIN")
+        try:
+            rows = conn.execute(
+                "SELECT id FROM concepts WHERE id > ? AND document_frequency > 0 ORDER BY id LIMIT ?", (after_id, limit + 1)
+            ).fetchall()
+            page_ids = [row[0] for row in rows[:limit]]
+            nodes = self._subgraph(conn, page_ids, include_links=False)["nodes"] if page_ids else []
+        finally:
+            conn.execute("COMMIT")
+        items = [{key: node[key] for key in ("id", "name", "document_ids", "degree", "document_frequency")} for node in nodes]
+        return {"items": items, "next_cursor": _encode_cursor([page_ids[-1]]) if len(rows) > limit else None}
+
+    def list_links(self, cursor: str | None = None, limit: int = 1000) -> dict:
+        """One page of edges in primary key order (document, source, target, label)."""
+        after = _decode_cursor(cursor, 4) if cursor else [0, 0, 0, ""]
+        conn = self._connection()
+        conn.execute("BEGIN")
+        try:
+            rows = conn.execute(
+                "SELECT document_id, source_id, target_id, label FROM edges"
+                " WHERE (document_id, source_id, target_id, label) > (?, ?, ?, ?)"
+                " ORDER BY document_id, source_id, target_id, label LIMIT ?",
+                (*after, limit + 1),
+            ).fetchall()
+            page = rows[:limit]
+            concept_ids = list({concept_id for _, s, t, _ in page for concept_id in (s, t)})
+            document_row_ids = list({row[0] for row in page})
+            terms, doc_ids = {}, {}
+            for batch in _batched(concept_ids):
+                terms.update(conn.execute(f"SELECT id, term FROM concepts WHERE id IN ({','.join('?' * len(batch))})", batch))
+            for batch in _batched(document_row_ids):
+                doc_ids.update(conn.execute(f"SELECT id, doc_id FROM documents WHERE id IN ({','.join('?' * len(batch))})", batch))
+        finally:
+            conn.execute("COMMIT")
+        items = [
+            {"source": terms[s], "target": terms[t], "label": label or None, "document_id": doc_ids[document_row_id]}
+            for document_row_id, s, t, label in page
+        ]
+        return {"items": items, "next_cursor": _encode_cursor(list(page[-1])) if len(rows) > limit else None}
+
+    def link_snapshot(self) -> dict:
+        """The whole undirected concept adjacency at one version, for centrality computations:
+           {"version", "terms", "document_frequency": [...], "links": [(i, j, edge_count), ...]} with i < j indexing terms."""
+        conn = self._connection()
+        conn.execute("BEGIN")
+        try:
+            version = self._version_at(conn)
+            concept_rows = conn.execute("SELECT id, term, document_frequency FROM concepts ORDER BY id").fetchall()
+            index = {concept_id: i for i, (concept_id, _, _) in enumerate(concept_rows)}
+            links = [(index[low], index[high], count) for low, high, count in conn.execute("SELECT low_id, high_id, edge_count FROM concept_links")]
+        finally:
+            conn.execute("COMMIT")
+        return {
+            "version": version,
+            "terms": [row[1] for row in concept_rows],
+            "document_frequency": [row[2] for row in concept_rows],
+            "links": links,
+        }
+
+    def stats(self) -> dict:
+        conn = self._connection()
+        documents, concepts, edges = (
+            conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] for table in ("documents", "concepts", "edges")
+        )
+        return {"backend": "sqlite", "documents": documents, "concepts": concepts, "edges": edges}
+
+    def close(self):
+        with self._connections_lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+        self._local = threading.local()
@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+"""Content-addressed, size-capped on-disk cache for HanLP parse results.
+
+Entries are keyed by a SHA-256 over (chunk text, tasks, skip_tasks, backend version) and stored as
+zlib-compressed JSON in a SQLite database (WAL mode, so several worker processes can share it).
+When the total stored size exceeds the cap, the least recently used entries are evicted down to a low-water
+mark (EVICTION_LOW_WATER of the cap), so a full cache is not trimmed again on the very next write. The total
+is kept as a running counter (read once at open, adjusted on every write), so a put is an indexed lookup plus
+an insert; the table is only summed again when the counter crosses the cap, which also picks up entries
+written by other processes in the meantime.
+"""
+
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+import zlib
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+EVICTION_LOW_WATER = 0.9 # Eviction frees space down to this fraction of max_bytes
+
+
+class HanLPParseCache:
+    """SQLite-backed LRU cache mapping parse requests to HanLP result documents. Safe to share between threads."""
+
+    def __init__(self, db_path: str | Path, max_bytes: int):
+        self.db_path = Path(db_path)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS parse_cache ("
+            " key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_parse_cache_last_access ON parse_cache (last_access)")
+        self._total_bytes = self._stored_bytes()
+
+    def _stored_bytes(self) -> int:
+        return self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM parse_cache").fetchone()[0]
+
+    @staticmethod
+    def make_key(text: str, tasks: list[str] | str | None, skip_tasks: list[str] | str | None, backend_version: str) -> str:
+        """Builds the content address of a parse request."""
+        payload = json.dumps([text, tasks, skip_tasks, backend_version], ensure_ascii=False, separators=(",", ":"))
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> dict | None:
+        """Returns the cached document for key (refreshing its LRU position), or None on a miss."""
+        try:
+            with self._lock:
+                row = self._conn.execute("SELECT value FROM parse_cache WHERE key = ?", (key,)).fetchone()
+                if row is None:
+                    self.misses += 1
+                    return None
+                self._conn.execute("UPDATE parse_cache SET last_access = ? WHERE key = ?", (time.time(), key))
+                self.hits += 1
+            return json.loads(zlib.decompress(row[0]))
+        except (sqlite3.Error, zlib.error, ValueError) as e:
+            logger.warning(f"HanLP parse cache read failed for key {key[:12]}...: {e}")
+            return None
+
+    def put(self, key: str, doc: dict):
+        """Stores a parse result; once over the size cap, evicts least recently used entries down to the low-water mark."""
+        try:
+            value = zlib.compress(json.dumps(doc, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+            if len(value) > self.max_bytes:
+                logger.debug(f"Not caching parse result of {len(value)} bytes (cap is {self.max_bytes} bytes).")
+                return
+            with self._lock:
+                replaced = self._conn.execute("SELECT size FROM parse_cache WHERE key = ?", (key,)).fetchone()
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO parse_cache (key, value, size, last_access) VALUES (?, ?, ?, ?)",
+                    (key, value, len(value), time.time()),
+                )
+                self._total_bytes += len(value) - (replaced[0] if replaced else 0)
+                if self._total_bytes > self.max_bytes:
+                    self._evict_locked()
+        except (sqlite3.Error, TypeError, ValueError) as e:
+            logger.warning(f"HanLP parse cache write failed for key {key[:12]}...: {e}")
+
+    def _evict_locked(self):
+        total_bytes = self._stored_bytes() # Resynchronize: other processes may have written or evicted entries
+        if total_bytes <= self.max_bytes:
+            self._total_bytes = total_bytes
+            return
+        target_bytes = int(self.max_bytes * EVICTION_LOW_WATER)
+        evicted = 0
+        while total_bytes > target_bytes:
+            oldest = self._conn.execute("SELECT key, size FROM parse_cache ORDER BY last_access LIMIT 64").fetchall()
+            if not oldest:
+                break
+            for key, size in oldest:
+                if total_bytes <= target_bytes:
+                    break
+                self._conn.execute("DELETE FROM parse_cache WHERE key = ?", (key,))
+                total_bytes -= size
+                evicted += 1
+        self._total_bytes = total_bytes
+        self.evictions += evicted
+        logger.info(f"Evicted {evicted} least recently used HanLP parse cache entries (now {total_bytes} bytes).")
+
+    def stats(self) -> dict:
+        """Returns hit/miss/eviction counters of this process plus the current entry count and size on disk."""
+        with self._lock:
+            entries, total_bytes = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM parse_cache").fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": entries,
+            "size_bytes": total_bytes,
+            "max_bytes": self.max_bytes,
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
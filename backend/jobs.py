@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+"""Bounded background job queue for long-running document processing.
+
+Jobs run on a fixed-size thread pool. The number of queued + running jobs is capped, so a burst of
+uploads is rejected early instead of piling up unbounded work. Each job reports per-stage progress,
+which is exposed through snapshots for status endpoints. Finished jobs are kept for a limited number
+of entries so their results can still be fetched.
+"""
+
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+logger = logging.getLogger(__name__)
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+
+STAGE_PENDING = "pending"
+STAGE_RUNNING = "running"
+STAGE_DONE = "done"
+
+
+class JobQueueFullError(Exception):
+    """Raised when a job is submitted while the queue already holds its maximum number of active jobs."""
+
+
+class JobProgress:
+    """Progress reporter handed to a running job: report(stage, fraction) marks earlier stages done."""
+
+    def __init__(self, manager: "JobManager", job_id: str):
+        self._manager = manager
+        self._job_id = job_id
+
+    def report(self, stage: str, fraction: float = 0.0):
+        self._manager._update_stage(self._job_id, stage, fraction)
+
+
+class JobManager:
+    """Runs submitted callables in a bounded worker pool and tracks their status, stage progress and result."""
+
+    def __init__(self, stages: list[str], max_workers: int, max_active_jobs: int, max_finished_jobs: int = 200):
+        self.stages = list(stages)
+        self.max_active_jobs = max(max_workers, max_active_jobs)
+        self.max_finished_jobs = max_finished_jobs
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="upload-job")
+        self._lock = threading.Lock()
+        self._jobs: "OrderedDict[str, dict]" = OrderedDict()
+        self._active_count = 0
+
+    def submit(self, fn: Callable[..., Any], *args, **kwargs) -> str:
+        """Queues fn(progress, *args, **kwargs) and returns the new job id. Raises JobQueueFullError when at capacity."""
+        job_id = str(uuid.uuid4())
+        with self._lock:
+            if self._active_count >= self.max_active_jobs:
+                raise JobQueueFullError(f"{self._active_count} jobs are already queued or running (limit {self.max_active_jobs}).")
+            self._active_count += 1
+            self._jobs[job_id] = {
+                "id": job_id,
+                "status": JOB_QUEUED,
+                "created_at": time.time(),
+                "started_at": None,
+                "finished_at": None,
+                "current_stage": None,
+                "stages": {stage: {"status": STAGE_PENDING, "progress": 0.0} for stage in self.stages},
+                "error": None,
+                "result": None,
+            }
+        try:
+            self._executor.submit(self._run, job_id, fn, args, kwargs)
+        except Exception: # E.g. RuntimeError after shutdown: undo the registration so the slot is not leaked
+            with self._lock:
+                del self._jobs[job_id]
+                self._active_count -= 1
+            raise
+        return job_id
+
+    def _run(self, job_id: str, fn: Callable[..., Any], args: tuple, kwargs: dict):
+        with self._lock:
+            job = self._jobs[job_id]
+            job["status"] = JOB_RUNNING
+            job["started_at"] = time.time()
+        try:
+            result = fn(JobProgress(self, job_id), *args, **kwargs)
+        except Exception as e:
+            logger.error(f"Job {job_id} failed: {e}", exc_info=True)
+            self._finish(job_id, JOB_FAILED, error=getattr(e, "detail", None) or str(e) or type(e).__name__)
+        else:
+            self._finish(job_id, JOB_SUCCEEDED, result=result)
+
+    def _finish(self, job_id: str, status: str, result: Any = None, error: str | None = None):
+        with self._lock:
+            job = self._jobs[job_id]
+            job["status"] = status
+            job["finished_at"] = time.time()
+            job["result"] = result
+            job["error"] = error
+            if status == JOB_SUCCEEDED:
+                for stage_state in job["stages"].values():
+                    stage_state.update(status=STAGE_DONE, progress=1.0)
+            self._active_count -= 1
+            self._jobs.move_to_end(job_id)
+            self._trim_finished_locked()
+        logger.info(f"Job {job_id} finished with status '{status}'.")
+
+    def _trim_finished_locked(self):
+        finished_ids = [job_id for job_id, job in self._jobs.items() if job["finished_at"] is not None]
+        for job_id in finished_ids[:max(0, len(finished_ids) - self.max_finished_jobs)]:
+            del self._jobs[job_id]
+
+    def _update_stage(self, job_id: str, stage: str, fraction: float):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or stage not in job["stages"]:
+                return
+            stage_position = self.stages.index(stage)
+            for earlier_stage in self.stages[:stage_position]:
+                job["stages"][earlier_stage].update(status=STAGE_DONE, progress=1.0)
+            job["stages"][stage].update(status=STAGE_RUNNING, progress=round(min(max(fraction, 0.0), 1.0), 4))
+            job["current_stage"] = stage
+
+    def get(self, job_id: str) -> dict | None:
+        """Returns a snapshot of the job (the result object itself is shared, not copied), or None if unknown/expired."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            snapshot = dict(job)
+            snapshot["stages"] = {stage: dict(state) for stage, state in job["stages"].items()}
+            return snapshot
+
+    def active_count(self) -> int:
+        with self._lock:
+            return self._active_count
+
+    def shutdown(self, wait: bool = False):
+        self._executor.shutdown(wait=wait, cancel_futures=True)
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+"""Lexical scanner for the per-block difficulty features: formula spans, citation spans and long sentences.
+
+All patterns are compiled once at import; one LexicalScanner is shared by every block of every document.
+The spans are exactly those of FORMULA_PATTERN.finditer (on the lowercased, stripped block) and
+CITATION_PATTERN.finditer (on the original block): leftmost-first, non-overlapping within each pattern.
+The two patterns do overlap each other ("[12]" is a formula and a citation) and run on different strings,
+so they cannot be folded into one alternation without changing the counts; instead each scan jumps
+between anchors, the characters every match must contain:
+
+  - formulas:  an operator, "[" or "{", or a Greek letter name. A match starts at most one character plus
+               a run of digits, dots and whitespace before its first anchor.
+  - citations: "[", "(", or whitespace followed by "et al.". A match starts at its anchor, or for
+               "Name et al., 2019" at the start of the letters and whitespace before it.
+
+From each anchor the unchanged pattern is searched from the earliest position a match could start, so
+the long stretches of prose between anchors (most of a block, and all of it in typical Chinese text) are
+skipped in C by the anchor search instead of trying every alternative of the pattern at every character.
+"""
+
+import re
+from typing import NamedTuple
+
+GREEK_LETTER_NAMES = ("alpha", "beta", "gamma", "delta", "epsilon", "zeta", "eta", "theta", "iota", "kappa", "lambda", "mu",
+                      "nu", "xi", "omicron", "pi", "rho", "sigma", "tau", "upsilon", "phi", "chi", "psi", "omega")
+_OPERATORS = r"+\-\*/=<>≤≥∈∑∫∏√^"
+
+FORMULA_PATTERN = re.compile(
+    r"([a-zA-Z]?\s*[+\-\*/=<>≤≥∈∑∫∏√^]\s*[a-zA-Z\d])|(\b(alpha|beta|gamma|delta|epsilon|zeta|eta|theta|iota|kappa|lambda|mu|nu|xi|omicron|pi|rho|sigma|tau|upsilon|phi|chi|psi|omega)\b)|([\d.\s]*[+\-\*/=<>≤≥∈∑∫∏√^][\d.\s]+)|(\([+\-\*/=<>≤≥∈∑∫∏√^]+\))|(\[[\w\s+\-\*/=<>≤≥∈∑∫∏√^]+\])|(\{[\w\s+\-\*/=<>≤≥∈∑∫∏√^]+\})",
+    re.VERBOSE | re.IGNORECASE,
+)
+# The same pattern without IGNORECASE: on lowercased text it matches identically unless the text contains
+# one of the two lowercase letters that fold onto ASCII (dotless i, long s), see _CASE_FOLDING_LETTERS
+_FORMULA_PATTERN_LOWERCASE = re.compile(FORMULA_PATTERN.pattern, re.VERBOSE)
+_CASE_FOLDING_LETTERS = ("ı", "ſ")
+_FORMULA_ANCHOR_PATTERN = re.compile(
+    rf"[{_OPERATORS}\[{{]|\b(?=[{''.join(sorted({name[0] for name in GREEK_LETTER_NAMES}))}])(?:{'|'.join(GREEK_LETTER_NAMES)})\b"
+)
+
+CITATION_PATTERN = re.compile(r"(\[\d+\])|(\([^)]*\d{4}[^(]*\))|(\b[A-Za-z]+\s+et\s+al\.,?\s+\d{4})")
+_CITATION_ANCHOR_PATTERN = re.compile(r"[\[(]|\set\s+al\.")
+
+SENTENCE_END_PATTERN = re.compile(r"([。？！；!?;]+)")
+
+
+class BlockScan(NamedTuple):
+    formula_spans: list[tuple[int, int]]  # (start, end) in the lowercased, stripped block
+    citation_spans: list[tuple[int, int]] # (start, end) in the block as given
+    long_sentence_lengths: list[int]      # Stripped lengths of the sentences longer than the threshold
+
+
+def _formula_search_start(text: str, anchor: int, floor: int) -> int:
+    start = anchor
+    while start > floor and (text[start - 1] == "." or text[start - 1].isdecimal() or text[start - 1].isspace()): # [\d.\s]
+        start -= 1
+    return max(floor, start - 1) # One more for the optional leading letter (or the "(" of "(+)")
+
+
+def _citation_search_start(text: str, anchor: int, floor: int) -> int:
+    start = anchor
+    if text[anchor].isspace(): # "Name et al., 2019": back over the whitespace and the name
+        while start > floor and text[start - 1].isspace():
+            start -= 1
+        while start > floor and text[start - 1].isascii() and text[start - 1].isalpha():
+            start -= 1
+    return start
+
+
+def _anchored_spans(pattern: re.Pattern, anchor_pattern: re.Pattern, search_start, text: str) -> list[tuple[int, int]]:
+    """The spans of pattern.finditer(text), searching only from where the next anchor allows a match.
+
+    Every match of pattern contains a match of anchor_pattern, and search_start(text, anchor, floor) is a
+    position at or before the start of any match whose first anchor is at anchor (but not before floor)."""
+    spans = []
+    position = 0
+    while True:
+        anchor = anchor_pattern.search(text, position)
+        if anchor is None:
+            return spans
+        match = pattern.search(text, search_start(text, anchor.start(), position))
+        if match is None: # Only reachable if the anchor led nowhere and no later match exists
+            return spans
+        spans.append(match.span())
+        position = match.end() # A match always ends past its anchor
+
+
+class LexicalScanner:
+    """Extracts the lexical difficulty features of text blocks; stateless and safe to share between threads."""
+
+    def __init__(self, long_sentence_threshold: int):
+        self.long_sentence_threshold = long_sentence_threshold
+
+    def formula_spans(self, text_lower: str) -> list[tuple[int, int]]:
+        """Spans of FORMULA_PATTERN.finditer(text_lower); text_lower must already be lowercased."""
+        if any(letter in text_lower for letter in _CASE_FOLDING_LETTERS):
+            return [match.span() for match in FORMULA_PATTERN.finditer(text_lower)]
+        return _anchored_spans(_FORMULA_PATTERN_LOWERCASE, _FORMULA_ANCHOR_PATTERN, _formula_search_start, text_lower)
+
+    def citation_spans(self, text: str) -> list[tuple[int, int]]:
+        """Spans of CITATION_PATTERN.finditer(text)."""
+        return _anchored_spans(CITATION_PATTERN, _CITATION_ANCHOR_PATTERN, _citation_search_start, text)
+
+    def long_sentence_lengths(self, text: str) -> list[int]:
+        """Stripped lengths of the sentences (split after runs of 。？！；!?;) longer than the threshold."""
+        threshold = self.long_sentence_threshold
+        if len(text) <= threshold: # No sentence can be longer than the block
+            return []
+        lengths = []
+        start = 0
+        for end in [match.end() for match in SENTENCE_END_PATTERN.finditer(text)] + [len(text)]:
+            if end - start > threshold: # Stripping only shortens, so shorter sentences are never copied
+                length = len(text[start:end].strip())
+                if length > threshold:
+                    lengths.append(length)
+            start = end
+        return lengths
+
+    def scan(self, text: str, text_lower: str | None = None) -> BlockScan:
+        """All lexical features of one block; pass text_lower (text.lower().strip()) if it is already at hand."""
+        if text_lower is None:
+            text_lower = text.lower().strip()
+        return BlockScan(self.formula_spans(text_lower), self.citation_spans(text), self.long_sentence_lengths(text))
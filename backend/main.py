@@ -2,21 +2,44 @@
 # -*- coding: utf-8 -*-
 """Backend API using FastAPI for MindFlow Reader."""
 
-import io
+import asyncio
+import json
 import logging
+import os
 import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
 from pathlib import Path
 import re # Import regex for filtering
 import urllib.parse # Add urllib.parse import
-import requests # Add this import
 
-import fitz  # PyMuPDF
 from hanlp_restful import HanLPClient # Import HanLPClient
 # import torch # Remove PyTorch import
-from fastapi import FastAPI, File, HTTPException, UploadFile, Query
+from fastapi import FastAPI, File, HTTPException, UploadFile, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response, StreamingResponse
 from pydantic import BaseModel
-from typing import List, Optional
+from fastapi.concurrency import run_in_threadpool
+from typing import AsyncIterator, Callable, Iterator, List, Literal, Optional
+
+from centrality import CentralitySnapshot, GraphCentrality
+from definition_store import STORE_FILE_SUFFIX, LocalDefinitionStore, build_definition_store
+from definitions import DefinitionCache, DefinitionPrefetcher, OwnThinkDefinitionClient
+from difficulty import (
+    FORMULA_COUNT_THRESHOLD_HIGH, FORMULA_COUNT_THRESHOLD_LOW, FORMULA_LENGTH_THRESHOLD_HIGH, FORMULA_LENGTH_THRESHOLD_LOW,
+    SCORE_NORMALIZATION_MODES, WEIGHT_CITATION_DENSITY, WEIGHT_FIGURE_TABLE,
+    WEIGHT_FORMULA_COMPLEXITY, WEIGHT_LONG_SENTENCE, WEIGHT_TERM_DENSITY, block_features, score_blocks,
+)
+from fast_json import JSON_ENCODER, FastJSONResponse, dumps, fill_defaults
+from feature_store import MemorySegmentFeatureStore, SQLiteSegmentFeatureStore, pack_segment_features
+from graph_store import MemoryGraphStore, SQLiteGraphStore
+from hanlp_cache import HanLPParseCache
+from pdf_extraction import TABLE_DETECTION_HEURISTIC, TABLE_DETECTION_MODES, TableCountCache, extract_pdf_pages
+from response_cache import SerializedResponseCache, etag_matches, make_etag
+from result_store import UploadResultStore, fingerprint_bytes, fingerprint_text
+from jobs import JOB_FAILED, JOB_QUEUED, JOB_SUCCEEDED, JobManager, JobProgress, JobQueueFullError
+from term_matcher import TermMatcher
+from titles_index import INDEX_FILE_SUFFIX, WikipediaTitlesIndex, build_titles_index
 
 
 # --- Global Configuration & Setup ---
@@ -24,8 +47,74 @@ from typing import List, Optional
 # --- HanLP API Configuration ---
 # !!! 密钥已设置，建议后续使用环境变量或配置文件管理 !!!
 # HANLP_API_URL = "https://hanlp.hankcs.com/api/v1/parse" # Remove old V1 constant
-HANLP_BASE_URL = "https://www.hanlp.com/api" # Confirmed correct base URL for the client
-HANLP_API_KEY = "ODM5M0BiYnMuaGFubHAuY29tOlNMTHZkcjhHM01NenRQN1Q=" # 密钥已填入
+HANLP_BASE_URL = os.environ.get("HANLP_BASE_URL", "https://www.hanlp.com/api") # Confirmed correct base URL for the client (override e.g. for stub_server.py)
+HANLP_API_KEY = os.environ.get("HANLP_API_KEY", "ODM5M0BiYnMuaGFubHAuY29tOlNMTHZkcjhHM01NenRQN1Q=") # 密钥已填入
+HANLP_MAX_CONCURRENT_REQUESTS = max(1, int(os.environ.get("HANLP_MAX_CONCURRENT_REQUESTS", "4"))) # Chunks parsed in parallel per document
+
+# --- HanLP Parse Cache Configuration ---
+HANLP_CACHE_ENABLED = os.environ.get("HANLP_CACHE_ENABLED", "1") != "0"
+HANLP_CACHE_PATH = os.environ.get("HANLP_CACHE_PATH", str(Path(__file__).parent / "hanlp_parse_cache.sqlite3"))
+HANLP_CACHE_MAX_BYTES = int(os.environ.get("HANLP_CACHE_MAX_BYTES", str(512 * 1024 * 1024))) # LRU eviction beyond this size
+HANLP_BACKEND_VERSION = os.environ.get("HANLP_BACKEND_VERSION", "1") # Part of the cache key; bump after a HanLP model upgrade
+# --- End HanLP Parse Cache Configuration ---
+
+# --- Async Upload Job Configuration ---
+UPLOAD_JOB_WORKERS = max(1, int(os.environ.get("UPLOAD_JOB_WORKERS", "2"))) # Heavy documents processed concurrently
+UPLOAD_JOB_MAX_ACTIVE = max(1, int(os.environ.get("UPLOAD_JOB_MAX_ACTIVE", "8"))) # Queued + running jobs before new ones are rejected
+UPLOAD_JOB_RETENTION = max(1, int(os.environ.get("UPLOAD_JOB_RETENTION", "200"))) # Finished jobs kept for status/result lookups
+UPLOAD_PIPELINE_STAGES = ["pdf_parsing", "concept_extraction", "graph_update", "difficulty_analysis"] # Reported as job progress
+# --- End Async Upload Job Configuration ---
+
+# --- PDF Extraction Configuration ---
+PDF_EXTRACTION_WORKERS = max(1, int(os.environ.get("PDF_EXTRACTION_WORKERS", str(min(4, os.cpu_count() or 1))))) # Processes per large document
+PDF_PARALLEL_MIN_PAGES = max(2, int(os.environ.get("PDF_PARALLEL_MIN_PAGES", "32"))) # Smaller documents are extracted in-process
+TABLE_DETECTION_MODE = os.environ.get("TABLE_DETECTION_MODE", TABLE_DETECTION_HEURISTIC).strip().lower() # off / heuristic / full
+TABLE_COUNT_CACHE_DOCUMENTS = int(os.environ.get("TABLE_COUNT_CACHE_DOCUMENTS", "256")) # Documents whose per-page table counts are kept; 0 disables
+# --- End PDF Extraction Configuration ---
+
+# --- Knowledge Graph Store Configuration ---
+GRAPH_STORE_BACKEND = os.environ.get("GRAPH_STORE_BACKEND", "sqlite").strip().lower() # "sqlite" (persistent, shared by all workers) or "memory"
+GRAPH_STORE_PATH = os.environ.get("GRAPH_STORE_PATH", str(Path(__file__).parent / "knowledge_graph.sqlite3"))
+GRAPH_QUERY_MAX_DEPTH = 3 # Hops allowed for neighborhood queries
+GRAPH_QUERY_MAX_NODES = 2000 # Node budget for neighborhood / top-N queries
+GRAPH_PAGE_MAX_LIMIT = 5000 # Page size cap for node / link listings
+GRAPH_RESPONSE_CACHE_ENTRIES = int(os.environ.get("GRAPH_RESPONSE_CACHE_ENTRIES", "64")) # Serialized graph responses kept per worker
+GRAPH_RESPONSE_GZIP_MIN_BYTES = int(os.environ.get("GRAPH_RESPONSE_GZIP_MIN_BYTES", "1024")) # Smaller bodies are sent uncompressed
+GRAPH_CENTRALITY_DEBOUNCE_SECONDS = float(os.environ.get("GRAPH_CENTRALITY_DEBOUNCE_SECONDS", "2.0")) # Uploads within this window share one PageRank recompute
+GRAPH_PAGERANK_DAMPING = float(os.environ.get("GRAPH_PAGERANK_DAMPING", "0.85"))
+# --- End Knowledge Graph Store Configuration ---
+
+# --- Upload Deduplication Configuration ---
+UPLOAD_DEDUP_ENABLED = os.environ.get("UPLOAD_DEDUP_ENABLED", "1") != "0" # Reuse stored results for byte-identical uploads
+UPLOAD_DEDUP_BY_TEXT = os.environ.get("UPLOAD_DEDUP_BY_TEXT", "1") != "0" # Also reuse concepts for different files with identical text
+UPLOAD_DEDUP_MAX_DOCUMENTS = int(os.environ.get("UPLOAD_DEDUP_MAX_DOCUMENTS", "128")) # Stored results (LRU)
+# --- End Upload Deduplication Configuration ---
+
+# --- OwnThink Definition Lookup Configuration ---
+OWNTHINK_API_URL = os.environ.get("OWNTHINK_API_URL", "https://api.ownthink.com/kg/knowledge") # e.g. http://127.0.0.1:8765/kg/knowledge for stub_server.py; empty: local store only
+OWNTHINK_TIMEOUT_SECONDS = float(os.environ.get("OWNTHINK_TIMEOUT_SECONDS", "10"))
+OWNTHINK_MAX_CONNECTIONS = int(os.environ.get("OWNTHINK_MAX_CONNECTIONS", "10")) # Pooled keep-alive connections per worker
+DEFINITION_CACHE_MAX_ENTRIES = int(os.environ.get("DEFINITION_CACHE_MAX_ENTRIES", "10000"))
+DEFINITION_CACHE_TTL_SECONDS = float(os.environ.get("DEFINITION_CACHE_TTL_SECONDS", str(24 * 3600)))
+DEFINITION_NEGATIVE_CACHE_TTL_SECONDS = float(os.environ.get("DEFINITION_NEGATIVE_CACHE_TTL_SECONDS", "3600")) # For terms without a definition
+DEFINITION_BATCH_MAX_TERMS = int(os.environ.get("DEFINITION_BATCH_MAX_TERMS", "500")) # Terms accepted by one POST /definitions request
+DEFINITION_BATCH_CONCURRENCY = int(os.environ.get("DEFINITION_BATCH_CONCURRENCY", "8")) # Concurrent upstream lookups per batch request
+DEFINITION_PREFETCH_TOP_K = int(os.environ.get("DEFINITION_PREFETCH_TOP_K", "0")) # Most frequent concepts of each upload to prefetch; 0 disables
+DEFINITION_PREFETCH_CONCURRENCY = int(os.environ.get("DEFINITION_PREFETCH_CONCURRENCY", "2")) # Keep below OWNTHINK_MAX_CONNECTIONS
+DEFINITION_PREFETCH_MAX_PENDING = int(os.environ.get("DEFINITION_PREFETCH_MAX_PENDING", "1000"))
+# --- End OwnThink Definition Lookup Configuration ---
+
+# --- Difficulty Analysis Configuration ---
+DIFFICULTY_SCORE_NORMALIZATION = os.environ.get("DIFFICULTY_SCORE_NORMALIZATION", "none") # "none" (weighted score) or "percentile" (rank within the document)
+if DIFFICULTY_SCORE_NORMALIZATION not in SCORE_NORMALIZATION_MODES:
+    DIFFICULTY_SCORE_NORMALIZATION = "none"
+# Raw per-segment features of every upload, for re-scoring with other weights; uses the GRAPH_STORE_BACKEND kind of store
+SEGMENT_FEATURE_STORE_PATH = os.environ.get("SEGMENT_FEATURE_STORE_PATH", str(Path(__file__).parent / "segment_features.sqlite3"))
+# --- End Difficulty Analysis Configuration ---
+
+# --- API Response Serialization Configuration ---
+FAST_JSON_RESPONSES = os.environ.get("FAST_JSON_RESPONSES", "0") == "1" # Encode large responses directly instead of validating them against response_model
+# --- End API Response Serialization Configuration ---
 
 # --- Wikipedia Concept Validation Configuration ---
 # ENABLE_WIKIPEDIA_CONCEPT_VALIDATION = True # Toggle for Wikipedia validation step # Removed
@@ -33,9 +122,17 @@ HANLP_API_KEY = "ODM5M0BiYnMuaGFubHAuY29tOlNMTHZkcjhHM01NenRQN1Q=" # 密钥已
 
 # --- Local Wikipedia Titles Corpus ---
 WIKIPEDIA_TITLES_FILE = "zhwiki-latest-all-titles-in-ns0-simplified" # Assumed to be in the same directory as main.py
-LOCAL_WIKIPEDIA_TITLES_SET = set()
+WIKIPEDIA_TITLES_INDEX_FILE = WIKIPEDIA_TITLES_FILE + INDEX_FILE_SUFFIX # Compiled by `python titles_index.py <titles file>`
+LOCAL_WIKIPEDIA_TITLES_INDEX: WikipediaTitlesIndex | None = None # Memory-mapped, shared between worker processes
 # --- End Local Wikipedia Titles Corpus ---
 
+# --- Local Definition Store ---
+# term<TAB>definition dump (e.g. Wikipedia abstracts); relative paths are resolved next to main.py
+LOCAL_DEFINITIONS_DUMP_FILE = os.environ.get("LOCAL_DEFINITIONS_DUMP_FILE", "zhwiki-latest-abstracts.tsv")
+LOCAL_DEFINITIONS_STORE_FILE = LOCAL_DEFINITIONS_DUMP_FILE + STORE_FILE_SUFFIX # Compiled by `python definition_store.py <dump file>`
+LOCAL_DEFINITION_STORE: LocalDefinitionStore | None = None # Memory-mapped; consulted before the OwnThink API
+# --- End Local Definition Store ---
+
 
 # --- Initialize HanLPClient ---
 HanLP_Client = None
@@ -45,26 +142,54 @@ logger = logging.getLogger(__name__)
 
 # --- Load Local Wikipedia Titles ---
 def load_local_wikipedia_titles():
-    """Loads Wikipedia titles from the local file into a set."""
-    global LOCAL_WIKIPEDIA_TITLES_SET
+    """Memory-maps the compiled Wikipedia titles index, compiling it from the titles file if it is missing or stale."""
+    global LOCAL_WIKIPEDIA_TITLES_INDEX
     try:
-        file_path = Path(__file__).parent / WIKIPEDIA_TITLES_FILE
-        if not file_path.exists():
-            logger.error(f"Local Wikipedia titles file not found: {file_path}. Concept filtering by local corpus will be disabled.")
-            LOCAL_WIKIPEDIA_TITLES_SET = set() # Ensure it's an empty set
+        titles_path = Path(__file__).parent / WIKIPEDIA_TITLES_FILE
+        index_path = Path(__file__).parent / WIKIPEDIA_TITLES_INDEX_FILE
+        if titles_path.exists() and (not index_path.exists() or index_path.stat().st_mtime < titles_path.stat().st_mtime):
+            # One-off cost; run the build step ahead of deployment to keep worker startup fast
+            logger.warning(f"Wikipedia titles index '{index_path.name}' is missing or older than '{WIKIPEDIA_TITLES_FILE}'. Compiling it now...")
+            build_titles_index(titles_path, index_path)
+        if not index_path.exists():
+            logger.error(f"Local Wikipedia titles index not found: {index_path} (and no titles file at {titles_path}). Concept filtering by local corpus will be disabled.")
+            LOCAL_WIKIPEDIA_TITLES_INDEX = None
             return
 
-        with open(file_path, "r", encoding="utf-8") as f:
-            titles = {line.strip() for line in f if line.strip()}
-        LOCAL_WIKIPEDIA_TITLES_SET = titles
-        logger.info(f"Successfully loaded {len(LOCAL_WIKIPEDIA_TITLES_SET)} titles from '{WIKIPEDIA_TITLES_FILE}' into local corpus set.")
+        LOCAL_WIKIPEDIA_TITLES_INDEX = WikipediaTitlesIndex(index_path)
+        logger.info(f"Successfully mapped {len(LOCAL_WIKIPEDIA_TITLES_INDEX)} titles from index '{index_path.name}' into local corpus lookup.")
     except Exception as e:
-        logger.error(f"Error loading local Wikipedia titles from '{WIKIPEDIA_TITLES_FILE}': {e}", exc_info=True)
-        LOCAL_WIKIPEDIA_TITLES_SET = set() # Ensure it's an empty set on error
+        logger.error(f"Error loading local Wikipedia titles index for '{WIKIPEDIA_TITLES_FILE}': {e}", exc_info=True)
+        LOCAL_WIKIPEDIA_TITLES_INDEX = None # Ensure filtering is skipped on error
 
 load_local_wikipedia_titles() # Load at startup
 # --- End Load Local Wikipedia Titles ---
 
+# --- Load Local Definition Store ---
+def load_local_definition_store():
+    """Memory-maps the compiled local definition store, compiling it from the dump file if it is missing or stale."""
+    global LOCAL_DEFINITION_STORE
+    try:
+        dump_path = Path(__file__).parent / LOCAL_DEFINITIONS_DUMP_FILE
+        store_path = Path(__file__).parent / LOCAL_DEFINITIONS_STORE_FILE
+        if dump_path.exists() and (not store_path.exists() or store_path.stat().st_mtime < dump_path.stat().st_mtime):
+            # One-off cost; run the build step ahead of deployment to keep worker startup fast
+            logger.warning(f"Definition store '{store_path.name}' is missing or older than '{dump_path.name}'. Compiling it now...")
+            build_definition_store(dump_path, store_path)
+        if not store_path.exists():
+            logger.info(f"No local definition store at {store_path}. Definitions will be fetched from OwnThink only.")
+            LOCAL_DEFINITION_STORE = None
+            return
+
+        LOCAL_DEFINITION_STORE = LocalDefinitionStore(store_path)
+        logger.info(f"Successfully mapped {len(LOCAL_DEFINITION_STORE)} definitions from store '{store_path.name}'.")
+    except Exception as e:
+        logger.error(f"Error loading local definition store for '{LOCAL_DEFINITIONS_DUMP_FILE}': {e}", exc_info=True)
+        LOCAL_DEFINITION_STORE = None # Fall back to OwnThink only
+
+load_local_definition_store() # Load at startup
+# --- End Load Local Definition Store ---
+
 try:
     if HANLP_API_KEY and HANLP_API_KEY != "YOUR_HANLP_API_KEY": # Check if key is set
         HanLP_Client = HanLPClient(HANLP_BASE_URL, auth=HANLP_API_KEY, language='zh')
@@ -78,15 +203,91 @@ except Exception as e:
     HanLP_Client = None # Ensure it's None if initialization fails
 # --- End HanLPClient Initialization ---
 
-# --- Mock Global Knowledge Store ---
-# In a real application, this would be a connection to a graph database (Neo4j) or a structured relational database.
-# For demonstration, we use simple Python dictionaries and sets.
-global_knowledge_graph = {
-    "nodes": {},  # { "concept_term": { "name": "concept_term", "document_ids": set(), ...other_attrs } }
-    "edges": set(), # { ("source_term", "target_term", "label", "document_id") }
-    "documents": {} # { "document_id": { "title": "doc_title", ... } }
-}
-# --- End Mock Global Knowledge Store ---
+# --- Initialize HanLP Parse Cache ---
+HANLP_PARSE_CACHE: HanLPParseCache | None = None
+if HANLP_CACHE_ENABLED:
+    try:
+        HANLP_PARSE_CACHE = HanLPParseCache(HANLP_CACHE_PATH, HANLP_CACHE_MAX_BYTES)
+        logger.info(f"HanLP parse cache enabled at '{HANLP_CACHE_PATH}' (max {HANLP_CACHE_MAX_BYTES} bytes).")
+    except Exception as e:
+        logger.error(f"Failed to open HanLP parse cache at '{HANLP_CACHE_PATH}': {e}. Continuing without cache.", exc_info=True)
+        HANLP_PARSE_CACHE = None
+# --- End HanLP Parse Cache Initialization ---
+
+# --- Initialize PDF Table Detection ---
+if TABLE_DETECTION_MODE not in TABLE_DETECTION_MODES:
+    logger.warning(f"Unknown TABLE_DETECTION_MODE '{TABLE_DETECTION_MODE}', falling back to '{TABLE_DETECTION_HEURISTIC}'.")
+    TABLE_DETECTION_MODE = TABLE_DETECTION_HEURISTIC
+PDF_TABLE_COUNT_CACHE = TableCountCache(max_documents=TABLE_COUNT_CACHE_DOCUMENTS)
+logger.info(f"PDF table detection mode: '{TABLE_DETECTION_MODE}' (per-document table count cache: {TABLE_COUNT_CACHE_DOCUMENTS} documents).")
+# --- End PDF Table Detection Initialization ---
+
+# --- Initialize Upload Result Store ---
+UPLOAD_RESULT_STORE: UploadResultStore | None = UploadResultStore(max_entries=UPLOAD_DEDUP_MAX_DOCUMENTS) if UPLOAD_DEDUP_ENABLED else None
+# --- End Upload Result Store Initialization ---
+
+# --- Initialize OwnThink Definition Client ---
+OWNTHINK_DEFINITION_CLIENT = OwnThinkDefinitionClient(
+    OWNTHINK_API_URL,
+    DefinitionCache(DEFINITION_CACHE_MAX_ENTRIES, ttl=DEFINITION_CACHE_TTL_SECONDS, negative_ttl=DEFINITION_NEGATIVE_CACHE_TTL_SECONDS),
+    timeout=OWNTHINK_TIMEOUT_SECONDS,
+    max_connections=OWNTHINK_MAX_CONNECTIONS,
+    local_store=LOCAL_DEFINITION_STORE, # Local hits never reach OwnThink
+)
+# Bound to the server's event loop by the app lifespan; warms the cache for the top concepts of each upload
+DEFINITION_PREFETCHER = DefinitionPrefetcher(OWNTHINK_DEFINITION_CLIENT, concurrency=DEFINITION_PREFETCH_CONCURRENCY,
+                                             max_pending=DEFINITION_PREFETCH_MAX_PENDING)
+# --- End OwnThink Definition Client Initialization ---
+
+if FAST_JSON_RESPONSES:
+    logger.info(f"Fast JSON responses enabled for uploads and graph queries (encoder: {JSON_ENCODER}).")
+
+# --- Global Knowledge Graph Store ---
+# Documents, concepts, concept-document membership and labelled edges (see graph_store.py)
+def _open_graph_store() -> MemoryGraphStore | SQLiteGraphStore:
+    if GRAPH_STORE_BACKEND == "memory":
+        logger.info("Using in-memory knowledge graph store (not persisted, not shared between workers).")
+        return MemoryGraphStore()
+    if GRAPH_STORE_BACKEND != "sqlite":
+        logger.warning(f"Unknown GRAPH_STORE_BACKEND '{GRAPH_STORE_BACKEND}', using 'sqlite'.")
+    try:
+        store = SQLiteGraphStore(GRAPH_STORE_PATH)
+        logger.info(f"Knowledge graph store opened at '{GRAPH_STORE_PATH}': {store.stats()}")
+        return store
+    except Exception as e:
+        logger.error(f"Failed to open knowledge graph store at '{GRAPH_STORE_PATH}': {e}. Falling back to in-memory store.", exc_info=True)
+        return MemoryGraphStore()
+
+GRAPH_STORE = _open_graph_store()
+GRAPH_RESPONSE_CACHE = SerializedResponseCache(max_entries=GRAPH_RESPONSE_CACHE_ENTRIES) # Keyed by (graph version, request)
+# Degree / document frequency / PageRank per concept, recomputed in the background after graph changes
+GRAPH_CENTRALITY = GraphCentrality(GRAPH_STORE.link_snapshot, debounce_seconds=GRAPH_CENTRALITY_DEBOUNCE_SECONDS, damping=GRAPH_PAGERANK_DAMPING)
+GRAPH_CENTRALITY.schedule() # Initial scores for a persisted graph
+# --- End Global Knowledge Graph Store ---
+
+# --- Segment Feature Store ---
+def _open_segment_feature_store() -> MemorySegmentFeatureStore | SQLiteSegmentFeatureStore:
+    if GRAPH_STORE_BACKEND == "memory" or isinstance(GRAPH_STORE, MemoryGraphStore):
+        return MemorySegmentFeatureStore() # Lives as long as the documents it describes
+    try:
+        store = SQLiteSegmentFeatureStore(SEGMENT_FEATURE_STORE_PATH)
+        logger.info(f"Segment feature store opened at '{SEGMENT_FEATURE_STORE_PATH}': {store.stats()}")
+        return store
+    except Exception as e:
+        logger.error(f"Failed to open segment feature store at '{SEGMENT_FEATURE_STORE_PATH}': {e}. Falling back to in-memory store.", exc_info=True)
+        return MemorySegmentFeatureStore()
+
+SEGMENT_FEATURE_STORE = _open_segment_feature_store()
+# --- End Segment Feature Store ---
+
+# --- Background Upload Jobs ---
+upload_job_manager = JobManager(
+    stages=UPLOAD_PIPELINE_STAGES,
+    max_workers=UPLOAD_JOB_WORKERS,
+    max_active_jobs=UPLOAD_JOB_MAX_ACTIVE,
+    max_finished_jobs=UPLOAD_JOB_RETENTION,
+)
+# --- End Background Upload Jobs ---
 
 class TextProcessingRequest(BaseModel):
     """Request model for processing raw text."""
@@ -125,6 +326,32 @@ class SegmentDifficultyMarker(BaseModel):
     reasons: list[str]
     # Optional: rect: tuple[float, float, float, float] | None = None # For future use
 
+class DifficultyScoringParameters(BaseModel):
+    """Weights and formula thresholds for re-scoring stored segment features; omitted fields keep the defaults."""
+    weight_term_density: float = WEIGHT_TERM_DENSITY
+    weight_formula_complexity: float = WEIGHT_FORMULA_COMPLEXITY
+    weight_figure_table: float = WEIGHT_FIGURE_TABLE
+    weight_citation_density: float = WEIGHT_CITATION_DENSITY
+    weight_long_sentence: float = WEIGHT_LONG_SENTENCE
+    formula_count_threshold_low: int = FORMULA_COUNT_THRESHOLD_LOW
+    formula_count_threshold_high: int = FORMULA_COUNT_THRESHOLD_HIGH
+    formula_length_threshold_low: int = FORMULA_LENGTH_THRESHOLD_LOW
+    formula_length_threshold_high: int = FORMULA_LENGTH_THRESHOLD_HIGH
+    normalization: Literal["none", "percentile"] | None = None # Defaults to DIFFICULTY_SCORE_NORMALIZATION
+
+class LibraryRescoreRequest(DifficultyScoringParameters):
+    """Scoring parameters plus the documents to re-score (all documents with stored features if omitted)."""
+    document_ids: list[str] | None = None
+
+class DocumentDifficultyResponse(BaseModel):
+    """Difficulty markers of one document, re-scored from its stored segment features."""
+    document_id: str
+    difficulty_markers: list[SegmentDifficultyMarker]
+
+class LibraryDifficultyResponse(BaseModel):
+    documents: list[DocumentDifficultyResponse]
+    missing_document_ids: list[str] = [] # Requested documents without stored features
+
 class DocumentUploadResponse(BaseModel):
     """Response model after successful PDF upload and processing."""
     id: str
@@ -132,6 +359,7 @@ class DocumentUploadResponse(BaseModel):
     concepts: list[dict] # Expecting list of {term: str, definition: str | None}
     relationships: list[Relationship] # Added for graph structure
     difficulty_markers: list[SegmentDifficultyMarker] # MODIFIED HERE
+    duplicate_of: str | None = None # ID of the identical earlier upload whose stored results were reused
     # page_count: int # Optional: could add page count too
 
 class GlobalGraphResponseNode(BaseModel):
@@ -140,6 +368,10 @@ class GlobalGraphResponseNode(BaseModel):
     document_ids: list[str]
     # Add other potential node attributes for ECharts if needed, e.g., symbolSize, category
     category_index: int | None = None # Index for ECharts category based on primary document
+    degree: int | None = None # Distinct neighbouring concepts (usable for symbolSize); like the other metrics below,
+                              # from the centrality snapshot unless the query computed it, None until the next recompute
+    document_frequency: int | None = None # Number of documents containing the concept
+    pagerank: float | None = None # PageRank centrality (scores sum to 1)
 
 class GlobalGraphResponseLink(BaseModel):
     source: str # Source concept term
@@ -157,11 +389,121 @@ class GlobalGraphResponse(BaseModel):
     links: list[GlobalGraphResponseLink]
     documents: list[GlobalGraphResponseDocument] # To map document_ids to titles for category names
 
+class SubgraphResponse(GlobalGraphResponse):
+    """Response model for neighborhood / top-N graph queries."""
+    truncated: bool = False # True if more nodes matched than were returned
+
+class GraphNodeItem(BaseModel):
+    id: str # Concept term
+    name: str # Concept term
+    document_ids: list[str]
+    degree: int
+    document_frequency: int
+    pagerank: float | None = None
+
+class RankedConcept(BaseModel):
+    id: str # Concept term
+    name: str # Concept term
+    pagerank: float
+    degree: int
+    document_frequency: int
+
+class ConceptRankingResponse(BaseModel):
+    """Response model for /graph/rankings."""
+    metric: str
+    graph_version: int # Graph version the metrics were computed at
+    stale: bool # True while a newer graph version awaits the background recompute
+    items: list[RankedConcept]
+
+class GraphNodePageResponse(BaseModel):
+    """One page of the concept listing; pass next_cursor back as ?cursor= for the next page."""
+    items: list[GraphNodeItem]
+    next_cursor: str | None = None
+
+class GraphLinkPageResponse(BaseModel):
+    """One page of the link listing; pass next_cursor back as ?cursor= for the next page."""
+    items: list[GlobalGraphResponseLink]
+    next_cursor: str | None = None
+
 class DefinitionResponse(BaseModel):
     """Response model for a term definition."""
     term: str
     definition: str | None
 
+class DefinitionBatchRequest(BaseModel):
+    """Request model for looking up several term definitions at once."""
+    terms: list[str]
+
+class DefinitionBatchResponse(BaseModel):
+    """Definitions of the requested terms (null if not found/error), keyed by term in request order."""
+    definitions: dict[str, str | None]
+    cached: int  # Terms answered from the local definition store or the definition cache
+    fetched: int # Terms looked up from OwnThink by this request
+
+class JobSubmissionResponse(BaseModel):
+    """Response model returned when an asynchronous upload job has been queued."""
+    job_id: str
+    document_id: str
+    status: str
+    status_url: str
+
+class JobStageProgress(BaseModel):
+    name: str     # One of UPLOAD_PIPELINE_STAGES
+    status: str   # "pending", "running" or "done"
+    progress: float # 0-1 within this stage
+
+class JobStatusResponse(BaseModel):
+    """Response model for the status of an asynchronous upload job."""
+    job_id: str
+    status: str   # "queued", "running", "succeeded" or "failed"
+    current_stage: str | None
+    stages: list[JobStageProgress]
+    created_at: float # Unix timestamps
+    started_at: float | None
+    finished_at: float | None
+    error: str | None
+
+class HanLPCacheStatsResponse(BaseModel):
+    """Response model for HanLP parse cache statistics (counters are per worker process)."""
+    enabled: bool
+    hits: int = 0
+    misses: int = 0
+    hit_rate: float = 0.0
+    evictions: int = 0
+    entries: int = 0
+    size_bytes: int = 0
+    max_bytes: int = 0
+
+class DefinitionCacheStatsResponse(BaseModel):
+    """Counters of the OwnThink definition cache and client (per worker process)."""
+    hits: int
+    negative_hits: int # Cached "no definition" answers
+    misses: int
+    hit_rate: float
+    entries: int
+    max_entries: int
+    upstream_requests: int
+    upstream_errors: int
+    coalesced: int # Lookups that waited for an identical in-flight request
+    in_flight: int
+    local_hits: int = 0    # Answered from the local definition store
+    local_entries: int = 0
+    prefetch_queued: int = 0    # Terms queued by the post-upload prefetch (DEFINITION_PREFETCH_TOP_K)
+    prefetch_completed: int = 0
+    prefetch_skipped: int = 0   # Already cached or queued
+    prefetch_dropped: int = 0   # Queue full
+    prefetch_pending: int = 0
+
+class UploadDedupStatsResponse(BaseModel):
+    """Counters of the store of finished upload results (byte- and text-fingerprint lookups)."""
+    enabled: bool
+    hits: int = 0
+    misses: int = 0
+    hit_rate: float = 0.0
+    entries: int = 0
+    max_entries: int = 0
+    in_flight: int = 0
+
 # --- Helper Functions ---
 
 # Default POS patterns configuration (PKU tagset)
@@ -330,13 +672,49 @@ def _extract_relations_from_dep(doc: dict,
     logger.info(f"Extracted {len(final_relationships)} unique relationships using DEP (simplified, with labels). Details: {len(extracted_word_level_triples)} raw word-level triples.")
     return final_relationships
 
-def _extract_noun_phrases_from_pos(tokens: list[str], tags: list[str], pos_config: dict = DEFAULT_POS_CONFIG) -> set[str]:
-    """Extracts potential noun phrases based on POS patterns."""
+# Max length of N-gram to consider (e.g., up to 6 words)
+MAX_NGRAM_LEN = 6
+
+def _extract_title_ngrams(tokens: list[str], titles_index: WikipediaTitlesIndex, max_ngram_len: int = MAX_NGRAM_LEN) -> set[str]:
+    """Extracts the 1..max_ngram_len token N-grams that are Wikipedia titles, walking the titles index like a trie.
+
+    From each token we extend the N-gram one token at a time and stop as soon as no title starts with the
+    concatenation, so only candidates that can survive the local corpus filter are ever built.
+    """
+    phrases = set()
+    n = len(tokens)
+    lowered_tokens = [token.lower() for token in tokens]
+    for i in range(n):
+        lo, hi = 0, len(titles_index)
+        ngram_phrase = ""
+        for k in range(min(max_ngram_len, n - i)):
+            ngram_phrase += lowered_tokens[i + k]
+            prefix = ngram_phrase.lstrip()
+            lo, hi, is_title = titles_index.match_prefix(prefix, lo, hi)
+            if lo >= hi:
+                break
+            candidate = prefix.rstrip()
+            if candidate != prefix: # Titles are stored stripped, so check the stripped form directly
+                is_title = candidate in titles_index
+            if is_title:
+                phrases.add(candidate)
+    return phrases
+
+def _extract_noun_phrases_from_pos(tokens: list[str], tags: list[str], pos_config: dict = DEFAULT_POS_CONFIG,
+                                   titles_index: WikipediaTitlesIndex | None = None) -> set[str]:
+    """Extracts potential noun phrases based on POS patterns.
+       If a non-empty titles index is given, only N-grams that are Wikipedia titles are returned (see _extract_title_ngrams).
+    """
     phrases = set()
     n = len(tokens)
     if n == 0 or n != len(tags):
         return phrases
 
+    if titles_index:
+        # Every POS pattern below is itself a 1-3 token N-gram, so the guided walk yields exactly
+        # the candidates of this function that would pass the local corpus filter.
+        return _extract_title_ngrams(tokens, titles_index)
+
     noun_tags = pos_config.get('noun_tags', ())
     adj_tags = pos_config.get('adj_tags', ())
     verb_tags = pos_config.get('verb_tags', ())
@@ -382,7 +760,6 @@ def _extract_noun_phrases_from_pos(tokens: list[str], tags: list[str], pos_confi
         # This will generate many candidates, to be filtered by the Wikipedia titles set.
         # This is added *in addition* to the more specific POS patterns above, or could replace them.
         # Let's make it additive for now to capture both specific linguistic patterns and general N-grams.
-        MAX_NGRAM_LEN = 6 # Max length of N-gram to consider (e.g., up to 6 words)
         for k in range(MAX_NGRAM_LEN):
             if i + k < n:
                 # Form an N-gram of length k+1 starting at index i
@@ -418,7 +795,8 @@ def _process_ner_results(doc: dict, ner_task_name: str) -> set[str]:
                  logger.warning(f"Malformed sentence data found in NER results: {sentence_entities}")
     return entities
 
-def _process_pos_results(doc: dict, tok_task_name: str, pos_task_name: str, pos_config: dict = DEFAULT_POS_CONFIG) -> set[str]:
+def _process_pos_results(doc: dict, tok_task_name: str, pos_task_name: str, pos_config: dict = DEFAULT_POS_CONFIG,
+                         titles_index: WikipediaTitlesIndex | None = None) -> set[str]:
     """Extracts lowercased noun phrases from POS results."""
     noun_phrases = set()
     tok_result = doc.get(tok_task_name)
@@ -431,14 +809,133 @@ def _process_pos_results(doc: dict, tok_task_name: str, pos_task_name: str, pos_
     for tokens, tags in zip(tok_result, pos_result):
         if isinstance(tokens, list) and isinstance(tags, list) and len(tokens) == len(tags):
             # _extract_noun_phrases_from_pos now returns lowercased phrases
-            sentence_phrases = _extract_noun_phrases_from_pos(tokens, tags, pos_config)
+            sentence_phrases = _extract_noun_phrases_from_pos(tokens, tags, pos_config, titles_index)
             noun_phrases.update(sentence_phrases)
         else:
             logger.warning(f"Malformed token/tag data in sentence. Tokens: {tokens}, Tags: {tags}")
     return noun_phrases
 
-def extract_concepts_hanlp(text: str) -> dict:
-    """Extracts concepts using HanLPClient, filters by local Wikipedia titles, and extracts co-occurrence relationships."""
+# --- Sentence-aware chunking for HanLP requests ---
+HANLP_MAX_CHUNK_SIZE = 6000 # Max characters per HanLP request
+HANLP_MIN_CHUNK_SIZE = 5
+# A sentence ends after CJK/Latin terminators (a Latin '.' only when followed by whitespace, so decimals like "3.14" stay intact),
+# plus any closing quotes/brackets and trailing whitespace, or at a blank line (paragraph break in extracted PDF text).
+_SENTENCE_BOUNDARY_PATTERN = re.compile(r'(?:[。！？!?；;…]+|\.(?=\s)|(?=\n[ \t]*\n))[”’」』）)\]"\']*\s*')
+# Soft break points used only when a single sentence is longer than a whole chunk
+_CLAUSE_BOUNDARY_PATTERN = re.compile(r'[，,、：:]\s*|\s+')
+# PDF line wraps inside CJK text are not real whitespace; drop them so HanLP sees the words joined
+_CJK_CHAR_CLASS = r'[\u3000-\u303f\u4e00-\u9fff\uff00-\uffef]'
+_CJK_LINE_BREAK_PATTERN = re.compile(rf'(?<={_CJK_CHAR_CLASS})[ \t]*\n[ \t]*(?={_CJK_CHAR_CLASS})')
+_WHITESPACE_RUN_PATTERN = re.compile(r'\s+')
+
+def _split_into_sentences(text: str) -> list[str]:
+    """Splits text into whitespace-normalized sentences (each keeps its terminator and one trailing space, if any)."""
+    text = _CJK_LINE_BREAK_PATTERN.sub("", text)
+    raw_sentences = []
+    start = 0
+    for match in _SENTENCE_BOUNDARY_PATTERN.finditer(text):
+        if match.end() > start:
+            raw_sentences.append(text[start:match.end()])
+            start = match.end()
+    if start < len(text):
+        raw_sentences.append(text[start:])
+    sentences = []
+    for raw_sentence in raw_sentences:
+        sentence = _WHITESPACE_RUN_PATTERN.sub(" ", raw_sentence)
+        if sentence.strip():
+            sentences.append(sentence)
+    return sentences
+
+def _split_oversized_sentence(sentence: str, max_chunk_size: int) -> list[str]:
+    """Splits a sentence longer than max_chunk_size, preferring the last clause break or space inside each window."""
+    pieces = []
+    while len(sentence) > max_chunk_size:
+        cut = 0
+        for match in _CLAUSE_BOUNDARY_PATTERN.finditer(sentence, 0, max_chunk_size):
+            cut = match.end()
+        if cut <= 0:
+            cut = max_chunk_size # No break point at all: hard cut
+        pieces.append(sentence[:cut])
+        sentence = sentence[cut:]
+    if sentence:
+        pieces.append(sentence)
+    return pieces
+
+def _split_text_into_chunks(text: str, max_chunk_size: int = HANLP_MAX_CHUNK_SIZE, min_chunk_size: int = HANLP_MIN_CHUNK_SIZE) -> list[str]:
+    """Greedily packs whole sentences into chunks of at most max_chunk_size characters.
+       No sentence spans two chunks unless it is longer than a chunk on its own. Filling each chunk as far as
+       possible before starting the next gives the fewest chunks (API calls) for an in-order packing.
+    """
+    chunks = []
+    current_parts = []
+    current_length = 0
+
+    def flush_current_chunk():
+        chunk = "".join(current_parts).strip()
+        if len(chunk) >= min_chunk_size:
+            chunks.append(chunk)
+        elif chunk:
+            logger.debug(f"Skipping chunk shorter than {min_chunk_size} chars: '{chunk[:50]}...'")
+        current_parts.clear()
+
+    for sentence in _split_into_sentences(text):
+        pieces = [sentence] if len(sentence) <= max_chunk_size else _split_oversized_sentence(sentence, max_chunk_size)
+        for piece in pieces:
+            if current_length + len(piece) > max_chunk_size and current_parts:
+                flush_current_chunk()
+                current_length = 0
+            current_parts.append(piece)
+            current_length += len(piece)
+    flush_current_chunk()
+    return chunks
+# --- End sentence-aware chunking ---
+
+def _parse_hanlp_chunk(chunk: str, api_tasks: list[str], skip_api_tasks: str) -> dict:
+    """Parses one chunk via HanLPClient, serving repeated identical requests from the on-disk parse cache."""
+    if HANLP_PARSE_CACHE is None:
+        return HanLP_Client.parse(text=chunk, tasks=api_tasks, skip_tasks=skip_api_tasks)
+
+    cache_key = HanLPParseCache.make_key(chunk, api_tasks, skip_api_tasks, f"{HANLP_BASE_URL}@{HANLP_BACKEND_VERSION}")
+    cached_doc = HANLP_PARSE_CACHE.get(cache_key)
+    if cached_doc is not None:
+        logger.debug(f"HanLP parse cache hit for chunk (length {len(chunk)}).")
+        return cached_doc
+    parsed_doc = HanLP_Client.parse(text=chunk, tasks=api_tasks, skip_tasks=skip_api_tasks)
+    HANLP_PARSE_CACHE.put(cache_key, parsed_doc)
+    return parsed_doc
+
+def _iter_hanlp_chunk_results(chunks: list[str], api_tasks: list[str], skip_api_tasks: str,
+                              max_concurrency: int = HANLP_MAX_CONCURRENT_REQUESTS) -> Iterator[tuple[int, dict | None, Exception | None]]:
+    """Parses chunks via HanLPClient with at most max_concurrency requests in flight.
+       Yields (chunk_index, parsed_doc, error) strictly in chunk order; a failed chunk yields (index, None, error).
+    """
+    if not chunks:
+        return
+    worker_count = max(1, min(max_concurrency, len(chunks)))
+    with ThreadPoolExecutor(max_workers=worker_count, thread_name_prefix="hanlp-chunk") as executor:
+        futures = [executor.submit(_parse_hanlp_chunk, chunk, api_tasks, skip_api_tasks) for chunk in chunks]
+        for i, future in enumerate(futures):
+            try:
+                yield i, future.result(), None
+            except Exception as e:
+                yield i, None, e
+
+# Concept length bounds for Filtering Stage 1
+MIN_CONCEPT_LEN = 3 # Increased min length
+MAX_CONCEPT_LEN = 25
+
+def _concept_passes_filters(concept_text: str) -> bool:
+    """Per-concept equivalent of the filtering in extract_concepts_hanlp (local corpus + Stage 1), used for streaming."""
+    if LOCAL_WIKIPEDIA_TITLES_INDEX and concept_text not in LOCAL_WIKIPEDIA_TITLES_INDEX:
+        return False
+    return concept_text not in DEFAULT_STOPWORDS and MIN_CONCEPT_LEN <= len(concept_text) <= MAX_CONCEPT_LEN
+
+def extract_concepts_hanlp(text: str, on_chunk_done: Callable[[int, int], None] | None = None,
+                           on_chunk_concepts: Callable[[int, int, list[str]], None] | None = None) -> dict:
+    """Extracts concepts using HanLPClient, filters by local Wikipedia titles, and extracts co-occurrence relationships.
+       on_chunk_done(done, total) is called after each chunk has been processed (successfully or not).
+       on_chunk_concepts(chunk_index, total, new_terms) receives, per chunk, the final concepts first seen in that chunk.
+    """
     if not HanLP_Client:
         logger.error("HanLPClient not initialized. Skipping concept extraction.")
         return {"concepts": [], "relationships": []}
@@ -448,30 +945,18 @@ def extract_concepts_hanlp(text: str) -> dict:
 
     logger.info(f"Starting HanLP concept extraction (NER+POS) for text length: {len(text)}. Will filter by local Wikipedia titles.")
 
-    # --- Chunking Logic (remains the same) ---
-    MAX_CHUNK_SIZE = 6000
-    MIN_CHUNK_SIZE = 5
-    chunks = []
-    start_index = 0
-    text_length = len(text)
-    while start_index < text_length:
-        end_index = min(start_index + MAX_CHUNK_SIZE, text_length)
-        chunk = text[start_index:end_index]
-        trimmed_chunk = chunk.strip()
-        if trimmed_chunk and len(trimmed_chunk) >= MIN_CHUNK_SIZE:
-            chunks.append(trimmed_chunk)
-        elif chunk.strip():
-            logger.debug(f"Skipping chunk shorter than {MIN_CHUNK_SIZE} chars: '{trimmed_chunk[:50]}...'")
-        start_index = end_index
+    # --- Chunking Logic: whole sentences packed up to HANLP_MAX_CHUNK_SIZE ---
+    chunks = _split_text_into_chunks(text)
     # --- End Chunking Logic ---
 
-    logger.info(f"Split text into {len(chunks)} chunks (target size ~{MAX_CHUNK_SIZE} chars) for HanLPClient processing.")
+    logger.info(f"Packed text into {len(chunks)} sentence-aligned chunks (max {HANLP_MAX_CHUNK_SIZE} chars) for HanLPClient processing.")
 
     all_ner_entities = set()
     all_pos_noun_phrases = set()
     processed_chunk_count = 0
     all_sentences_tok_output = []
     all_sentences_dep_output = []
+    streamed_candidates = set() # Raw candidates already checked for on_chunk_concepts
 
     # --- Define API tasks and POS config --- 
     ner_task_name = 'ner/ontonotes'
@@ -483,13 +968,14 @@ def extract_concepts_hanlp(text: str) -> dict:
     current_pos_config = DEFAULT_POS_CONFIG
     # --- End API tasks and POS config --- 
 
-    for i, chunk in enumerate(chunks):
-        logger.debug(f"Processing chunk {i+1}/{len(chunks)} via HanLPClient (Tasks: {api_tasks}), length: {len(chunk)}")
-        current_chunk_doc = None # To store the HanLP parse result for the current chunk
+    logger.debug(f"Dispatching {len(chunks)} chunks via HanLPClient (Tasks: {api_tasks}) with up to {HANLP_MAX_CONCURRENT_REQUESTS} concurrent requests.")
+    # Results arrive in chunk order, so the tok/dep outputs below stay aligned sentence by sentence
+    for i, current_chunk_doc, chunk_error in _iter_hanlp_chunk_results(chunks, api_tasks, skip_api_tasks):
+        chunk = chunks[i]
         try:
-            # --- Call HanLP API --- 
-            current_chunk_doc = HanLP_Client.parse(text=chunk, tasks=api_tasks, skip_tasks=skip_api_tasks)
-            logger.debug(f"HanLPClient response for chunk {i+1} received.")
+            if chunk_error is not None:
+                raise chunk_error
+            logger.debug(f"HanLPClient response for chunk {i+1}/{len(chunks)} received, length: {len(chunk)}")
 
             if i == 0 and logger.isEnabledFor(logging.DEBUG): # Only log for the first chunk
                 logger.debug(f"--- Raw HanLP API Output for First Chunk ---")
@@ -504,7 +990,7 @@ def extract_concepts_hanlp(text: str) -> dict:
             all_ner_entities.update(chunk_ner_entities)
             logger.debug(f"Processed {len(chunk_ner_entities)} NER entities from chunk {i+1}.")
 
-            chunk_pos_phrases = _process_pos_results(current_chunk_doc, tok_task_name, pos_task_name, current_pos_config)
+            chunk_pos_phrases = _process_pos_results(current_chunk_doc, tok_task_name, pos_task_name, current_pos_config, LOCAL_WIKIPEDIA_TITLES_INDEX)
             all_pos_noun_phrases.update(chunk_pos_phrases)
             logger.debug(f"Processed {len(chunk_pos_phrases)} POS noun phrases from chunk {i+1}.")
 
@@ -513,15 +999,26 @@ def extract_concepts_hanlp(text: str) -> dict:
                 all_sentences_tok_output.extend(current_chunk_doc.get(tok_task_name))
             if dep_task_name in current_chunk_doc and current_chunk_doc.get(dep_task_name):
                 all_sentences_dep_output.extend(current_chunk_doc.get(dep_task_name))
+
+            if on_chunk_concepts:
+                # The filters are per concept, so the union of these per-chunk results equals the final concept set
+                new_candidates = (chunk_ner_entities | chunk_pos_phrases) - streamed_candidates
+                streamed_candidates.update(new_candidates)
+                on_chunk_concepts(i, len(chunks), sorted(c for c in new_candidates if _concept_passes_filters(c)))
             
             # --- End Processing --- 
             processed_chunk_count += 1
 
         except Exception as e: # This is the except block for the try statement above
             logger.error(f"Error during HanLPClient processing for chunk {i+1} (length {len(chunk)}): {e}", exc_info=True)
-            continue # This continue is for the loop `for i, chunk in enumerate(chunks):`
+            continue # Failures stay isolated to their chunk; keep consuming the remaining results
+        finally:
+            if on_chunk_done:
+                on_chunk_done(i + 1, len(chunks))
                  
     logger.info(f"Finished HanLPClient processing for {processed_chunk_count}/{len(chunks)} chunks.")
+    if HANLP_PARSE_CACHE is not None:
+        logger.info(f"HanLP parse cache stats: {HANLP_PARSE_CACHE.stats()}")
     logger.info(f"Total raw NER entities: {len(all_ner_entities)}, Total raw POS noun phrases: {len(all_pos_noun_phrases)}")
 
     # --- Combine and Filter Concepts --- 
@@ -532,8 +1029,8 @@ def extract_concepts_hanlp(text: str) -> dict:
     # --- Wikipedia Validation Step (New) ---
     concepts_to_filter_stage1 = set()
     # if ENABLE_WIKIPEDIA_CONCEPT_VALIDATION: # Removed this toggle, local filtering is now default if file loads
-    if LOCAL_WIKIPEDIA_TITLES_SET: # Check if the local corpus was loaded successfully
-        logger.info(f"Starting filtering of {len(combined_concepts)} raw concepts using local Wikipedia titles set ({len(LOCAL_WIKIPEDIA_TITLES_SET)} titles)...")
+    if LOCAL_WIKIPEDIA_TITLES_INDEX: # Check if the local corpus was loaded successfully (and is not empty)
+        logger.info(f"Starting filtering of {len(combined_concepts)} raw concepts using local Wikipedia titles index ({len(LOCAL_WIKIPEDIA_TITLES_INDEX)} titles)...")
         # validated_count = 0 # Renamed
         # wiki_filtered_count = 0 # Renamed
         # processed_wiki_checks = 0 # Renamed
@@ -548,20 +1045,18 @@ def extract_concepts_hanlp(text: str) -> dict:
             if (i + 1) % 500 == 0 or i == len(combined_concepts_list) - 1 : # Log every 500 or on the last item
                 logger.info(f"Local Wikipedia titles filtering progress: {i+1}/{len(combined_concepts_list)}")
             
-            # Concept text is already lowercased. We should ideally load Wikipedia titles as lowercase too,
-            # or normalize one of them here for comparison. Assuming titles in file are not necessarily lowercase.
-            # For simplicity now, directly check. If titles are mixed case, this might miss some.
-            # TODO: Consider normalizing LOCAL_WIKIPEDIA_TITLES_SET to lowercase upon loading for case-insensitive matching.
-            if concept_text in LOCAL_WIKIPEDIA_TITLES_SET or concept_text.lower() in LOCAL_WIKIPEDIA_TITLES_SET: # Attempt case-insensitive
+            # Titles are stored case-normalized (stripped + lowercased) in the index, and the lookup
+            # normalizes the concept the same way, so this check is case-insensitive.
+            if concept_text in LOCAL_WIKIPEDIA_TITLES_INDEX:
                 concepts_passing_local_corpus_filter.add(concept_text) # Already lowercase
             else:
-                logger.debug(f"[Local Corpus Filter] Removed '{concept_text}' (not found in local Wikipedia titles set).")
+                logger.debug(f"[Local Corpus Filter] Removed '{concept_text}' (not found in local Wikipedia titles index).")
                 local_corpus_filtered_out_count +=1
         
         logger.info(f"Finished local Wikipedia titles filtering. Kept: {len(concepts_passing_local_corpus_filter)}, Removed: {local_corpus_filtered_out_count}.")
         concepts_to_filter_stage1 = concepts_passing_local_corpus_filter
     else:
-        logger.warning("Local Wikipedia titles set is empty or not loaded. Skipping filtering by local corpus.")
+        logger.warning("Local Wikipedia titles index is empty or not loaded. Skipping filtering by local corpus.")
         concepts_to_filter_stage1 = combined_concepts
     # --- End Wikipedia Validation Step ---
 
@@ -574,7 +1069,7 @@ def extract_concepts_hanlp(text: str) -> dict:
     #     logger.debug(f"Sample of concepts entering Stage 1 filtering (after Wikipedia validation): {sample_validated_concepts}")
     if logger.isEnabledFor(logging.DEBUG):
         sample_concepts_after_local_corpus_filter = sorted(list(concepts_to_filter_stage1))[:100]
-        if LOCAL_WIKIPEDIA_TITLES_SET:
+        if LOCAL_WIKIPEDIA_TITLES_INDEX:
             logger.debug(f"Sample of concepts entering Stage 1 filtering (after local Wikipedia titles filter): {sample_concepts_after_local_corpus_filter}")
         else:
             logger.debug(f"Sample of concepts entering Stage 1 filtering (local Wikipedia titles filter skipped): {sample_concepts_after_local_corpus_filter}")
@@ -584,8 +1079,8 @@ def extract_concepts_hanlp(text: str) -> dict:
     filtered_concepts_stage1 = set()
     # numeric_punct_pattern definition is removed as per user's previous file state
 
-    min_concept_len = 3 # Increased min length
-    max_concept_len = 25
+    min_concept_len = MIN_CONCEPT_LEN
+    max_concept_len = MAX_CONCEPT_LEN
     current_stopwords = DEFAULT_STOPWORDS # Using the minimal stopwords
 
     logger.debug("--- Filtering Stage 1: Basic format, length, minimal stopwords --- ") # Log message updated
@@ -655,177 +1150,52 @@ def extract_concepts_hanlp(text: str) -> dict:
     return {"concepts": concept_objects, "relationships": relationship_objects}
 
 # --- Modified function to use OwnThink API ---
-def get_ownthink_definition(term: str) -> str | None:
-    """Fetches a brief definition for a term from the OwnThink Knowledge Graph API."""
-    logger.info(f"Attempting to fetch definition for term: '{term}' from OwnThink API.")
-    
-    api_url = "https://api.ownthink.com/kg/knowledge?entity" 
-    params = {"entity": term}
-    definition = None
-    
-    try:
-        # Use POST method as shown in 1.py, sending term in JSON payload
-        response = requests.post(api_url, json=params, timeout=10) # Added timeout
-        
-        # Check if the request was successful
-        if response.status_code == 200:
-            data = response.json()
-            if data.get("message") == "success" and "data" in data:
-                entity_data = data["data"]
-                if "desc" in entity_data and entity_data["desc"]:
-                    definition = entity_data["desc"]
-                    logger.info(f"Successfully fetched definition for '{term}' from OwnThink: {definition[:50]}...") # Log first 50 chars
-                else:
-                    logger.warning(f"OwnThink API success for '{term}', but 'desc' field missing or empty in data: {entity_data}")
-            elif data.get("message"):
-                 logger.warning(f"OwnThink API returned non-success message for '{term}': {data.get('message')}")
-            else:
-                logger.warning(f"OwnThink API success for '{term}', but response format unexpected: {data}")
+async def get_ownthink_definition(term: str) -> str | None:
+    """Fetches a brief definition for a term from the OwnThink Knowledge Graph API (pooled, cached, coalesced)."""
+    return await OWNTHINK_DEFINITION_CLIENT.get_definition(term)
+
+async def iter_ownthink_definitions(terms: list[str], concurrency: int = DEFINITION_BATCH_CONCURRENCY) -> AsyncIterator[tuple[str, str | None, bool]]:
+    """Yields (term, definition, cached) once per distinct term: cache hits immediately, then the remaining
+    terms as their lookups complete, with at most concurrency lookups in flight."""
+    uncached = []
+    for term in dict.fromkeys(terms):
+        found, definition = OWNTHINK_DEFINITION_CLIENT.cached_definition(term)
+        if found:
+            yield term, definition, True
         else:
-            logger.error(f"OwnThink API request failed for '{term}'. Status Code: {response.status_code}, Response: {response.text[:200]}") # Log first 200 chars of error response
+            uncached.append(term)
+    if not uncached:
+        return
 
-    except requests.exceptions.RequestException as e:
-        # Catch potential network errors, timeouts, etc.
-        logger.error(f"An unexpected error occurred fetching definition for '{term}' from OwnThink API: {e}", exc_info=True)
-    except Exception as e:
-        # Catch other potential errors (e.g., JSON decoding)
-        logger.error(f"An unexpected error occurred processing OwnThink API response for '{term}': {e}", exc_info=True)
-
-    return definition
-# --- End Modified function ---
-
-# Constants for difficulty analysis weights
-WEIGHT_TERM_DENSITY = 0.30
-WEIGHT_FORMULA_COMPLEXITY = 0.25
-WEIGHT_FIGURE_TABLE = 0.20
-WEIGHT_CITATION_DENSITY = 0.15
-WEIGHT_LONG_SENTENCE = 0.10
-
-# Other existing constants for thresholds
-LONG_SENTENCE_CHAR_THRESHOLD = 120
-
-# New thresholds for formula complexity (tiered scoring)
-FORMULA_COUNT_THRESHOLD_LOW = 1
-FORMULA_COUNT_THRESHOLD_HIGH = 3 # Stricter high threshold
-FORMULA_LENGTH_THRESHOLD_LOW = 20  # Total characters for low complexity
-FORMULA_LENGTH_THRESHOLD_HIGH = 80 # Stricter high threshold for total length
-
-def _analyze_segment_difficulty(
-    segment_text: str,
-    concepts_on_document: set[str],
-    segment_id: str,
-    page_index: int,
-    block_index_on_page: int,
-    figure_count_on_page: int, # Changed from page_has_figures
-    table_count_on_page: int    # Changed from page_has_tables
-) -> SegmentDifficultyMarker:
-    """Analyzes a single text segment (block) for cognitive difficulty indicators using a weighted scoring model."""
-    raw_scores = {
-        "term_density": 0.0,
-        "formula_complexity": 0.0,
-        "figure_table": 0.0,
-        "citation_density": 0.0,
-        "long_sentence": 0.0
-    }
-    reasons = []
-    current_segment_text = segment_text if isinstance(segment_text, str) else ""
-    segment_text_lower = current_segment_text.lower().strip()
-    text_preview = current_segment_text.strip()[:100]
-
-    if not segment_text_lower:
-        return SegmentDifficultyMarker(
-            segment_id=segment_id, page_index=page_index, block_index_on_page=block_index_on_page,
-            text_preview=text_preview, score=0.0, reasons=[]
-        )
+    semaphore = asyncio.Semaphore(max(1, concurrency))
 
-    # 1. Academic Term Density
-    concepts_found_in_segment = {c for c in concepts_on_document if c in segment_text_lower}
-    term_count = len(concepts_found_in_segment)
-    raw_scores["term_density"] = float(term_count)
-    if term_count > 0:
-        reasons.append(f"term_density_segment ({term_count})")
-
-    # 2. Formula Complexity
-    formula_pattern_str = r"([a-zA-Z]?\s*[+\-\*/=<>≤≥∈∑∫∏√^]\s*[a-zA-Z\d])|(\b(alpha|beta|gamma|delta|epsilon|zeta|eta|theta|iota|kappa|lambda|mu|nu|xi|omicron|pi|rho|sigma|tau|upsilon|phi|chi|psi|omega)\b)|([\d.\s]*[+\-\*/=<>≤≥∈∑∫∏√^][\d.\s]+)|(\([+\-\*/=<>≤≥∈∑∫∏√^]+\))|(\[[\w\s+\-\*/=<>≤≥∈∑∫∏√^]+\])|(\{[\w\s+\-\*/=<>≤≥∈∑∫∏√^]+\})"
-    formula_matches_iter = list(re.finditer(formula_pattern_str, segment_text_lower, re.VERBOSE | re.IGNORECASE))
-    formula_count = len(formula_matches_iter)
-    total_formula_length = sum(match.end() - match.start() for match in formula_matches_iter)
-    
-    # Tiered scoring for formulas
-    raw_scores["formula_complexity"] = 0.0
-    has_any_formula = formula_count > 0 or total_formula_length > 0
-    is_high_complexity = formula_count >= FORMULA_COUNT_THRESHOLD_HIGH or total_formula_length >= FORMULA_LENGTH_THRESHOLD_HIGH
-    is_medium_complexity = formula_count >= FORMULA_COUNT_THRESHOLD_LOW or total_formula_length >= FORMULA_LENGTH_THRESHOLD_LOW
-
-    if is_high_complexity:
-        raw_scores["formula_complexity"] = 1.0
-    elif is_medium_complexity:
-        raw_scores["formula_complexity"] = 0.6 # Tier for medium complexity
-    elif has_any_formula:
-        raw_scores["formula_complexity"] = 0.2 # Tier for low/any complexity
-
-    if has_any_formula:
-        reasons.append(f"formulas_in_segment (count: {formula_count}, length: {total_formula_length})")
-
-    # 3. Figure/Table Count on Page
-    raw_scores["figure_table"] = float(figure_count_on_page) + float(table_count_on_page)
-    if figure_count_on_page > 0:
-        reasons.append(f"figures_on_page ({figure_count_on_page})")
-    if table_count_on_page > 0:
-        reasons.append(f"tables_on_page ({table_count_on_page})")
-
-    # 4. Citation Density
-    citation_pattern_str = r"(\[\d+\])|(\([^)]*\d{4}[^(]*\))|(\b[A-Za-z]+\s+et\s+al\.,?\s+\d{4})"
-    citation_count = len(list(re.finditer(citation_pattern_str, current_segment_text)))
-    raw_scores["citation_density"] = float(citation_count)
-    if citation_count > 0:
-        reasons.append(f"citations_in_segment ({citation_count})")
-
-    # 5. Long Sentence Detection
-    sentence_parts = re.split(r'([。？！；!?;]+)', current_segment_text)
-    sentences = []
-    current_sentence_agg = "" # Renamed to avoid conflict
-    for part in sentence_parts:
-        if not part: continue
-        current_sentence_agg += part
-        if re.match(r'^[。？！；!?;]+$', part.strip()): 
-            if current_sentence_agg.strip():
-                sentences.append(current_sentence_agg.strip())
-            current_sentence_agg = ""
-    if current_sentence_agg.strip():
-        sentences.append(current_sentence_agg.strip())
-    
-    sentences = [s for s in sentences if len(s) > 5] 
-    long_sentence_count = 0
-    for sent in sentences:
-        if len(sent) > LONG_SENTENCE_CHAR_THRESHOLD:
-            long_sentence_count += 1
-    
-    raw_scores["long_sentence"] = float(long_sentence_count)
-    if long_sentence_count > 0:
-        reasons.append(f"long_sentences_in_segment ({long_sentence_count})")
-
-    # Calculate final weighted score
-    final_score = (
-        raw_scores["term_density"] * WEIGHT_TERM_DENSITY +
-        raw_scores["formula_complexity"] * WEIGHT_FORMULA_COMPLEXITY +
-        raw_scores["figure_table"] * WEIGHT_FIGURE_TABLE +
-        raw_scores["citation_density"] * WEIGHT_CITATION_DENSITY +
-        raw_scores["long_sentence"] * WEIGHT_LONG_SENTENCE
-    )
+    async def fetch(term: str) -> tuple[str, str | None]:
+        async with semaphore:
+            return term, await OWNTHINK_DEFINITION_CLIENT.fetch_definition(term)
 
-    logger.debug(f"Segment: {segment_id}, Page: {page_index}, Block: {block_index_on_page}")
-    logger.debug(f"  Raw Scores: {raw_scores}")
-    logger.debug(f"  Weighted Final Score: {final_score:.3f}")
-    logger.debug(f"  Reasons: {reasons}")
+    tasks = [asyncio.create_task(fetch(term)) for term in uncached]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            term, definition = await next_done
+            yield term, definition, False
+    finally:
+        for task in tasks: # Client went away or the consumer stopped early
+            task.cancel()
+# --- End Modified function ---
 
-    return SegmentDifficultyMarker(
-        segment_id=segment_id, page_index=page_index, block_index_on_page=block_index_on_page,
-        text_preview=text_preview, score=round(final_score, 3), reasons=sorted(list(set(reasons))) # Round score
-    )
+# Difficulty weights and thresholds (WEIGHT_*, LONG_SENTENCE_CHAR_THRESHOLD, FORMULA_*_THRESHOLD_*) live in difficulty.py,
+# the formula, citation and sentence patterns in lexical_scanner.py
 
 # --- FastAPI Application Instance ---
-app = FastAPI(title="MindFlow Reader Backend API (HanLP + OwnThink)", version="0.1.2")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    DEFINITION_PREFETCHER.bind(asyncio.get_running_loop())
+    yield
+    await DEFINITION_PREFETCHER.aclose()
+    await OWNTHINK_DEFINITION_CLIENT.aclose()
+    GRAPH_CENTRALITY.close() # Cancels a pending debounced recompute
+
+app = FastAPI(title="MindFlow Reader Backend API (HanLP + OwnThink)", version="0.1.2", lifespan=lifespan)
 
 # --- CORS Middleware Configuration ---
 origins = [
@@ -857,143 +1227,320 @@ async def process_text_for_concepts(request: TextProcessingRequest):
     logger.info(f"Returning {len(extraction_result['concepts'])} concepts for text request.")
     return ConceptListResponse(concepts=extraction_result['concepts'])
 
+def _validate_pdf_upload(file: UploadFile):
+    """Rejects uploads that are not PDF files."""
+    if not file.filename or not file.filename.lower().endswith(".pdf"):
+        logger.warning(f"Invalid file upload attempt: Filename '{file.filename}' is not a PDF.")
+        raise HTTPException(status_code=400, detail="Invalid file type. Please upload a PDF file.")
+
+def _resolve_document_title(metadata_title: str | None, filename: str) -> str:
+    """PDF metadata title, falling back to the filename without extension."""
+    if not metadata_title or metadata_title.strip() == '':
+        return Path(filename).stem
+    return metadata_title
+
+def _add_document_to_global_graph(doc_id: str, concept_terms: list[str], relationships: list[Relationship]):
+    """Sets a document's concepts and relationships in the global knowledge graph store (one batched write).
+       For a re-ingested document only the delta to its previous contribution is written."""
+    # Edges keep their document_id to know their origin for global graph representation
+    GRAPH_STORE.replace_document_graph(doc_id, concept_terms, [(rel_obj.source, rel_obj.target, rel_obj.label) for rel_obj in relationships])
+    GRAPH_CENTRALITY.schedule()
+    logger.info(f"Updated global knowledge graph with {len(concept_terms)} concepts and {len(relationships)} relationships from document ID {doc_id}.")
+
+def _prefetch_top_concept_definitions(full_text: str | None, concept_terms: list[str]):
+    """Queues background definition lookups for the document's DEFINITION_PREFETCH_TOP_K most frequent concepts
+       (ties keep extraction order; without the text, the first concepts are taken)."""
+    if DEFINITION_PREFETCH_TOP_K <= 0 or not concept_terms:
+        return
+    top_terms = concept_terms
+    if full_text and len(concept_terms) > DEFINITION_PREFETCH_TOP_K:
+        occurrences = dict.fromkeys(concept_terms, 0)
+        # Concepts are lowercased; scan the text the same way the difficulty analysis does, so capitalized
+        # mentions ("Transformer", sentence-initial words) count too
+        for _, _, term in TermMatcher(concept_terms).iter_matches(full_text.lower()):
+            occurrences[term] += 1
+        top_terms = sorted(occurrences, key=occurrences.get, reverse=True) # Stable sort
+    DEFINITION_PREFETCHER.submit(top_terms[:DEFINITION_PREFETCH_TOP_K])
+
+def _analyze_document_difficulty(extracted_pages: list[dict], concept_terms: set[str],
+                                 report: Callable[[str, float], None],
+                                 emit: Callable[[str, dict], None]) -> tuple[list[SegmentDifficultyMarker], list[tuple], list[tuple]]:
+    """Scores every text block of the extracted pages in one batch (difficulty.py); emits the markers per page.
+       Under DIFFICULTY_SCORE_NORMALIZATION=none the markers equal those of the per-segment reference scorer
+       kept in bench_difficulty.py.
+       Returns (markers, segments, feature rows); segments[i] = (page_index, block_index_on_page, text_preview)."""
+    page_count = len(extracted_pages)
+    logger.info(f"Starting batch difficulty analysis for {page_count} pages...")
+    # Build the concept automaton once; every block is then matched in one pass
+    concept_term_matcher = TermMatcher(concept_terms)
+    segments: list[tuple[int, int, str]] = [] # (page_index, block_index_on_page, text_preview) per scored block
+    feature_rows: list[tuple[int, ...]] = []
+    for extracted_page in extracted_pages:
+        page_idx = extracted_page["page_index"]
+        # Figure/table counts for the page were collected by the extraction pass
+        figure_count_on_page = extracted_page["figure_count"]
+        table_count_on_page = extracted_page["table_count"]
+        for block_idx, block_data in enumerate(extracted_page["blocks"]):
+            # block_data format: (x0, y0, x1, y1, text, block_no, block_type)
+            if len(block_data) < 7 or block_data[6] != 0: # Only valid text blocks (type 0)
+                continue
+            block_text = block_data[4]
+            if not isinstance(block_text, str) or not block_text.strip():
+                continue
+            segments.append((page_idx, block_idx, block_text.strip()[:100]))
+            feature_rows.append(block_features(block_text, figure_count_on_page, table_count_on_page, concept_term_matcher))
+        report("difficulty_analysis", (page_idx + 1) / page_count)
+
+    difficulty_markers_list: list[SegmentDifficultyMarker] = []
+    for marker in _difficulty_markers(segments, feature_rows, DIFFICULTY_SCORE_NORMALIZATION): # Non-zero scores only
+        difficulty_markers_list.append(SegmentDifficultyMarker(**marker))
+
+    markers_by_page: dict[int, list[dict]] = {}
+    for marker in difficulty_markers_list:
+        markers_by_page.setdefault(marker.page_index, []).append(marker.model_dump())
+    for extracted_page in extracted_pages:
+        emit("difficulty_markers", {"page_index": extracted_page["page_index"], "markers": markers_by_page.get(extracted_page["page_index"], [])})
+
+    logger.info(f"Finished difficulty analysis of {len(segments)} segments. Found {len(difficulty_markers_list)} segments with non-zero difficulty scores.")
+    return difficulty_markers_list, segments, feature_rows
+
+def _difficulty_markers(segments: list, features, normalization: str, parameters: dict | None = None) -> list[dict]:
+    """Marker dicts (SegmentDifficultyMarker fields) for the segments with a non-zero score."""
+    markers = []
+    for segment_index, score, reasons in score_blocks(features, normalization, parameters):
+        page_idx, block_idx, text_preview = segments[segment_index]
+        markers.append({
+            "segment_id": f"p{page_idx}_b{block_idx}",
+            "page_index": page_idx,
+            "block_index_on_page": block_idx,
+            "text_preview": text_preview,
+            "score": score,
+            "reasons": reasons,
+        })
+    return markers
+
+def _upload_pipeline_signature() -> str:
+    """Settings that change upload results; part of every deduplication key."""
+    titles_count = len(LOCAL_WIKIPEDIA_TITLES_INDEX) if LOCAL_WIKIPEDIA_TITLES_INDEX is not None else 0
+    return (f"{HANLP_BASE_URL}@{HANLP_BACKEND_VERSION}|titles={titles_count}|ngram={MAX_NGRAM_LEN}|tables={TABLE_DETECTION_MODE}"
+            f"|difficulty={DIFFICULTY_SCORE_NORMALIZATION}")
+
+def _register_document(doc_id: str, pdf_title: str):
+    """Registers doc_id (or renames it on re-ingest) in the graph store. Results stored for its previous
+       content no longer describe it, so they are dropped before later duplicates can be answered with them."""
+    if UPLOAD_RESULT_STORE is not None:
+        UPLOAD_RESULT_STORE.discard_document(doc_id)
+    GRAPH_STORE.add_document(doc_id, pdf_title)
+
+def _reuse_stored_upload_result(stored: dict, filename: str, doc_id: str,
+                                emit: Callable[[str, dict], None]) -> dict:
+    """Answers a duplicate upload from the result store; the document is still registered under its own ID."""
+    pdf_title = _resolve_document_title(stored["metadata_title"], filename)
+    logger.info(f"Upload '{filename}' (ID: {doc_id}) is identical to document {stored['document_id']}. Reusing its stored results.")
+    if stored["document_id"] == doc_id: # Re-ingest of unchanged content: its stored results stay valid
+        GRAPH_STORE.add_document(doc_id, pdf_title)
+    else:
+        _register_document(doc_id, pdf_title)
+    relationships = [Relationship(**rel) for rel in stored["relationships"]]
+    _add_document_to_global_graph(doc_id, stored["concepts"], relationships)
+    SEGMENT_FEATURE_STORE.put_document(doc_id, *stored["segment_features"]) # From the payload: the source document may have changed since
+    _prefetch_top_concept_definitions(None, stored["concepts"])
+    concepts_for_frontend = [{'term': term, 'definition': None} for term in stored["concepts"]]
+
+    emit("document", {"id": doc_id, "title": pdf_title, "page_count": stored["page_count"]})
+    emit("concepts", {"chunk_index": 0, "chunk_count": 1, "concepts": concepts_for_frontend})
+    markers_by_page: dict[int, list[dict]] = {}
+    for marker in stored["difficulty_markers"]:
+        markers_by_page.setdefault(marker["page_index"], []).append(marker)
+    for page_idx in range(stored["page_count"]):
+        emit("difficulty_markers", {"page_index": page_idx, "markers": markers_by_page.get(page_idx, [])})
+    emit("relationships", {"relationships": stored["relationships"]})
+    emit("summary", {
+        "id": doc_id,
+        "title": pdf_title,
+        "concept_count": len(concepts_for_frontend),
+        "relationship_count": len(relationships),
+        "difficulty_marker_count": len(stored["difficulty_markers"]),
+        "duplicate_of": stored["document_id"],
+    })
+    return {
+        "id": doc_id,
+        "title": pdf_title,
+        "concepts": concepts_for_frontend,
+        "relationships": stored["relationships"],
+        "difficulty_markers": stored["difficulty_markers"],
+        "duplicate_of": stored["document_id"],
+    }
+
+def _process_uploaded_pdf(pdf_bytes: bytes, filename: str, doc_id: str,
+                          report_progress: Callable[[str, float], None] | None = None,
+                          emit_event: Callable[[str, dict], None] | None = None) -> dict:
+    """Runs the blocking upload pipeline: PDF text extraction, HanLP concept identification, global
+       knowledge graph update and segment difficulty analysis. Returns the DocumentUploadResponse payload.
+       If emit_event(event_type, data) is given, partial results are emitted as soon as they are ready.
+       Uploads identical to a stored one (same bytes, same pipeline settings) reuse its results.
+    """
+    def report(stage: str, fraction: float = 0.0):
+        if report_progress:
+            report_progress(stage, fraction)
+
+    def emit(event_type: str, data: dict):
+        if emit_event:
+            emit_event(event_type, data)
+
+    if UPLOAD_RESULT_STORE is None:
+        return _run_upload_pipeline(pdf_bytes, filename, doc_id, report, emit, emit_event is not None, None, None)
+
+    signature = _upload_pipeline_signature()
+    pdf_key = fingerprint_bytes(pdf_bytes, signature)
+    stored, owned = UPLOAD_RESULT_STORE.acquire(pdf_key) # Waits while an identical upload is being processed
+    if stored is not None:
+        return _reuse_stored_upload_result(stored, filename, doc_id, emit)
+    try:
+        return _run_upload_pipeline(pdf_bytes, filename, doc_id, report, emit, emit_event is not None, pdf_key, signature)
+    finally:
+        if owned: # Not after a wait timeout: the key still belongs to the upload being waited for
+            UPLOAD_RESULT_STORE.release(pdf_key)
+
+def _run_upload_pipeline(pdf_bytes: bytes, filename: str, doc_id: str,
+                         report: Callable[[str, float], None], emit: Callable[[str, dict], None], streaming: bool,
+                         pdf_key: str | None, signature: str | None) -> dict:
+    """The full pipeline behind _process_uploaded_pdf; stores its result under pdf_key when given.
+       Per-chunk concept events are only computed when streaming."""
+    report("pdf_parsing")
+    # Single pass over the PDF: text, blocks, image and table counts per page (process pool for large documents)
+    pdf_extraction = extract_pdf_pages(
+        pdf_bytes,
+        max_workers=PDF_EXTRACTION_WORKERS,
+        parallel_min_pages=PDF_PARALLEL_MIN_PAGES,
+        table_mode=TABLE_DETECTION_MODE,
+        table_count_cache=PDF_TABLE_COUNT_CACHE,
+    )
+    page_count = pdf_extraction["page_count"] # Get page count
+    extracted_pages = pdf_extraction["pages"]
+    logger.info(f"Extracted PDF '{filename}' with {page_count} pages.")
+
+    # Extract title from metadata, fallback to filename without extension
+    pdf_title = _resolve_document_title(pdf_extraction["title"], filename)
+    logger.info(f"Using title: '{pdf_title}' for document '{filename}' (ID: {doc_id})")
+
+    # Page-wise text was collected by the extraction pass
+    page_texts = [page["text"] for page in extracted_pages]
+    full_text = "\n".join(page_texts)
+    logger.info(f"Extracted total text length: {len(full_text)} from '{filename}' ({len(page_texts)} pages)")
+    emit("document", {"id": doc_id, "title": pdf_title, "page_count": page_count})
+
+    if not full_text.strip():
+        logger.warning(f"No text could be extracted from the PDF: '{filename}'. Raising error.")
+        raise HTTPException(status_code=422, detail="No text content could be extracted from the PDF.")
+
+    # --- Update Global Graph Store with Document Info (only now: a failed re-ingest leaves the document as it was) ---
+    _register_document(doc_id, pdf_title)
+    # --- End Update ---
+
+    # A different file with the same text (e.g. re-saved or re-exported) yields the same concepts
+    report("concept_extraction")
+    text_key = fingerprint_text(full_text, signature) if pdf_key and UPLOAD_DEDUP_BY_TEXT else None
+    # Not counted in the dedup stats: the byte-key lookup already counted this upload
+    stored_text_result = UPLOAD_RESULT_STORE.get(text_key, record_stats=False) if text_key else None
+    if stored_text_result is not None:
+        logger.info(f"Text of '{filename}' matches document {stored_text_result['document_id']}. Reusing its concepts and relationships.")
+        concept_terms = list(stored_text_result["concepts"])
+        relationships_raw = [Relationship(**rel) for rel in stored_text_result["relationships"]]
+        emit("concepts", {"chunk_index": 0, "chunk_count": 1, "concepts": [{'term': term, 'definition': None} for term in concept_terms]})
+    else:
+        # Use the HanLP helper function to extract concepts and relationships from the *full text*
+        extraction_result = extract_concepts_hanlp(
+            full_text,
+            on_chunk_done=lambda done, total: report("concept_extraction", done / total),
+            on_chunk_concepts=(lambda chunk_index, total, terms: emit("concepts", {
+                "chunk_index": chunk_index,
+                "chunk_count": total,
+                "concepts": [{'term': term, 'definition': None} for term in terms],
+            })) if streaming else None,
+        )
+        concept_terms = [c.term for c in extraction_result.get("concepts", [])]
+        relationships_raw = extraction_result.get("relationships", []) # List[Relationship]
+    final_concepts_set_from_hanlp = set(concept_terms) # Get the final set for page analysis
+
+    # --- Update Global Graph Store with Concepts and Relationships ---
+    report("graph_update")
+    _add_document_to_global_graph(doc_id, concept_terms, relationships_raw)
+    # --- End Update ---
+    _prefetch_top_concept_definitions(full_text, concept_terms) # Background; the reader will look these up first
+
+    # *** Analyze difficulty segment by segment (New Approach) ***
+    report("difficulty_analysis")
+    difficulty_markers_list: list[SegmentDifficultyMarker] = []
+    segments, feature_rows = [], []
+    if final_concepts_set_from_hanlp: # Only analyze if we have concepts
+        difficulty_markers_list, segments, feature_rows = _analyze_document_difficulty(extracted_pages, final_concepts_set_from_hanlp, report, emit)
+    else:
+        logger.warning("Skipping segment difficulty analysis as no concepts were extracted.")
+    segment_features = pack_segment_features(segments, feature_rows)
+    SEGMENT_FEATURE_STORE.put_document(doc_id, *segment_features) # For re-scoring with other weights
+    # *** End difficulty analysis ***
+    
+    # Format concepts for frontend (this part is for the immediate response of this endpoint)
+    concepts_for_frontend = [{'term': term, 'definition': None} for term in concept_terms]
+    relationship_dicts = [r.model_dump() for r in relationships_raw]
+    marker_dicts = [m.model_dump() for m in difficulty_markers_list]
+
+    emit("relationships", {"relationships": relationship_dicts})
+    emit("summary", {
+        "id": doc_id,
+        "title": pdf_title,
+        "concept_count": len(concepts_for_frontend),
+        "relationship_count": len(relationships_raw),
+        "difficulty_marker_count": len(difficulty_markers_list),
+    })
+
+    if pdf_key:
+        UPLOAD_RESULT_STORE.put(pdf_key, {
+            "document_id": doc_id,
+            "metadata_title": pdf_extraction["title"],
+            "page_count": page_count,
+            "concepts": concept_terms,
+            "relationships": relationship_dicts,
+            "difficulty_markers": marker_dicts,
+            "segment_features": segment_features,
+        })
+        if text_key and stored_text_result is None:
+            UPLOAD_RESULT_STORE.put(text_key, {"document_id": doc_id, "concepts": concept_terms, "relationships": relationship_dicts})
+
+    # Return the new response structure (plain dicts: valid for DocumentUploadResponse and directly encodable)
+    return {
+        "id": doc_id,
+        "title": pdf_title,
+        "concepts": concepts_for_frontend, # Concepts specific to this doc for immediate display
+        "relationships": relationship_dicts, # Relationships specific to this doc
+        "difficulty_markers": marker_dicts # Include the generated markers
+    }
+
 @app.post("/upload-and-extract", response_model=DocumentUploadResponse,
           summary="Upload PDF and Extract Concepts (HanLP)",
           description="Accepts PDF upload, extracts text, returns doc info with concepts using HanLP NER, and updates global graph.")
 async def upload_pdf_and_extract_concepts(file: UploadFile = File(..., description="The PDF file to process.")):
-    """Handles PDF upload, text extraction, HanLP concept identification, and updates the mock global knowledge graph."""
+    """Handles PDF upload, text extraction, HanLP concept identification, and updates the global knowledge graph store."""
     logger.info(f"Received request for /upload-and-extract. Filename: '{file.filename}'")
-
-    if not file.filename or not file.filename.lower().endswith(".pdf"):
-        logger.warning(f"Invalid file upload attempt: Filename '{file.filename}' is not a PDF.")
-        raise HTTPException(status_code=400, detail="Invalid file type. Please upload a PDF file.")
+    _validate_pdf_upload(file)
 
     doc_id = str(uuid.uuid4()) # Generate a unique ID for the document early
+    return await _extract_uploaded_pdf(file, doc_id)
 
+async def _extract_uploaded_pdf(file: UploadFile, doc_id: str):
+    """Reads the upload and runs the pipeline for doc_id off the event loop; returns the endpoint response."""
     try:
         pdf_bytes = await file.read()
         logger.info(f"Read {len(pdf_bytes)} bytes from uploaded PDF: '{file.filename}'")
-
-        doc = fitz.open(stream=io.BytesIO(pdf_bytes), filetype="pdf")
-        page_count = doc.page_count # Get page count
-        logger.info(f"Opened PDF '{file.filename}' with {page_count} pages.")
-
-        # Extract title from metadata, fallback to filename without extension
-        pdf_title = doc.metadata.get('title', None)
-        if not pdf_title or pdf_title.strip() == '':
-             # Use filename without extension as fallback
-             pdf_title = Path(file.filename).stem 
-        logger.info(f"Using title: '{pdf_title}' for document '{file.filename}' (ID: {doc_id})")
-
-        # --- Update Mock Global Store with Document Info ---
-        global_knowledge_graph["documents"][doc_id] = {"id": doc_id, "title": pdf_title}
-        # --- End Update ---
-
-        # Extract text from all pages AND store page-wise text
-        # full_text = "\n".join([page.get_text("text") for page in doc]) # Old way
-        page_texts = [page.get_text("text") for page in doc]
-        full_text = "\n".join(page_texts)
-        doc.close()
-        logger.info(f"Extracted total text length: {len(full_text)} from '{file.filename}' ({len(page_texts)} pages)")
-
-        if not full_text.strip():
-            logger.warning(f"No text could be extracted from the PDF: '{file.filename}'. Raising error.")
-            raise HTTPException(status_code=422, detail="No text content could be extracted from the PDF.")
-
-        # Use the HanLP helper function to extract concepts and relationships from the *full text*
-        extraction_result = extract_concepts_hanlp(full_text)
-        concepts_raw = extraction_result.get("concepts", []) # List[Concept]
-        relationships_raw = extraction_result.get("relationships", []) # List[Relationship]
-        final_concepts_set_from_hanlp = {c.term for c in concepts_raw} # Get the final set for page analysis
-
-        # --- Update Mock Global Store with Concepts and Relationships ---
-        for concept_obj in concepts_raw:
-            term = concept_obj.term
-            if term not in global_knowledge_graph["nodes"]:
-                global_knowledge_graph["nodes"][term] = {"name": term, "document_ids": set()}
-            global_knowledge_graph["nodes"][term]["document_ids"].add(doc_id)
-        
-        for rel_obj in relationships_raw:
-            # Store edges with document_id to know their origin for global graph representation
-            edge_tuple = (rel_obj.source, rel_obj.target, rel_obj.label, doc_id)
-            global_knowledge_graph["edges"].add(edge_tuple)
-        logger.info(f"Updated mock global knowledge graph with {len(concepts_raw)} concepts and {len(relationships_raw)} relationships from document ID {doc_id}.")
-        # --- End Update ---
-
-        # *** Analyze difficulty segment by segment (New Approach) ***
-        difficulty_markers_list: list[SegmentDifficultyMarker] = []
-        if final_concepts_set_from_hanlp: # Only analyze if we have concepts
-            logger.info(f"Starting segment-by-segment difficulty analysis for {len(page_texts)} pages...")
-            # Re-open the document to iterate through pages and blocks
-            doc_for_analysis = fitz.open(stream=io.BytesIO(pdf_bytes), filetype="pdf")
-            for page_idx, page_obj in enumerate(doc_for_analysis):
-                # Pre-calculate figure/table presence for the page
-                figure_list_on_page = page_obj.get_images(full=True)
-                figure_count_on_page = len(figure_list_on_page)
-                # Check tables robustly
-                try:
-                    table_finder = page_obj.find_tables()
-                    table_count_on_page = len(table_finder.tables) if table_finder and table_finder.tables else 0
-                except Exception as table_exc:
-                    logger.warning(f"Error checking tables on page {page_idx}: {table_exc}")
-                    table_count_on_page = 0
-
-                blocks = page_obj.get_text("blocks", sort=True)
-                for block_idx, block_data in enumerate(blocks):
-                    # block_data format: (x0, y0, x1, y1, text, block_no, block_type)
-                    if len(block_data) < 7: continue # Ensure valid block data
-                    block_text = block_data[4]
-                    block_type = block_data[6]
-
-                    if block_type != 0: # 0 indicates a text block
-                        continue
-                    if not block_text or not block_text.strip():
-                        continue
-                    
-                    segment_id = f"p{page_idx}_b{block_idx}"
-                    # text_preview = block_text.strip()[:100] # Preview generated within analysis function
-                    
-                    # --- Call the refactored analysis function (Uncommented) ---
-                    try:
-                        marker = _analyze_segment_difficulty(
-                            segment_text=block_text,
-                            concepts_on_document=final_concepts_set_from_hanlp,
-                            segment_id=segment_id,
-                            page_index=page_idx,
-                            block_index_on_page=block_idx,
-                            figure_count_on_page=figure_count_on_page,
-                            table_count_on_page=table_count_on_page
-                        )
-                        if marker and marker.score > 0: # Only add markers with a non-zero score
-                            difficulty_markers_list.append(marker)
-                    except NameError: # If the function is not defined due to some unexpected issue
-                         logger.error("_analyze_segment_difficulty is not defined. Skipping analysis for this segment.")
-                         # Optional: break the inner loop or the outer loop if analysis is critical
-                         # For now, just log and continue processing other blocks/pages
-                    except Exception as analysis_exc:
-                         logger.error(f"Error analyzing segment {segment_id}: {analysis_exc}", exc_info=True)
-                    # ---------------------------------------------------------------------
-            
-            doc_for_analysis.close() # Close the temporarily opened doc
-            logger.info(f"Finished segment difficulty analysis. Found {len(difficulty_markers_list)} segments with non-zero difficulty scores.")
-        else:
-            logger.warning("Skipping segment difficulty analysis as no concepts were extracted.")
-        # *** End difficulty analysis ***
-        
-        # Format concepts for frontend (this part is for the immediate response of this endpoint)
-        concepts_for_frontend = [{'term': c.term, 'definition': None} for c in concepts_raw]
-
-        # The doc_id was generated earlier
-    
-        # Return the new response structure, fixing previous indentation
-        return {
-            "id": doc_id,
-            "title": pdf_title,
-            "concepts": concepts_for_frontend, # Concepts specific to this doc for immediate display
-            "relationships": relationships_raw, # Relationships specific to this doc
-            "difficulty_markers": difficulty_markers_list # Include the generated markers
-        }
-
+        # The pipeline is blocking (PyMuPDF + HanLP calls); keep it off the event loop
+        result = await run_in_threadpool(_process_uploaded_pdf, pdf_bytes, file.filename, doc_id)
+        if FAST_JSON_RESPONSES:
+            fill_defaults([result], DocumentUploadResponse)
+            return FastJSONResponse(result)
+        return result
+    except HTTPException:
+        raise
     except Exception as e:
         # This will now catch PyMuPDF errors as well as others
         logger.error(f"Unexpected error during PDF processing or concept extraction for '{file.filename}': {e}", exc_info=True)
@@ -1003,93 +1550,349 @@ async def upload_pdf_and_extract_concepts(file: UploadFile = File(..., descripti
         await file.close()
         logger.debug(f"Closed file handle for '{file.filename}'")
 
+@app.put("/documents/{doc_id}", response_model=DocumentUploadResponse,
+         summary="Re-ingest Document",
+         description="Processes a new PDF version of an existing document under the same ID. Only the difference to the "
+                     "document's previous concepts and relationships is applied to the global graph.")
+async def reingest_document(doc_id: str, file: UploadFile = File(..., description="The PDF file to process.")):
+    logger.info(f"Received request to re-ingest document {doc_id}. Filename: '{file.filename}'")
+    _validate_pdf_upload(file)
+    if not await run_in_threadpool(GRAPH_STORE.has_document, doc_id):
+        await file.close()
+        raise HTTPException(status_code=404, detail=f"Document '{doc_id}' not found.")
+    return await _extract_uploaded_pdf(file, doc_id) # Drops the stored results of the old content once the new one is read
+
+@app.delete("/documents/{doc_id}", status_code=204,
+            summary="Delete Document",
+            description="Removes a document with its concept memberships and relationships from the global graph. "
+                        "Concepts no other document mentions are dropped.")
+async def delete_document(doc_id: str):
+    logger.info(f"Received request to delete document {doc_id}.")
+    if not await run_in_threadpool(GRAPH_STORE.remove_document, doc_id):
+        raise HTTPException(status_code=404, detail=f"Document '{doc_id}' not found.")
+    await run_in_threadpool(SEGMENT_FEATURE_STORE.remove_document, doc_id)
+    if UPLOAD_RESULT_STORE is not None: # Later duplicates must not be answered with a deleted document
+        UPLOAD_RESULT_STORE.discard_document(doc_id)
+    GRAPH_CENTRALITY.schedule()
+    logger.info(f"Removed document {doc_id} from the global knowledge graph.")
+    return Response(status_code=204)
+
+def _scoring_options(parameters: DifficultyScoringParameters) -> tuple[str, dict]:
+    """(normalization, score_features parameters) of a re-scoring request."""
+    return parameters.normalization or DIFFICULTY_SCORE_NORMALIZATION, parameters.model_dump(exclude={"normalization", "document_ids"})
+
+def _rescore_library(normalization: str, scoring_parameters: dict, document_ids: list[str] | None) -> dict:
+    requested = list(dict.fromkeys(document_ids)) if document_ids is not None else None
+    documents = [
+        {"document_id": doc_id, "difficulty_markers": _difficulty_markers(segments, features, normalization, scoring_parameters)}
+        for doc_id, segments, features in SEGMENT_FEATURE_STORE.iter_documents(requested)
+    ]
+    found = {document["document_id"] for document in documents}
+    return {"documents": documents, "missing_document_ids": [doc_id for doc_id in requested or [] if doc_id not in found]}
+
+@app.post("/documents/{doc_id}/difficulty/rescore", response_model=DocumentDifficultyResponse,
+          summary="Re-score Document Difficulty",
+          description="Recomputes a document's difficulty markers from the segment features stored at upload, with the "
+                      "given weights and formula thresholds (omitted ones keep their defaults). The PDF is not parsed again.")
+async def rescore_document_difficulty(doc_id: str, parameters: DifficultyScoringParameters):
+    record = await run_in_threadpool(SEGMENT_FEATURE_STORE.get_document, doc_id)
+    if record is None:
+        if await run_in_threadpool(GRAPH_STORE.has_document, doc_id):
+            raise HTTPException(status_code=409, detail=f"No segment features are stored for document '{doc_id}'. Re-upload it to enable re-scoring.")
+        raise HTTPException(status_code=404, detail=f"Document '{doc_id}' not found.")
+    normalization, scoring_parameters = _scoring_options(parameters)
+    result = {"document_id": doc_id, "difficulty_markers": _difficulty_markers(*record, normalization, scoring_parameters)}
+    return FastJSONResponse(result) if FAST_JSON_RESPONSES else result
+
+@app.post("/difficulty/rescore", response_model=LibraryDifficultyResponse,
+          summary="Re-score Library Difficulty",
+          description="Like POST /documents/{doc_id}/difficulty/rescore for several documents (document_ids) or, "
+                      "if omitted, every document with stored segment features.")
+async def rescore_library_difficulty(request: LibraryRescoreRequest):
+    normalization, scoring_parameters = _scoring_options(request)
+    result = await run_in_threadpool(_rescore_library, normalization, scoring_parameters, request.document_ids)
+    logger.info(f"Re-scored difficulty of {len(result['documents'])} documents ({len(result['missing_document_ids'])} without stored features).")
+    if FAST_JSON_RESPONSES:
+        fill_defaults([result], LibraryDifficultyResponse)
+        return FastJSONResponse(result)
+    return result
+
+def _run_upload_job(progress: JobProgress, pdf_bytes: bytes, filename: str, doc_id: str,
+                    emit_event: Callable[[str, dict], None] | None = None) -> DocumentUploadResponse | dict:
+    """Background job body: runs the upload pipeline and validates the result into a DocumentUploadResponse
+       (with fast JSON responses, keeps the plain payload with its defaults filled in instead)."""
+    result = _process_uploaded_pdf(pdf_bytes, filename, doc_id, report_progress=progress.report, emit_event=emit_event)
+    if FAST_JSON_RESPONSES:
+        fill_defaults([result], DocumentUploadResponse)
+        return result
+    return DocumentUploadResponse.model_validate(result)
+
+@app.post("/upload-and-extract/jobs", response_model=JobSubmissionResponse, status_code=202,
+          summary="Upload PDF and Extract Concepts Asynchronously",
+          description="Accepts a PDF upload and immediately returns a job id; processing runs in a bounded background worker pool. "
+                      "Poll /jobs/{job_id} for per-stage progress and fetch the DocumentUploadResponse from /jobs/{job_id}/result.")
+async def submit_upload_job(file: UploadFile = File(..., description="The PDF file to process.")):
+    """Queues PDF processing as a background job."""
+    logger.info(f"Received request for /upload-and-extract/jobs. Filename: '{file.filename}'")
+    _validate_pdf_upload(file)
+    try:
+        pdf_bytes = await file.read()
+    finally:
+        await file.close()
+
+    doc_id = str(uuid.uuid4())
+    try:
+        job_id = upload_job_manager.submit(_run_upload_job, pdf_bytes, file.filename, doc_id)
+    except JobQueueFullError as e:
+        logger.warning(f"Rejecting upload job for '{file.filename}': {e}")
+        raise HTTPException(status_code=503, detail="Too many documents are being processed. Please retry later.",
+                            headers={"Retry-After": "30"})
+    logger.info(f"Queued upload job {job_id} for '{file.filename}' ({len(pdf_bytes)} bytes, document ID {doc_id}).")
+    return JobSubmissionResponse(job_id=job_id, document_id=doc_id, status=JOB_QUEUED, status_url=f"/jobs/{job_id}")
+
+_STREAM_END = object() # Sentinel closing an event stream
+_STREAM_DISCONNECT_POLL_SECONDS = 1.0 # How often a stream waiting for events checks whether its client went away
+
+def _encode_stream_event(event_type: str, data: dict, stream_format: str) -> str:
+    payload = json.dumps(data, ensure_ascii=False)
+    if stream_format == "sse":
+        return f"event: {event_type}\ndata: {payload}\n\n"
+    return json.dumps({"event": event_type, "data": data}, ensure_ascii=False) + "\n"
+
+@app.post("/upload-and-extract/stream",
+          summary="Upload PDF and Stream Extraction Results",
+          description="Accepts a PDF upload and streams results as they become ready, as NDJSON (default) or Server-Sent Events: "
+                      "'job', 'document', one 'concepts' event per HanLP chunk, one 'difficulty_markers' event per page, "
+                      "then 'relationships' and a final 'summary' (or an 'error' event). Runs in the bounded upload job pool.",
+          response_class=StreamingResponse)
+async def upload_pdf_and_stream_results(
+    request: Request,
+    file: UploadFile = File(..., description="The PDF file to process."),
+    stream_format: Literal["ndjson", "sse"] = Query("ndjson", alias="format", description="Event framing: 'ndjson' or 'sse'."),
+):
+    """Streams per-chunk concepts, per-page difficulty markers and the final relationships for an uploaded PDF."""
+    logger.info(f"Received request for /upload-and-extract/stream. Filename: '{file.filename}', format: {stream_format}")
+    _validate_pdf_upload(file)
+    try:
+        pdf_bytes = await file.read()
+    finally:
+        await file.close()
+
+    doc_id = str(uuid.uuid4())
+    loop = asyncio.get_running_loop()
+    events: asyncio.Queue = asyncio.Queue()
+
+    def put_event(item):
+        # Called from the job's worker thread; the queue belongs to the event loop
+        try:
+            loop.call_soon_threadsafe(events.put_nowait, item)
+        except RuntimeError: # Loop closed during shutdown
+            pass
+
+    def run_streaming_job(progress: JobProgress) -> DocumentUploadResponse | dict:
+        try:
+            return _run_upload_job(progress, pdf_bytes, file.filename, doc_id, emit_event=lambda event_type, data: put_event((event_type, data)))
+        except HTTPException as e:
+            put_event(("error", {"status_code": e.status_code, "detail": e.detail}))
+            raise
+        except Exception:
+            put_event(("error", {"status_code": 500, "detail": "Internal server error during file processing."}))
+            raise
+        finally:
+            put_event(_STREAM_END)
+
+    try:
+        job_id = upload_job_manager.submit(run_streaming_job)
+    except JobQueueFullError as e:
+        logger.warning(f"Rejecting streaming upload for '{file.filename}': {e}")
+        raise HTTPException(status_code=503, detail="Too many documents are being processed. Please retry later.",
+                            headers={"Retry-After": "30"})
+
+    async def iter_events():
+        # Waits on the event loop, not in a threadpool worker; a dropped stream ends at the next poll while the
+        # job itself runs to completion (its result stays available under /jobs/{job_id})
+        yield _encode_stream_event("job", {"job_id": job_id, "document_id": doc_id}, stream_format)
+        while True:
+            try:
+                item = await asyncio.wait_for(events.get(), _STREAM_DISCONNECT_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                if await request.is_disconnected():
+                    logger.info(f"Client disconnected from the stream of upload job {job_id}; the job continues.")
+                    return
+                continue
+            if item is _STREAM_END:
+                return
+            yield _encode_stream_event(*item, stream_format)
+
+    media_type = "text/event-stream" if stream_format == "sse" else "application/x-ndjson"
+    return StreamingResponse(iter_events(), media_type=media_type, headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+def _get_job_or_404(job_id: str) -> dict:
+    job = upload_job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found (unknown or expired).")
+    return job
+
+@app.get("/jobs/{job_id}", response_model=JobStatusResponse,
+         summary="Get Upload Job Status",
+         description="Returns the status and per-stage progress of an asynchronous upload job.")
+async def get_upload_job_status(job_id: str):
+    job = _get_job_or_404(job_id)
+    return JobStatusResponse(
+        job_id=job["id"],
+        status=job["status"],
+        current_stage=job["current_stage"],
+        stages=[JobStageProgress(name=name, **state) for name, state in job["stages"].items()],
+        created_at=job["created_at"],
+        started_at=job["started_at"],
+        finished_at=job["finished_at"],
+        error=job["error"],
+    )
+
+@app.get("/jobs/{job_id}/result", response_model=DocumentUploadResponse,
+         summary="Get Upload Job Result",
+         description="Returns the DocumentUploadResponse of a finished job (409 while still running).")
+async def get_upload_job_result(job_id: str):
+    job = _get_job_or_404(job_id)
+    if job["status"] == JOB_FAILED:
+        raise HTTPException(status_code=500, detail=f"Job failed: {job['error']}")
+    if job["status"] != JOB_SUCCEEDED:
+        raise HTTPException(status_code=409, detail=f"Job is still {job['status']}.")
+    if isinstance(job["result"], dict):
+        return FastJSONResponse(job["result"])
+    return job["result"]
+
+def _serialize_graph_response(response_model: type[GlobalGraphResponse], graph_data: dict, centrality: CentralitySnapshot) -> tuple[int, bytes]:
+    """Encodes a graph store result as the response_model would, with each node's centrality metrics; with fast JSON
+       responses the store's plain dicts are encoded directly (only the missing optional fields are filled in).
+       Returns (graph version the store read the data at, body)."""
+    version = graph_data.pop("version")
+    centrality.annotate(graph_data["nodes"])
+    if FAST_JSON_RESPONSES:
+        fill_defaults([graph_data], response_model)
+        fill_defaults(graph_data["nodes"], GlobalGraphResponseNode)
+        return version, dumps(graph_data)
+    return version, response_model(**graph_data).model_dump_json().encode("utf-8")
+
+def _serve_graph_response(request: Request, request_key: tuple, response_model: type[GlobalGraphResponse],
+                          load_graph: Callable[[], dict]) -> Response:
+    """Serves a graph read from the serialized response cache. The graph only changes on ingest, so the graph
+       version plus request_key identifies the body: If-None-Match revalidations get a 304 without building
+       anything, and repeated requests reuse the serialized (and gzip-compressed) bytes. Node centrality metrics
+       come from the centrality snapshot, whose version is part of the key. The body is cached and ETagged under
+       the version the store read it at (inside its lock / transaction), which is newer than version if an
+       ingest happened in between."""
+    version = GRAPH_STORE.version()
+    GRAPH_CENTRALITY.refresh_if_stale(version)
+    centrality = GRAPH_CENTRALITY.current()
+    request_key = (request_key, centrality.version)
+    etag = make_etag(version, request_key)
+    headers = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    entry = GRAPH_RESPONSE_CACHE.get_or_build(version, request_key, lambda: _serialize_graph_response(response_model, load_graph(), centrality))
+    headers["ETag"] = entry.etag # Differs from etag if the graph changed while the body was built
+    if len(entry.body) >= GRAPH_RESPONSE_GZIP_MIN_BYTES and "gzip" in request.headers.get("accept-encoding", ""):
+        return Response(entry.gzip_body(), media_type="application/json", headers={**headers, "Content-Encoding": "gzip"})
+    return Response(entry.body, media_type="application/json", headers=headers)
+
 @app.get("/global-graph", response_model=GlobalGraphResponse)
-async def get_global_graph_data(document_ids: Optional[List[str]] = Query(None)):
+async def get_global_graph_data(request: Request, document_ids: Optional[List[str]] = Query(None)):
     logger.info(f"Received request for /global-graph. Filter by document_ids: {document_ids}")
-    
-    nodes_response = []
-    links_tuples_set = set() # Stores tuples like (source, target, label, document_id)
-    
-    doc_ids_filter_set = set(document_ids) if document_ids else None
 
-    filtered_documents_for_categories = {}
-    if doc_ids_filter_set:
-        for doc_id, doc_data in global_knowledge_graph["documents"].items():
-            if doc_id in doc_ids_filter_set:
-                filtered_documents_for_categories[doc_id] = doc_data
-    else:
-        filtered_documents_for_categories = global_knowledge_graph["documents"]
-    
-    doc_id_to_filtered_index = {doc_id: i for i, doc_id in enumerate(filtered_documents_for_categories.keys())}
-    nodes_to_include_ids = set()
-    temp_links_tuples = [] # Store tuples here first
-
-    if doc_ids_filter_set:
-        for s, t, lbl, doc_id_of_link in global_knowledge_graph["edges"]:
-            if doc_id_of_link in doc_ids_filter_set:
-                # 添加元组到临时的列表
-                temp_links_tuples.append((s, t, lbl, doc_id_of_link))
-                nodes_to_include_ids.add(s)
-                nodes_to_include_ids.add(t)
-    else:
-        for s, t, lbl, doc_id_of_link in global_knowledge_graph["edges"]:
-            # 添加元组到临时的列表
-            temp_links_tuples.append((s, t, lbl, doc_id_of_link))
-            nodes_to_include_ids.add(s)
-            nodes_to_include_ids.add(t)
-    
-    # 将唯一的元组添加到 links_tuples_set
-    for s, t, lbl, doc_id_of_link in temp_links_tuples:
-         links_tuples_set.add((s, t, lbl, doc_id_of_link)) # Add tuple to the set
-
-    # 过滤节点 (这部分逻辑看起来是正确的，继续使用 nodes_to_include_ids)
-    for term, node_data in global_knowledge_graph["nodes"].items():
-        if doc_ids_filter_set:
-            if term in nodes_to_include_ids and any(doc_id_node_belongs_to in doc_ids_filter_set for doc_id_node_belongs_to in node_data["document_ids"]):
-                primary_doc_for_node_in_filter = next((doc_id for doc_id in node_data["document_ids"] if doc_id in doc_ids_filter_set), None)
-                category_idx = doc_id_to_filtered_index.get(primary_doc_for_node_in_filter) if primary_doc_for_node_in_filter else None
-                nodes_response.append(
-                    GlobalGraphResponseNode(
-                        id=term, 
-                        name=term, 
-                        document_ids=[doc_id for doc_id in node_data["document_ids"] if doc_id in doc_ids_filter_set],
-                        category_index=category_idx
-                    )
-                )
-        else: 
-            if term in nodes_to_include_ids:
-                primary_doc_id = list(node_data["document_ids"])[0] if node_data["document_ids"] else None
-                category_idx = doc_id_to_filtered_index.get(primary_doc_id) if primary_doc_id else None
-                nodes_response.append(
-                    GlobalGraphResponseNode(
-                        id=term, 
-                        name=term, 
-                        document_ids=list(node_data["document_ids"]),
-                        category_index=category_idx
-                    )
-                )
-    
-    # 将集合中的元组转换回 GlobalGraphResponseLink 对象列表
-    final_links_response = [
-        GlobalGraphResponseLink(source=s, target=t, label=lbl, document_id=doc_id_of_link)
-        for s, t, lbl, doc_id_of_link in links_tuples_set
-    ]
-    
-    final_documents_response = [
-        GlobalGraphResponseDocument(id=doc_data["id"], title=doc_data["title"])
-        for doc_data in filtered_documents_for_categories.values()
-    ]
+    def load_graph() -> dict:
+        # Served from the graph store's indexes; a document filter only reads the selected documents' rows
+        graph_data = GRAPH_STORE.get_graph(document_ids)
+        logger.info(f"Built global graph response with {len(graph_data['nodes'])} nodes, {len(graph_data['links'])} links, and {len(graph_data['documents'])} documents.")
+        return graph_data
+
+    request_key = ("global-graph", tuple(sorted(set(document_ids))) if document_ids else None)
+    return await run_in_threadpool(_serve_graph_response, request, request_key, GlobalGraphResponse, load_graph)
+
+@app.get("/graph/neighborhood", response_model=SubgraphResponse,
+         summary="Concept Neighborhood Subgraph",
+         description="Returns the k-hop neighborhood of a concept (strongest links first), the links among those concepts "
+                     "and the documents they come from. Stops at max_nodes nodes and then sets 'truncated'.")
+async def get_concept_neighborhood(
+    request: Request,
+    concept: str = Query(..., min_length=1, description="Concept term at the center of the neighborhood."),
+    depth: int = Query(1, ge=1, le=GRAPH_QUERY_MAX_DEPTH, description="Number of hops."),
+    max_nodes: int = Query(200, ge=1, le=GRAPH_QUERY_MAX_NODES, description="Maximum number of nodes returned."),
+):
+    logger.info(f"Received request for /graph/neighborhood. Concept: '{concept}', depth: {depth}, max_nodes: {max_nodes}")
+
+    def load_graph() -> dict:
+        subgraph = GRAPH_STORE.get_neighborhood(concept, depth, max_nodes)
+        if subgraph is None:
+            raise HTTPException(status_code=404, detail=f"Concept '{concept}' not found in the knowledge graph.")
+        return subgraph
+
+    return await run_in_threadpool(
+        _serve_graph_response, request, ("neighborhood", concept, depth, max_nodes), SubgraphResponse, load_graph,
+    )
 
-    logger.info(f"Returning filtered global graph with {len(nodes_response)} nodes, {len(final_links_response)} links, and {len(final_documents_response)} documents.")
-    return GlobalGraphResponse(
-        nodes=nodes_response, 
-        links=final_links_response, 
-        documents=final_documents_response
+@app.get("/graph/top-concepts", response_model=SubgraphResponse,
+         summary="Top-N Concepts Subgraph",
+         description="Returns the highest-ranked concepts by degree or document frequency and the links among them.")
+async def get_top_concepts(
+    request: Request,
+    limit: int = Query(50, ge=1, le=GRAPH_QUERY_MAX_NODES, description="Number of concepts."),
+    metric: Literal["degree", "document_frequency"] = Query("degree", description="Ranking metric."),
+):
+    logger.info(f"Received request for /graph/top-concepts. Limit: {limit}, metric: {metric}")
+    return await run_in_threadpool(
+        _serve_graph_response, request, ("top-concepts", limit, metric), SubgraphResponse,
+        lambda: GRAPH_STORE.get_top_concepts(limit, metric),
+    )
+
+@app.get("/graph/nodes", response_model=GraphNodePageResponse,
+         summary="List Graph Concepts (Cursor Pagination)",
+         description="Lists all concepts of the knowledge graph page by page. Pass the returned next_cursor to get the next page.")
+async def list_graph_nodes(
+    cursor: str | None = Query(None, description="next_cursor of the previous page."),
+    limit: int = Query(500, ge=1, le=GRAPH_PAGE_MAX_LIMIT, description="Page size."),
+):
+    try:
+        page = await run_in_threadpool(GRAPH_STORE.list_nodes, cursor, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    GRAPH_CENTRALITY.current().annotate(page["items"])
+    return GraphNodePageResponse(**page)
+
+@app.get("/graph/links", response_model=GraphLinkPageResponse,
+         summary="List Graph Links (Cursor Pagination)",
+         description="Lists all links of the knowledge graph page by page. Pass the returned next_cursor to get the next page.")
+async def list_graph_links(
+    cursor: str | None = Query(None, description="next_cursor of the previous page."),
+    limit: int = Query(1000, ge=1, le=GRAPH_PAGE_MAX_LIMIT, description="Page size."),
+):
+    try:
+        page = await run_in_threadpool(GRAPH_STORE.list_links, cursor, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return GraphLinkPageResponse(**page)
+
+@app.get("/graph/rankings", response_model=ConceptRankingResponse,
+         summary="Key Concepts Ranking",
+         description="Ranks all concepts of the knowledge graph by PageRank, degree or document frequency, without "
+                     "returning the graph itself. Metrics are recomputed in the background shortly after each upload.")
+async def get_concept_rankings(
+    metric: Literal["pagerank", "degree", "document_frequency"] = Query("pagerank", description="Ranking metric."),
+    limit: int = Query(50, ge=1, le=GRAPH_PAGE_MAX_LIMIT, description="Number of concepts."),
+):
+    graph_version = await run_in_threadpool(GRAPH_STORE.version)
+    GRAPH_CENTRALITY.refresh_if_stale(graph_version)
+    centrality = GRAPH_CENTRALITY.current()
+    return ConceptRankingResponse(
+        metric=metric,
+        graph_version=centrality.version,
+        stale=centrality.version < graph_version,
+        items=centrality.top(limit, metric),
     )
 
 @app.get("/definition/{term}", response_model=DefinitionResponse,
          summary="Get Term Definition (OwnThink)", # Updated summary
-         description="Retrieves a definition for the given term from the OwnThink Knowledge Graph API.") # Updated description
+         description="Retrieves a definition for the given term from the local definition store, falling back to the OwnThink Knowledge Graph API.") # Updated description
 async def get_definition(term: str):
     """Fetches a definition for a given term using OwnThink API."""
     logger.info(f"Received request for /definition/{term}")
@@ -1103,12 +1906,84 @@ async def get_definition(term: str):
 
     logger.info(f"Fetching definition for decoded term: '{decoded_term}' using OwnThink")
 
-    # Call the new helper function
-    definition = get_ownthink_definition(decoded_term) 
+    # Call the new helper function (awaits the pooled async client; cached per worker)
+    definition = await get_ownthink_definition(decoded_term)
 
     # Return 200 OK with the definition (or null if not found/error)
     return DefinitionResponse(term=decoded_term, definition=definition)
 
+def _batch_definition_terms(request: DefinitionBatchRequest) -> list[str]:
+    terms = list(dict.fromkeys(term.strip() for term in request.terms if term and term.strip()))
+    if not terms:
+        raise HTTPException(status_code=400, detail="At least one non-empty term is required.")
+    if len(terms) > DEFINITION_BATCH_MAX_TERMS:
+        raise HTTPException(status_code=400, detail=f"Too many terms ({len(terms)}); at most {DEFINITION_BATCH_MAX_TERMS} per request.")
+    return terms
+
+@app.post("/definitions", response_model=DefinitionBatchResponse,
+          summary="Get Term Definitions in Batch (OwnThink)",
+          description="Looks up definitions for a list of terms: cached terms are answered immediately, the rest are "
+                      "fetched from OwnThink concurrently (DEFINITION_BATCH_CONCURRENCY at a time, "
+                      "at most DEFINITION_BATCH_MAX_TERMS terms per request).")
+async def get_definitions_batch(request: DefinitionBatchRequest):
+    """Returns a term -> definition map for all requested terms."""
+    terms = _batch_definition_terms(request)
+    logger.info(f"Received request for /definitions with {len(terms)} terms")
+    definitions, cached = {}, 0
+    async for term, definition, from_cache in iter_ownthink_definitions(terms):
+        definitions[term] = definition
+        cached += from_cache
+    return DefinitionBatchResponse(definitions={term: definitions[term] for term in terms}, cached=cached, fetched=len(terms) - cached)
+
+@app.post("/definitions/stream",
+          summary="Stream Term Definitions in Batch (OwnThink)",
+          description="Like POST /definitions, but streams one 'definition' event per term as NDJSON (default) or Server-Sent "
+                      "Events as soon as it is resolved (cached terms first), followed by a final 'summary' event.",
+          response_class=StreamingResponse)
+async def stream_definitions_batch(
+    request: DefinitionBatchRequest,
+    stream_format: Literal["ndjson", "sse"] = Query("ndjson", alias="format", description="Event framing: 'ndjson' or 'sse'."),
+):
+    """Streams term definitions in completion order."""
+    terms = _batch_definition_terms(request)
+    logger.info(f"Received request for /definitions/stream with {len(terms)} terms, format: {stream_format}")
+
+    async def iter_events():
+        cached = found = 0
+        async for term, definition, from_cache in iter_ownthink_definitions(terms):
+            cached += from_cache
+            found += definition is not None
+            yield _encode_stream_event("definition", {"term": term, "definition": definition, "cached": from_cache}, stream_format)
+        yield _encode_stream_event("summary", {"terms": len(terms), "cached": cached, "fetched": len(terms) - cached, "found": found}, stream_format)
+
+    media_type = "text/event-stream" if stream_format == "sse" else "application/x-ndjson"
+    return StreamingResponse(iter_events(), media_type=media_type, headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.get("/definition-cache/stats", response_model=DefinitionCacheStatsResponse,
+         summary="Definition Cache Statistics",
+         description="Returns hit/miss counters of the OwnThink definition cache and upstream request counters.")
+async def get_definition_cache_stats():
+    """Reports the definition lookup counters of this worker."""
+    return DefinitionCacheStatsResponse(**OWNTHINK_DEFINITION_CLIENT.stats(), **DEFINITION_PREFETCHER.stats())
+
+@app.get("/hanlp-cache/stats", response_model=HanLPCacheStatsResponse,
+         summary="HanLP Parse Cache Statistics",
+         description="Returns hit/miss counters and on-disk size of the HanLP parse result cache.")
+async def get_hanlp_cache_stats():
+    """Reports the HanLP parse cache counters of this worker."""
+    if HANLP_PARSE_CACHE is None:
+        return HanLPCacheStatsResponse(enabled=False)
+    return HanLPCacheStatsResponse(enabled=True, **HANLP_PARSE_CACHE.stats())
+
+@app.get("/upload-dedup/stats", response_model=UploadDedupStatsResponse,
+         summary="Upload Deduplication Statistics",
+         description="Returns hit/miss counters and the size of the store of finished upload results used for duplicate uploads.")
+async def get_upload_dedup_stats():
+    """Reports the upload result store counters of this worker."""
+    if UPLOAD_RESULT_STORE is None:
+        return UploadDedupStatsResponse(enabled=False)
+    return UploadDedupStatsResponse(enabled=True, **UPLOAD_RESULT_STORE.stats())
+
 @app.get("/", include_in_schema=False) # Hide from OpenAPI docs if desired
 async def read_root():
     """Basic root endpoint indicating the API is running."""
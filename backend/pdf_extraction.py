@@ -0,0 +1,267 @@
+# -*- coding: utf-8 -*-
+"""Single-pass PDF page extraction for the upload pipeline.
+
+Each page is visited once and yields everything the pipeline needs: plain text, text blocks, image
+count and table count (both the plain text and the blocks come from one shared TextPage). Large
+documents are fanned out across a process pool in contiguous page ranges, because PyMuPDF documents
+are not thread-safe. The PDF is written once to a temporary file that the workers open by path (MuPDF
+then reads only the objects of the pages in their range), so the bytes are not pickled per range;
+results are merged back in page order.
+
+Table detection (page.find_tables()) dominates extraction time, so it is gated by a mode switch:
+"full" searches every page, "off" never does, and "heuristic" first looks for ruling lines and
+aligned text columns and only searches candidate pages. Per-page table counts are cached per
+document (content hash + mode), so re-uploads skip table detection entirely.
+"""
+
+import atexit
+import hashlib
+import io
+import logging
+import multiprocessing
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+import fitz  # PyMuPDF
+
+logger = logging.getLogger(__name__)
+
+_process_pool: ProcessPoolExecutor | None = None
+_process_pool_workers = 0
+_process_pool_lock = threading.Lock()
+
+TABLE_DETECTION_OFF = "off"
+TABLE_DETECTION_HEURISTIC = "heuristic"
+TABLE_DETECTION_FULL = "full"
+TABLE_DETECTION_MODES = (TABLE_DETECTION_OFF, TABLE_DETECTION_HEURISTIC, TABLE_DETECTION_FULL)
+
+MIN_RULING_LENGTH = 8.0 # Shorter strokes (glyph parts, fraction bars) are not table rulings
+RULING_THICKNESS = 2.0 # Rectangles thinner than this are treated as a single line
+MIN_ALIGNED_ROWS = 3 # Rows that must share a column start for it to count as aligned
+
+
+class TableCountCache:
+    """Thread-safe LRU of per-page table counts, keyed by document content hash and detection mode."""
+
+    def __init__(self, max_documents: int = 256):
+        self.max_documents = max_documents
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[tuple[str, str], list[int]]" = OrderedDict()
+
+    @staticmethod
+    def make_key(pdf_bytes: bytes, mode: str) -> tuple[str, str]:
+        return hashlib.sha256(pdf_bytes).hexdigest(), mode
+
+    def get(self, key: tuple[str, str]) -> list[int] | None:
+        with self._lock:
+            table_counts = self._entries.get(key)
+            if table_counts is not None:
+                self._entries.move_to_end(key)
+            return table_counts
+
+    def put(self, key: tuple[str, str], table_counts: list[int]):
+        if self.max_documents <= 0:
+            return
+        with self._lock:
+            self._entries[key] = list(table_counts)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_documents:
+                self._entries.popitem(last=False)
+
+
+def _count_rulings(page: "fitz.Page") -> tuple[int, int]:
+    """Returns the number of distinct horizontal and vertical ruling positions drawn on the page.
+       find_tables() builds cells from these edges, so a page needs at least two of each to hold a table."""
+    horizontal_positions, vertical_positions = set(), set()
+
+    def add_rect_edges(rect):
+        if rect.width < MIN_RULING_LENGTH and rect.height < MIN_RULING_LENGTH:
+            return
+        if rect.height <= RULING_THICKNESS:
+            horizontal_positions.add(round((rect.y0 + rect.y1) / 2))
+        elif rect.width <= RULING_THICKNESS:
+            vertical_positions.add(round((rect.x0 + rect.x1) / 2))
+        else:
+            horizontal_positions.update((round(rect.y0), round(rect.y1)))
+            vertical_positions.update((round(rect.x0), round(rect.x1)))
+
+    for path in page.get_drawings():
+        for item in path["items"]:
+            if item[0] == "l":
+                p1, p2 = item[1], item[2]
+                if abs(p1.y - p2.y) <= RULING_THICKNESS and abs(p1.x - p2.x) >= MIN_RULING_LENGTH:
+                    horizontal_positions.add(round((p1.y + p2.y) / 2))
+                elif abs(p1.x - p2.x) <= RULING_THICKNESS and abs(p1.y - p2.y) >= MIN_RULING_LENGTH:
+                    vertical_positions.add(round((p1.x + p2.x) / 2))
+            elif item[0] == "re":
+                add_rect_edges(item[1])
+            elif item[0] == "qu" and item[1].is_rectangular:
+                add_rect_edges(item[1].rect)
+    return len(horizontal_positions), len(vertical_positions)
+
+
+def _count_aligned_columns(page: "fitz.Page", text_page: "fitz.TextPage") -> int:
+    """Counts x positions where text segments start in at least MIN_ALIGNED_ROWS multi-segment rows.
+       A segment is a run of words separated by less than one line height; running text yields one
+       segment per row, table rows yield one per cell."""
+    rows: dict[int, list[tuple[float, float, float]]] = {}
+    # Word tuples: (x0, y0, x1, y1, word, block_no, line_no, word_no)
+    for x0, y0, x1, y1, *_ in page.get_text("words", textpage=text_page):
+        rows.setdefault(round(y1), []).append((x0, x1, y1 - y0))
+    column_starts: dict[int, int] = {}
+    for words in rows.values():
+        words.sort()
+        segment_starts = [words[0][0]]
+        for (_, prev_x1, height), (x0, _, _) in zip(words, words[1:]):
+            if x0 - prev_x1 > height:
+                segment_starts.append(x0)
+        if len(segment_starts) < 2:
+            continue
+        for x0 in {round(x / 2) for x in segment_starts}:
+            column_starts[x0] = column_starts.get(x0, 0) + 1
+    return sum(1 for row_count in column_starts.values() if row_count >= MIN_ALIGNED_ROWS)
+
+
+def _is_table_candidate(page: "fitz.Page", text_page: "fitz.TextPage") -> bool:
+    """Cheap pre-check for find_tables(): a ruled grid, or a minimal ruled box around aligned text columns."""
+    horizontal_count, vertical_count = _count_rulings(page)
+    if horizontal_count < 2 or vertical_count < 2:
+        return False
+    if horizontal_count >= 3 and vertical_count >= 3:
+        return True
+    return _count_aligned_columns(page, text_page) >= 2
+
+
+def _find_table_count(page: "fitz.Page", text_page: "fitz.TextPage", table_mode: str) -> tuple[int, bool]:
+    """Returns (table count, whether find_tables() actually ran) for the given detection mode."""
+    if table_mode == TABLE_DETECTION_OFF:
+        return 0, False
+    if table_mode == TABLE_DETECTION_HEURISTIC and not _is_table_candidate(page, text_page):
+        return 0, False
+    try:
+        table_finder = page.find_tables()
+        return (len(table_finder.tables) if table_finder and table_finder.tables else 0), True
+    except Exception as table_exc:
+        logger.warning(f"Error checking tables on page {page.number}: {table_exc}")
+        return 0, True
+
+
+def _extract_page(page: "fitz.Page", table_mode: str = TABLE_DETECTION_FULL, known_table_count: int | None = None) -> dict:
+    """Collects text, blocks, image count and table count of one page. A known_table_count (from the
+       per-document cache) skips table detection."""
+    page_index = page.number
+    text_page = page.get_textpage()
+    page_text = page.get_text("text", textpage=text_page)
+    # Block tuples: (x0, y0, x1, y1, text, block_no, block_type)
+    blocks = [tuple(block) for block in page.get_text("blocks", sort=True, textpage=text_page)]
+    figure_count = len(page.get_images(full=True))
+    if known_table_count is not None:
+        table_count, tables_searched = known_table_count, False
+    else:
+        table_count, tables_searched = _find_table_count(page, text_page, table_mode)
+    return {
+        "page_index": page_index,
+        "text": page_text,
+        "blocks": blocks,
+        "figure_count": figure_count,
+        "table_count": table_count,
+        "tables_searched": tables_searched,
+    }
+
+
+def _extract_page_range(pdf_path: str, start: int, stop: int, table_mode: str = TABLE_DETECTION_FULL,
+                        known_table_counts: list[int] | None = None) -> list[dict]:
+    """Process pool entry point: opens its own document from pdf_path and extracts pages [start, stop).
+       known_table_counts, if given, holds the cached counts for exactly these pages."""
+    doc = fitz.open(pdf_path, filetype="pdf")
+    try:
+        return [
+            _extract_page(doc[page_index], table_mode, known_table_counts[page_index - start] if known_table_counts else None)
+            for page_index in range(start, stop)
+        ]
+    finally:
+        doc.close()
+
+
+def _get_process_pool(max_workers: int) -> ProcessPoolExecutor:
+    """Returns the shared extraction pool, (re)creating it lazily. Uses 'spawn' so worker processes never
+       inherit locks held by the server's threads at fork time."""
+    global _process_pool, _process_pool_workers
+    with _process_pool_lock:
+        if _process_pool is None or _process_pool_workers != max_workers:
+            if _process_pool is not None:
+                _process_pool.shutdown(wait=False)
+            _process_pool = ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn"))
+            _process_pool_workers = max_workers
+        return _process_pool
+
+
+def shutdown_process_pool():
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is not None:
+            _process_pool.shutdown(wait=False, cancel_futures=True)
+            _process_pool = None
+
+
+atexit.register(shutdown_process_pool)
+
+
+def extract_pdf_pages(pdf_bytes: bytes, max_workers: int = 1, parallel_min_pages: int = 32,
+                      table_mode: str = TABLE_DETECTION_FULL, table_count_cache: TableCountCache | None = None) -> dict:
+    """Extracts all pages of a PDF in one pass.
+
+    Returns {"title": metadata title or None, "page_count": int, "pages": [page dict, ...]} with pages in order.
+    Documents with at least parallel_min_pages pages are split across max_workers processes. table_mode is one
+    of TABLE_DETECTION_MODES; table counts are looked up in / stored to table_count_cache when given.
+    """
+    if table_mode not in TABLE_DETECTION_MODES:
+        raise ValueError(f"Unknown table detection mode '{table_mode}', expected one of {TABLE_DETECTION_MODES}.")
+    cache_key = TableCountCache.make_key(pdf_bytes, table_mode) if table_count_cache and table_mode != TABLE_DETECTION_OFF else None
+    known_table_counts = table_count_cache.get(cache_key) if cache_key else None
+
+    doc = fitz.open(stream=io.BytesIO(pdf_bytes), filetype="pdf")
+    try:
+        page_count = doc.page_count
+        title = (doc.metadata or {}).get("title")
+        if known_table_counts is not None and len(known_table_counts) != page_count:
+            known_table_counts = None
+        run_parallel = max_workers > 1 and page_count >= max(parallel_min_pages, 2)
+        if not run_parallel:
+            pages = [_extract_page(page, table_mode, known_table_counts[page.number] if known_table_counts else None) for page in doc]
+    finally:
+        doc.close()
+
+    if run_parallel:
+        # Contiguous ranges, a few per worker so uneven pages (figures, tables) balance out
+        range_count = min(page_count, max_workers * 4)
+        bounds = [page_count * i // range_count for i in range(range_count + 1)]
+        pool = _get_process_pool(max_workers)
+        with tempfile.NamedTemporaryFile(prefix="upload-", suffix=".pdf", delete=False) as pdf_file:
+            pdf_file.write(pdf_bytes)
+        futures = []
+        try:
+            futures = [
+                pool.submit(_extract_page_range, pdf_file.name, start, stop, table_mode, known_table_counts[start:stop] if known_table_counts else None)
+                for start, stop in zip(bounds, bounds[1:]) if stop > start
+            ]
+            pages = []
+            for future in futures: # Submission order == page order
+                pages.extend(future.result())
+        finally:
+            for future in futures: # Only pending ones on failure; ranges that already opened the file keep their handle
+                future.cancel()
+            os.unlink(pdf_file.name)
+        logger.info(f"Extracted {page_count} pages across {len(futures)} ranges with {max_workers} worker processes.")
+
+    if known_table_counts is not None:
+        logger.info(f"Reused cached table counts for all {page_count} pages (mode '{table_mode}').")
+    elif table_mode != TABLE_DETECTION_OFF:
+        searched_pages = sum(1 for page in pages if page["tables_searched"])
+        logger.info(f"Table detection ({table_mode}): find_tables() ran on {searched_pages} of {page_count} pages.")
+        if cache_key:
+            table_count_cache.put(cache_key, [page["table_count"] for page in pages])
+    return {"title": title, "page_count": page_count, "pages": pages}
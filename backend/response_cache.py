@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""Cache of serialized API responses for data that only changes at known points (graph ingests).
+
+Entries are keyed by (data version, request key) and hold the JSON body plus a lazily built gzip variant,
+so repeated requests skip model construction, serialization and compression. ETags are derived from the
+same key, which lets clients revalidate with If-None-Match without the server building anything.
+"""
+
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Callable, Hashable
+
+
+def make_etag(version: int, request_key: Hashable) -> str:
+    """Weak ETag for a request key at a data version (weak: the gzip and identity bodies share it)."""
+    digest = hashlib.sha1(repr(request_key).encode("utf-8")).hexdigest()[:16]
+    return f'W/"{version}-{digest}"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """Weak comparison of an If-None-Match header value against an ETag."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque_tag = etag.removeprefix("W/")
+    return any(candidate.strip().removeprefix("W/") == opaque_tag for candidate in if_none_match.split(","))
+
+
+class CachedResponse:
+    """A serialized response body; the gzip variant is compressed on first use and then reused."""
+
+    def __init__(self, body: bytes, etag: str):
+        self.body = body
+        self.etag = etag
+        self._gzip_body: bytes | None = None
+        self._lock = threading.Lock()
+
+    def gzip_body(self) -> bytes:
+        with self._lock:
+            if self._gzip_body is None:
+                self._gzip_body = gzip.compress(self.body, compresslevel=5, mtime=0)
+            return self._gzip_body
+
+
+class SerializedResponseCache:
+    """Thread-safe LRU of CachedResponse objects keyed by (version, request key)."""
+
+    def __init__(self, max_entries: int = 64):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[tuple, CachedResponse]" = OrderedDict()
+
+    def get_or_build(self, version: int, request_key: Hashable, build_body: Callable[[], tuple[int, bytes]]) -> CachedResponse:
+        """Returns the cached response for (version, request_key), building and storing it on a miss.
+
+        build_body returns (version the data was actually read at, body). A write between reading version and
+        building makes that newer than the requested one; the entry is then stored and tagged under the newer
+        version, so a body is never cached (or ETagged) under a version it does not belong to."""
+        key = (version, request_key)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            self.misses += 1
+        version, body = build_body()
+        key = (version, request_key)
+        entry = CachedResponse(body, make_etag(version, request_key))
+        if self.max_entries > 0:
+            with self._lock:
+                self._entries[key] = entry
+                self._entries.move_to_end(key)
+                # Entries of older versions can never be hit again; drop them first
+                for stale_key in [k for k in self._entries if k[0] < version]:
+                    del self._entries[stale_key]
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return entry
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries), "max_entries": self.max_entries}
@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+"""In-memory store of finished upload results, keyed by content fingerprints.
+
+Identical PDFs are common (a whole class uploads the same paper), so results are stored under a
+SHA-256 of the uploaded bytes and reused for duplicates. A second, weaker key over the extracted
+text lets re-saved copies of a document (different bytes, same text) skip concept extraction.
+Concurrent uploads of the same file are coalesced: the first one computes, the others wait for it.
+Payloads name the document they were computed for ("document_id"); the keys are indexed by it, so a
+deleted or re-ingested document's entries can be discarded instead of being served to later duplicates.
+"""
+
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+
+def fingerprint_bytes(data: bytes, signature: str = "") -> str:
+    """Content address of an uploaded file under a given pipeline configuration signature."""
+    digest = hashlib.sha256(data)
+    digest.update(b"\0" + signature.encode("utf-8"))
+    return "pdf:" + digest.hexdigest()
+
+
+def fingerprint_text(text: str, signature: str = "") -> str:
+    """Content address of extracted document text, insensitive to whitespace layout."""
+    digest = hashlib.sha256(" ".join(text.split()).encode("utf-8"))
+    digest.update(b"\0" + signature.encode("utf-8"))
+    return "text:" + digest.hexdigest()
+
+
+class UploadResultStore:
+    """Thread-safe LRU of result payloads with in-flight coalescing per key."""
+
+    def __init__(self, max_entries: int = 128, wait_timeout: float = 600.0):
+        self.max_entries = max_entries
+        self.wait_timeout = wait_timeout
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Any]" = OrderedDict()
+        self._document_keys: dict[str, set[str]] = {} # document_id -> keys of the payloads computed for it
+        self._inflight: dict[str, threading.Event] = {}
+
+    def get(self, key: str, record_stats: bool = True) -> Any | None:
+        """Returns the stored payload for key (refreshing its LRU position), or None."""
+        with self._lock:
+            return self._get_locked(key, record_stats)
+
+    def _get_locked(self, key: str, record_stats: bool = True) -> Any | None:
+        payload = self._entries.get(key)
+        if payload is not None:
+            self._entries.move_to_end(key)
+        if record_stats:
+            if payload is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return payload
+
+    def acquire(self, key: str) -> tuple[Any | None, bool]:
+        """Returns (stored payload, False) for key, waiting first if another thread is computing it.
+
+        Returns (None, True) when the caller must compute the payload and now owns the key: it has to call
+        release(key) when done (after put(key, ...) on success). After a wait timeout it returns (None, False):
+        the caller computes the payload too, but the key stays with its owner and must not be released.
+        Counts as one hit or miss however often it waits."""
+        while True:
+            with self._lock:
+                payload = self._get_locked(key, record_stats=False)
+                if payload is not None:
+                    self.hits += 1
+                    return payload, False
+                inflight = self._inflight.get(key)
+                if inflight is None:
+                    self._inflight[key] = threading.Event()
+                    self.misses += 1
+                    return None, True
+            logger.info(f"Waiting for in-flight processing of identical upload {key[:16]}...")
+            if not inflight.wait(self.wait_timeout):
+                logger.warning(f"Timed out waiting for in-flight upload {key[:16]}...; processing it again.")
+                with self._lock:
+                    self.misses += 1
+                return None, False
+
+    def release(self, key: str):
+        """Ends ownership of key taken by acquire(); waiters then re-check the store."""
+        with self._lock:
+            inflight = self._inflight.pop(key, None)
+        if inflight is not None:
+            inflight.set()
+
+    def put(self, key: str, payload: Any):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            replaced = self._entries.get(key)
+            if replaced is not None:
+                self._unindex_locked(key, replaced)
+            self._entries[key] = payload
+            self._entries.move_to_end(key)
+            self._document_keys.setdefault(payload["document_id"], set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._unindex_locked(*self._entries.popitem(last=False))
+
+    def _unindex_locked(self, key: str, payload: Any):
+        keys = self._document_keys.get(payload["document_id"])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._document_keys[payload["document_id"]]
+
+    def discard_document(self, doc_id: str) -> int:
+        """Drops every payload computed for doc_id (deleted or re-ingested); returns how many were dropped."""
+        with self._lock:
+            keys = self._document_keys.pop(doc_id, set())
+            for key in keys:
+                del self._entries[key]
+        if keys:
+            logger.info(f"Discarded {len(keys)} stored upload results of document {doc_id}.")
+        return len(keys)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "in_flight": len(self._inflight),
+            }
@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+"""Read-only, memory-mapped files of byte-string columns sorted by their first column.
+
+The shared on-disk layout of the titles index (titles_index.py) and the local definition store
+(definition_store.py); each of them has its own magic and its own file suffix:
+
+    header  : magic (4s) | format version (uint32) | column count C (uint32) | entry count N (uint64)
+    offsets : per column, N + 1 uint64 byte offsets into that column's blob
+    blobs   : per column, its N byte strings concatenated; column 0 (the keys) is sorted bytewise
+                                                                              -- all integers little-endian
+
+The file is mmap'ed read-only, so opening is O(1) and the pages are shared between worker processes by
+the OS page cache. Key lookups are a binary search over the key blob.
+"""
+
+import array
+import mmap
+import os
+import struct
+import sys
+from pathlib import Path
+
+_HEADER = struct.Struct("<4sIIQ")
+_OFFSET_SIZE = 8
+
+
+def _offsets_for(chunks: list[bytes]) -> array.array:
+    offsets = array.array("Q", [0]) * (len(chunks) + 1)
+    position = 0
+    for i, chunk in enumerate(chunks):
+        position += len(chunk)
+        offsets[i + 1] = position
+    if sys.byteorder != "little":
+        offsets.byteswap()
+    return offsets
+
+
+def write_sorted_blobs(path: str | Path, magic: bytes, version: int, keys: list[bytes], *value_columns: list[bytes]):
+    """Writes keys (already sorted bytewise, without duplicates) and the values belonging to them.
+
+    The file is written under a temporary name and renamed, so concurrently starting workers never map a
+    partial file."""
+    path = Path(path)
+    columns = [keys, *value_columns]
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    try:
+        with open(tmp_path, "wb") as out:
+            out.write(_HEADER.pack(magic, version, len(columns), len(keys)))
+            for column in columns:
+                _offsets_for(column).tofile(out)
+            for column in columns:
+                for chunk in column:
+                    out.write(chunk)
+        os.replace(tmp_path, path)
+    finally:
+        if tmp_path.exists():
+            tmp_path.unlink()
+
+
+class SortedBlobFile:
+    """A file written by write_sorted_blobs, mapped read-only. `kind` names the file type in error messages."""
+
+    def __init__(self, path: str | Path, magic: bytes, version: int, column_count: int, kind: str):
+        self.path = Path(path)
+        with open(self.path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._offsets: list[memoryview | array.array] = []
+        try:
+            if len(self._mm) < _HEADER.size:
+                raise ValueError(f"{kind.capitalize()} '{self.path}' is truncated.")
+            file_magic, file_version, file_columns, count = _HEADER.unpack_from(self._mm, 0)
+            if file_magic != magic or file_version != version or file_columns != column_count:
+                raise ValueError(f"'{self.path}' is not a {kind} (magic={file_magic!r}, version={file_version}).")
+            self._count = count
+            blob_start = _HEADER.size + column_count * (count + 1) * _OFFSET_SIZE
+            if len(self._mm) < blob_start:
+                raise ValueError(f"{kind.capitalize()} '{self.path}' is truncated.")
+            for column in range(column_count):
+                start = _HEADER.size + column * (count + 1) * _OFFSET_SIZE
+                end = start + (count + 1) * _OFFSET_SIZE
+                if sys.byteorder == "little":
+                    offsets = memoryview(self._mm)[start:end].cast("Q")
+                else: # Rare: copy the offsets out of the map and swap them to native order
+                    offsets = array.array("Q", self._mm[start:end])
+                    offsets.byteswap()
+                self._offsets.append(offsets)
+            self._blob_starts = []
+            for offsets in self._offsets:
+                self._blob_starts.append(blob_start)
+                blob_start += offsets[count]
+            if len(self._mm) < blob_start:
+                raise ValueError(f"{kind.capitalize()} '{self.path}' is truncated.")
+        except Exception:
+            self.close()
+            raise
+
+    def __len__(self) -> int:
+        return self._count
+
+    def value_at(self, column: int, i: int) -> bytes:
+        offsets, blob_start = self._offsets[column], self._blob_starts[column]
+        return self._mm[blob_start + offsets[i]:blob_start + offsets[i + 1]]
+
+    def key_at(self, i: int) -> bytes:
+        return self.value_at(0, i)
+
+    def lower_bound(self, key: bytes, lo: int = 0, hi: int | None = None) -> int:
+        """Returns the first index in [lo, hi) whose key is >= key."""
+        if hi is None:
+            hi = self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.key_at(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def find(self, key: bytes) -> int | None:
+        """The index of key, or None if it is not stored."""
+        i = self.lower_bound(key)
+        return i if i < self._count and self.key_at(i) == key else None
+
+    def close(self):
+        for offsets in self._offsets:
+            if isinstance(offsets, memoryview):
+                offsets.release()
+        self._mm.close()
@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+"""Local stub of the HanLP RESTful API (and the OwnThink knowledge API) for development and load testing
+without network access.
+
+Serves POST /parse with HanLP-shaped 'tok/coarse', 'pos/pku', 'ner/ontonotes' and 'dep' output, and
+POST /kg/knowledge with OwnThink-shaped entity descriptions (terms starting with "unknown" or "未知" have
+none), with an injectable per-request latency (and failure rate), so concurrency and caching can be
+exercised locally:
+
+    python stub_server.py --port 8765 --latency 0.5
+    HANLP_BASE_URL=http://127.0.0.1:8765 OWNTHINK_API_URL=http://127.0.0.1:8765/kg/knowledge uvicorn main:app
+"""
+
+import argparse
+import json
+import logging
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+_SENTENCE_PATTERN = re.compile(r"[^。！？!?；;\n]+[。！？!?；;]*")
+_TOKEN_PATTERN = re.compile(r"[A-Za-z]+|\d+(?:\.\d+)?|[\u4e00-\u9fff]{1,2}|\S")
+
+
+def fake_parse(text: str) -> dict:
+    """Produces deterministic HanLP-like annotations: 1-2 char CJK words, latin words as NER entities, chained DEP arcs."""
+    tokens, tags, entities, arcs = [], [], [], []
+    for sentence in _SENTENCE_PATTERN.findall(text):
+        sentence_tokens = _TOKEN_PATTERN.findall(sentence)
+        if not sentence_tokens:
+            continue
+        tokens.append(sentence_tokens)
+        tags.append(["n" if t.isalnum() else "w" for t in sentence_tokens])
+        entities.append([[t, "ORG", i, i + 1] for i, t in enumerate(sentence_tokens) if t.isascii() and t.isalpha()])
+        # Each token depends on the next one; the last token is the root
+        arcs.append([[i + 2, "dep"] if i + 1 < len(sentence_tokens) else [0, "root"] for i in range(len(sentence_tokens))])
+    return {"tok/coarse": tokens, "pos/pku": tags, "ner/ontonotes": entities, "dep": arcs}
+
+
+def fake_knowledge(entity: str) -> dict:
+    """OwnThink-like entity lookup: a deterministic description, or empty data for "unknown" terms."""
+    if not entity or entity.startswith(("unknown", "未知")):
+        return {"message": "success", "data": {}}
+    return {"message": "success", "data": {"entity": entity, "desc": f"{entity}是一个用于测试的概念。", "avp": []}}
+
+
+class StubRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1" # Keep-alive, so pooled clients reuse connections
+    latency = 0.0
+    failure_rate = 0.0
+    stats = {"requests": 0, "in_flight": 0, "max_in_flight": 0}
+    stats_lock = threading.Lock()
+
+    def _send_json(self, status: int, payload: dict):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.rstrip("/") == "/stats":
+            with self.stats_lock:
+                self._send_json(200, dict(self.stats))
+        else:
+            self._send_json(404, {"detail": "Not Found"})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            payload = json.loads(self.rfile.read(length) or b"{}")
+        except json.JSONDecodeError:
+            self._send_json(422, {"detail": "Invalid JSON"})
+            return
+
+        with self.stats_lock:
+            self.stats["requests"] += 1
+            self.stats["in_flight"] += 1
+            self.stats["max_in_flight"] = max(self.stats["max_in_flight"], self.stats["in_flight"])
+        try:
+            if self.latency:
+                time.sleep(self.latency)
+            path = self.path.split("?")[0].rstrip("/")
+            if path.endswith("/parse") or path.endswith("/kg/knowledge"):
+                if self.failure_rate and random.random() < self.failure_rate:
+                    self._send_json(500, {"detail": "Injected failure"})
+                elif path.endswith("/parse"):
+                    self._send_json(200, fake_parse(payload.get("text") or ""))
+                else:
+                    self._send_json(200, fake_knowledge(payload.get("entity") or ""))
+            else:
+                self._send_json(404, {"detail": "Not Found"})
+        finally:
+            with self.stats_lock:
+                self.stats["in_flight"] -= 1
+
+    def log_message(self, format, *args):
+        logger.debug(format, *args)
+
+
+class StubHTTPServer(ThreadingHTTPServer):
+    request_queue_size = 128 # Bursts of concurrent connections would otherwise overflow the default backlog of 5
+    daemon_threads = True
+
+
+def serve(host: str = "127.0.0.1", port: int = 8765, latency: float = 0.0, failure_rate: float = 0.0) -> StubHTTPServer:
+    """Creates a stub server with the given injected latency (seconds) and failure rate (0-1); call serve_forever() on it."""
+    handler = type("ConfiguredStubRequestHandler", (StubRequestHandler,), {
+        "latency": latency,
+        "failure_rate": failure_rate,
+        "stats": {"requests": 0, "in_flight": 0, "max_in_flight": 0},
+        "stats_lock": threading.Lock(),
+    })
+    return StubHTTPServer((host, port), handler)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local stub of the HanLP RESTful API and the OwnThink knowledge API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds to sleep before answering each request.")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Fraction of /parse and /kg/knowledge requests answered with HTTP 500.")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    server = serve(args.host, args.port, args.latency, args.failure_rate)
+    logger.info(f"Stub API listening on http://{args.host}:{args.port} (latency={args.latency}s, failure_rate={args.failure_rate})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
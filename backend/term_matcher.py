@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""Aho–Corasick multi-pattern matcher for finding document concepts inside text segments.
+
+The automaton is built once per document from its final concept set and then reused for every
+text block, so each block costs a single linear pass instead of one substring scan per concept.
+"""
+
+from typing import Iterable, Iterator
+
+
+class TermMatcher:
+    """Aho–Corasick automaton over a fixed set of terms (matched case-sensitively, as given)."""
+
+    def __init__(self, terms: Iterable[str]):
+        self._goto: list[dict[str, int]] = [{}] # State transitions; state 0 is the root
+        self._fail: list[int] = [0]
+        self._term: list[str | None] = [None] # Term ending exactly at this state
+        self._output_link: list[int] = [0] # Nearest state on the fail chain that ends a term (0 = none)
+        self.terms = frozenset(t for t in terms if t)
+        for term in self.terms:
+            self._insert(term)
+        self._build_failure_links()
+
+    def _insert(self, term: str):
+        state = 0
+        for char in term:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._term.append(None)
+                self._output_link.append(0)
+                self._goto[state][char] = next_state
+            state = next_state
+        self._term[state] = term
+
+    def _build_failure_links(self):
+        queue = list(self._goto[0].values()) # Depth-1 states fail to the root
+        for state in queue: # The list grows while iterating: breadth-first order
+            for char, child in self._goto[state].items():
+                queue.append(child)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                child_fail = self._goto[fallback].get(char, 0)
+                self._fail[child] = child_fail
+                self._output_link[child] = child_fail if self._term[child_fail] is not None else self._output_link[child_fail]
+
+    def iter_matches(self, text: str) -> Iterator[tuple[int, int, str]]:
+        """Yields (start, end, term) for every occurrence of every term in text, overlaps included."""
+        goto, fail, term_at, output_link = self._goto, self._fail, self._term, self._output_link
+        state = 0
+        for position, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            match_state = state if term_at[state] is not None else output_link[state]
+            while match_state:
+                term = term_at[match_state]
+                yield position + 1 - len(term), position + 1, term
+                match_state = output_link[match_state]
+
+    def find_matches(self, text: str) -> list[tuple[int, int, str]]:
+        """Returns all (start, end, term) occurrences in text, ordered by end position."""
+        return list(self.iter_matches(text))
+
+    def find_terms(self, text: str) -> set[str]:
+        """Returns the set of distinct terms occurring in text (same result as {t for t in terms if t in text})."""
+        return {term for _, _, term in self.iter_matches(text)}
+
+    def __len__(self) -> int:
+        return len(self.terms)
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+"""Coalesced OwnThink lookups when the request that owns the upstream query is cancelled.
+
+    python -m pytest test_definitions.py
+"""
+
+import asyncio
+
+from definitions import DefinitionCache, OwnThinkDefinitionClient
+
+
+class SlowClient(OwnThinkDefinitionClient):
+    """Answers every term after `delay` seconds without network access, counting the queries."""
+
+    def __init__(self, delay: float):
+        super().__init__("http://ownthink.invalid", DefinitionCache())
+        self.delay = delay
+
+    async def _fetch(self, client, term: str) -> str | None:
+        self.upstream_requests += 1
+        await asyncio.sleep(self.delay)
+        return f"definition of {term}"
+
+
+def test_waiter_retries_when_owner_is_cancelled():
+    async def scenario():
+        client = SlowClient(delay=0.05)
+        owner = asyncio.create_task(client.fetch_definition("transformer"))
+        await asyncio.sleep(0.01) # The owner's query is in flight
+        waiter = asyncio.create_task(client.fetch_definition("transformer"))
+        await asyncio.sleep(0.01) # The waiter has joined it
+        owner.cancel()
+        definition = await waiter
+        await client.aclose()
+        return owner, definition, client
+
+    owner, definition, client = asyncio.run(scenario())
+    assert owner.cancelled()
+    assert definition == "definition of transformer"
+    assert client.coalesced == 1
+    assert client.upstream_requests == 2 # The waiter took the lookup over
+    assert client.cache.get("transformer") == "definition of transformer"
+
+
+def test_cancelled_waiter_does_not_affect_owner():
+    async def scenario():
+        client = SlowClient(delay=0.05)
+        owner = asyncio.create_task(client.fetch_definition("attention"))
+        await asyncio.sleep(0.01)
+        waiter = asyncio.create_task(client.fetch_definition("attention"))
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+        definition = await owner
+        await asyncio.gather(waiter, return_exceptions=True)
+        await client.aclose()
+        return waiter, definition, client
+
+    waiter, definition, client = asyncio.run(scenario())
+    assert waiter.cancelled()
+    assert definition == "definition of attention"
+    assert client.upstream_requests == 1
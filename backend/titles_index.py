@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+"""Compact, memory-mapped index over the local Wikipedia titles corpus.
+
+The plain-text titles dump (one title per line) is compiled once into a sorted blob file (sorted_blobs.py)
+with a single column: the case-normalized UTF-8 titles, sorted bytewise. The file has its own magic and
+suffix (".titles.idx").
+
+At runtime the file is mmap'ed read-only, so loading is O(1) and the pages are shared
+between worker processes by the OS page cache. Membership is a binary search over the blob,
+and prefix queries narrow a sorted range, which lets callers walk the index like a trie.
+
+Build step (run from the backend directory):
+    python titles_index.py zhwiki-latest-all-titles-in-ns0-simplified
+"""
+
+import logging
+from pathlib import Path
+
+from sorted_blobs import SortedBlobFile, write_sorted_blobs
+
+logger = logging.getLogger(__name__)
+
+INDEX_MAGIC = b"MFTI"
+INDEX_FORMAT_VERSION = 2
+INDEX_FILE_SUFFIX = ".titles.idx"
+
+
+def normalize_title(title: str) -> str:
+    """Normalizes a title (or concept) for index storage and lookup: stripped and lowercased."""
+    return title.strip().lower()
+
+
+def default_index_path(titles_path: str | Path) -> Path:
+    """Returns the compiled index path that belongs next to a titles file."""
+    titles_path = Path(titles_path)
+    return titles_path.with_name(titles_path.name + INDEX_FILE_SUFFIX)
+
+
+def build_titles_index(titles_path: str | Path, index_path: str | Path | None = None) -> int:
+    """Compiles a plain-text titles file into the binary index format. Returns the number of titles written."""
+    titles_path = Path(titles_path)
+    index_path = Path(index_path) if index_path else default_index_path(titles_path)
+
+    with open(titles_path, "r", encoding="utf-8") as f:
+        keys = {normalize_title(line).encode("utf-8") for line in f}
+    keys.discard(b"")
+    sorted_keys = sorted(keys) # Bytewise UTF-8 order == code point order
+    del keys
+
+    write_sorted_blobs(index_path, INDEX_MAGIC, INDEX_FORMAT_VERSION, sorted_keys)
+
+    logger.info(f"Compiled {len(sorted_keys)} titles from '{titles_path}' into index '{index_path}' ({index_path.stat().st_size} bytes).")
+    return len(sorted_keys)
+
+
+class WikipediaTitlesIndex:
+    """Read-only, memory-mapped set of case-normalized titles with binary-search membership."""
+
+    def __init__(self, index_path: str | Path):
+        self.path = Path(index_path)
+        self._file = SortedBlobFile(self.path, INDEX_MAGIC, INDEX_FORMAT_VERSION, 1, "titles index")
+        self._count = len(self._file)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __contains__(self, title: object) -> bool:
+        if not isinstance(title, str):
+            return False
+        key = normalize_title(title).encode("utf-8")
+        if not key:
+            return False
+        return self._file.find(key) is not None
+
+    def match_prefix(self, prefix: str, lo: int = 0, hi: int | None = None) -> tuple[int, int, bool]:
+        """Narrows [lo, hi) to the titles starting with `prefix` and reports whether `prefix` itself is a title.
+
+        Because titles are sorted, all titles sharing a prefix form one contiguous range, so passing the
+        range of a shorter prefix back in behaves like descending one level in a trie. `prefix` must already
+        be normalized (lowercased, no leading whitespace). An empty range means no title can start with it.
+        """
+        if hi is None:
+            hi = self._count
+        key = prefix.encode("utf-8")
+        if not key:
+            return lo, hi, False
+        lo = self._file.lower_bound(key, lo, hi)
+        # 0xFF never occurs in UTF-8, so key + b"\xff" sorts after every title that starts with key
+        hi = self._file.lower_bound(key + b"\xff", lo, hi)
+        return lo, hi, lo < hi and self._file.key_at(lo) == key
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Compile a Wikipedia titles dump into a memory-mapped index.")
+    parser.add_argument("titles_file", help="Plain-text titles file, one title per line.")
+    parser.add_argument("index_file", nargs="?", help=f"Output path (default: <titles_file>{INDEX_FILE_SUFFIX}).")
+    args = parser.parse_args()
+    build_titles_index(args.titles_file, args.index_file)